@@ -3,6 +3,22 @@ import pygame
 import sys
 import random
 import math
+import os
+import struct
+import zlib
+from array import array
+from collections import OrderedDict
+
+try:
+    import numpy as np # Only needed for the batched simulation (BatchGame)
+except ImportError:
+    np = None
+
+import gameloop
+import mazefile
+import profiler
+import replay
+import textcache
 
 # === Configuration ===
 TILE_SIZE = 24 # Slightly smaller tiles often work well for Pac-Man layouts
@@ -10,11 +26,51 @@ MAZE_W_TILES = 28
 MAZE_H_TILES = 31 # Classic Pac-Man dimensions (approx)
 SCREEN_WIDTH = MAZE_W_TILES * TILE_SIZE
 SCREEN_HEIGHT = (MAZE_H_TILES + 3) * TILE_SIZE # Extra space for score/lives
+MAX_VIEW_W_TILES = 40 # Window size cap; bigger levels scroll with the player
+MAX_VIEW_H_TILES = 31
+CHUNK_TILES = 16 # Scrolling levels are pre-rendered in CHUNK_TILES x CHUNK_TILES pieces
+CHUNK_KEEP_DISTANCE = 2 # Chunks this many chunks outside the view are kept, further ones dropped
 
 FPS = 60
 PLAYER_SPEED = TILE_SIZE * 3.0 / FPS # Adjusted speed in pixels per frame
 GHOST_SPEED = TILE_SIZE * 2.8 / FPS
 GHOST_FRIGHT_SPEED = TILE_SIZE * 1.5 / FPS
+ENTITY_RADIUS = TILE_SIZE // 2 - 2
+
+# Movement engines
+MOVEMENT_PIXEL = "pixel" # Float pixel movement with corner probing (Entity.move_and_collide)
+MOVEMENT_LANE = "lane" # Integer tile lanes (Entity.move_along_lane); the pixel rules, exact and cheaper
+MOVEMENT_ENGINE = MOVEMENT_PIXEL
+LANE_UNITS_PER_PIXEL = 100 # Lane positions are integers in 1/100 pixel, so every speed above is exact
+LANE_TILE = TILE_SIZE * LANE_UNITS_PER_PIXEL
+# Pixel positions are rounded to the same 1/100 pixel after every move, so float error never
+# carries an entity across a tile edge a frame early and both engines follow the same paths
+POSITION_DECIMALS = 2
+
+# Ghost AI
+GHOST_TARGETING = True # Chase/scatter targeting; False keeps the original random wandering
+GHOST_MODE_RANDOM, GHOST_MODE_SCATTER, GHOST_MODE_CHASE = "random", "scatter", "chase"
+# (mode, frames) phases counted from the start of a game; the last phase lasts forever
+GHOST_MODE_SCHEDULE = [
+    (GHOST_MODE_SCATTER, 7 * FPS), (GHOST_MODE_CHASE, 20 * FPS),
+    (GHOST_MODE_SCATTER, 7 * FPS), (GHOST_MODE_CHASE, 20 * FPS),
+    (GHOST_MODE_SCATTER, 5 * FPS), (GHOST_MODE_CHASE, 20 * FPS),
+    (GHOST_MODE_SCATTER, 5 * FPS), (GHOST_MODE_CHASE, None),
+]
+GHOST_MODES = [GHOST_MODE_RANDOM, GHOST_MODE_SCATTER, GHOST_MODE_CHASE]
+DISTANCE_FIELD_CACHE_BYTES = 8 << 20 # Chase fields kept before the least recently used are evicted
+CHASE_SEARCH_CELLS = 2048 # A chase target's search stops after the distance ring that passes this many cells
+INT_BYTES = sys.getsizeof(0) # One int object, for sizing cached fields
+
+# Swarm mode
+SWARM_GHOSTS = 0 # Ghost count for swarm mode; 0 plays the classic four ghosts
+SWARM_SPAWN_DISTANCE = 8 # Swarm ghosts spawn at least this many tiles (Manhattan) from the player
+DIRTY_RECT_RENDERING = True # Only push changed screen regions; F2 toggles full-frame mode for debugging
+
+# Profiling (F3 toggles the overlay, F4 exports the frame-time ring)
+PROFILE_PHASES = ["events", "input", "player", "ghosts", "collide", "draw", "overlay", "flip", "wait"]
+FRAME_BUDGET_MS = 1.5 * 1000 / FPS # Frames slower than this are counted and exported
+PROFILE_EXPORT_PATH = "pacman-profile-{frame}.csv"
 
 # Colors
 COLOR_BG       = (0,   0,  0)
@@ -25,8 +81,19 @@ COLOR_PLAYER   = (255, 255, 0) # Yellow
 COLOR_GHOSTS   = [(255, 0, 0), (255, 184, 255), (0, 255, 255), (255, 184, 82)] # Red, Pink, Cyan, Orange
 COLOR_WHITE    = (255, 255, 255)
 
+# Player actions (used by both keyboard input and the programmatic step() API)
+ACTION_NONE, ACTION_LEFT, ACTION_RIGHT, ACTION_UP, ACTION_DOWN = range(5)
+INPUT_RESTART = 0x80 # Flag OR'd into an action for frames where R restarted a finished game
+ACTION_DIRECTIONS = {
+    ACTION_LEFT: (-1, 0),
+    ACTION_RIGHT: (1, 0),
+    ACTION_UP: (0, -1),
+    ACTION_DOWN: (0, 1),
+}
+
 # Maze Layout (Simplified Pac-Man Style Example)
 # 0: Empty Path, 1: Wall, 2: Pellet, 5: Tunnel
+CELL_EMPTY, CELL_WALL, CELL_PELLET, CELL_TUNNEL = 0, 1, 2, 5
 # More complex layout would be needed for a true clone
 MAZE_LAYOUT = [
     [1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1],
@@ -56,49 +123,486 @@ MAZE_LAYOUT = [
 while len(MAZE_LAYOUT) < MAZE_H_TILES:
     MAZE_LAYOUT.append([1]*MAZE_W_TILES) # Fill bottom with walls
 
-# --- Helper Functions ---
-def pixel_to_maze(px, py):
-    """Convert pixel coords to maze cell indices."""
-    col = int(px // TILE_SIZE)
-    row = int(py // TILE_SIZE)
-    # Clamp values to be within maze bounds
-    col = max(0, min(col, MAZE_W_TILES - 1))
-    row = max(0, min(row, MAZE_H_TILES - 1))
-    return col, row
+# Binary snapshot layout (Game.snapshot_bytes): header, pellet bitset, player, then one record per ghost
+SNAPSHOT_HEADER = struct.Struct("<I??I") # frame, game_over, win, pellet_count
+PLAYER_SNAPSHOT = struct.Struct("<4d2i2di") # px, py, dx, dy, mx, my, queued_dx, queued_dy, score
+GHOST_SNAPSHOT = struct.Struct("<4d2iBhhi") # px, py, dx, dy, mx, my, mode, target mx/my (-1 = none), timer
+
+# Replays
+REPLAY_CHECKPOINT_INTERVAL = 30 * FPS # Frames between seek checkpoints
+REPLAY_TAG = b"pacman"
 
+# --- Helper Functions ---
 def maze_to_pixel_center(mx, my):
     """Gets the center pixel coordinates of a maze tile."""
     return mx * TILE_SIZE + TILE_SIZE // 2, my * TILE_SIZE + TILE_SIZE // 2
 
-def is_wall(mx, my):
-    """Checks if a maze coordinate is a wall."""
-    if 0 <= my < MAZE_H_TILES and 0 <= mx < MAZE_W_TILES:
-        return MAZE_LAYOUT[my][mx] == 1
-    return True # Treat out-of-bounds as walls
-
-def get_valid_moves(mx, my):
-    """Returns a list of valid (non-wall) neighbor coordinates (mx, my)."""
-    moves = []
-    for dx, dy in [(0, -1), (0, 1), (-1, 0), (1, 0)]: # Up, Down, Left, Right
-        next_mx, next_my = mx + dx, my + dy
-        if 0 <= next_my < MAZE_H_TILES and 0 <= next_mx < MAZE_W_TILES:
-             # Allow movement into tunnels (5) and paths (0, 2)
-             if MAZE_LAYOUT[next_my][next_mx] != 1:
-                moves.append((next_mx, next_my))
-    return moves
-
-# --- Pellet Management ---
-pellet_positions = set() # Use a set for efficient checking and removal
-def initialize_pellets():
-    pellet_positions.clear()
-    for r in range(MAZE_H_TILES):
-        for c in range(MAZE_W_TILES):
-            if MAZE_LAYOUT[r][c] == 2:
-                pellet_positions.add((c, r))
+MOVE_DIRECTIONS = [(0, -1), (0, 1), (-1, 0), (1, 0)] # Up, Down, Left, Right
+
+# --- Maze State ---
+class Maze:
+    """Per-game maze: a read-only cell grid plus a pellet bitset.
+
+    Cells are stored row-major (index my * width + mx) using the MAZE_LAYOUT
+    codes. The pellet bitset is the only part that changes during play, so
+    two games never share pellets and snapshots only copy those few bytes.
+    Games on the same level file share its (memory-mapped) cells and tables.
+    """
+    __slots__ = ("level", "width", "height", "cells", "start_pellet_bits", "start_pellet_count",
+                 "pellet_bits", "pellet_count", "_graph")
+
+    def __init__(self, layout):
+        """layout: rows of cell codes like MAZE_LAYOUT, or a mazefile.CompiledMaze."""
+        level = layout if isinstance(layout, mazefile.CompiledMaze) else mazefile.compile_layout(layout)
+        self.level = level
+        self.width = level.width
+        self.height = level.height
+        self.cells = level.cells
+        self.start_pellet_bits = level.pellet_bits
+        self.start_pellet_count = level.pellet_count
+        self._graph = None
+        self.reset_pellets()
+
+    @property
+    def graph(self):
+        """MazeGraph for this layout, compiled on first use."""
+        if self._graph is None:
+            self._graph = MazeGraph(self)
+        return self._graph
+
+    def reset_pellets(self):
+        self.pellet_bits = bytearray(self.start_pellet_bits)
+        self.pellet_count = self.start_pellet_count
+
+    def cell(self, mx, my):
+        return self.cells[my * self.width + mx]
+
+    def is_wall(self, mx, my):
+        """Checks if a maze coordinate is a wall."""
+        if 0 <= my < self.height and 0 <= mx < self.width:
+            return self.cells[my * self.width + mx] == CELL_WALL
+        return True # Treat out-of-bounds as walls
+
+    def pixel_to_maze(self, px, py):
+        """Convert pixel coords to maze cell indices."""
+        col = int(px // TILE_SIZE)
+        row = int(py // TILE_SIZE)
+        # Clamp values to be within maze bounds
+        col = max(0, min(col, self.width - 1))
+        row = max(0, min(row, self.height - 1))
+        return col, row
+
+    def has_pellet(self, mx, my):
+        i = my * self.width + mx
+        return (self.pellet_bits[i >> 3] >> (i & 7)) & 1 == 1
+
+    def eat_pellet(self, mx, my):
+        """Removes the pellet at (mx, my); returns False if there wasn't one."""
+        i = my * self.width + mx
+        bit = 1 << (i & 7)
+        if not self.pellet_bits[i >> 3] & bit:
+            return False
+        self.pellet_bits[i >> 3] &= ~bit
+        self.pellet_count -= 1
+        return True
+
+    def pellet_cells(self):
+        """Yields (mx, my) for every pellet still in the maze."""
+        for byte_index, byte in enumerate(self.pellet_bits):
+            while byte:
+                low = byte & -byte
+                i = (byte_index << 3) + low.bit_length() - 1
+                yield i % self.width, i // self.width
+                byte ^= low
+
+    def snapshot_pellets(self):
+        return bytes(self.pellet_bits), self.pellet_count
+
+    def restore_pellets(self, snapshot):
+        bits, self.pellet_count = snapshot
+        self.pellet_bits[:] = bits
+
+# --- Maze Graph ---
+# Neighbor bitmask bits, one per MOVE_DIRECTIONS entry
+DIR_BITS = [1, 2, 4, 8] # Up, Down, Left, Right
+OPPOSITE_DIR = [1, 0, 3, 2] # MOVE_DIRECTIONS index of the reverse direction
+BIT_TO_DIR = {bit: d for d, bit in enumerate(DIR_BITS)}
+# Exit vectors for every possible mask, in MOVE_DIRECTIONS order
+EXITS_BY_MASK = [tuple(MOVE_DIRECTIONS[d] for d in range(4) if mask & DIR_BITS[d]) for mask in range(16)]
+
+def direction_bit(dx, dy):
+    """DIR_BITS entry for a velocity (0 when standing still)."""
+    if dy < 0: return DIR_BITS[0]
+    if dy > 0: return DIR_BITS[1]
+    if dx < 0: return DIR_BITS[2]
+    if dx > 0: return DIR_BITS[3]
+    return 0
+
+class MazeGraph:
+    """A maze layout compiled once per level for O(1) movement queries.
+
+    neighbor_masks[my * width + mx] has DIR_BITS[d] set when the neighbor in
+    MOVE_DIRECTIONS[d] is open (bounds-limited, so no tunnel wrap).
+    Junctions are open cells with three or more exits. For every open cell
+    and exit, junction_from() gives the junction (or dead end) reached by
+    following that corridor and how many tiles it takes to get there.
+
+    The per-cell tables come precomputed with the level (see mazefile.py);
+    corridors are followed on first use, which keeps million-cell levels cheap.
+    """
+    def __init__(self, maze):
+        self.width = maze.width
+        self.height = maze.height
+        level = maze.level
+        cells = bytes(level.cells)
+        self.neighbor_masks = level.neighbor_masks
+        self.open_cells = cells.translate(mazefile.OPEN_TABLE)
+        self.junctions = mazefile.junction_cells(cells, bytes(level.neighbor_masks))
+        # nearest_open[i]: closest open cell to any cell (itself when open), for snapping targets
+        self.nearest_open = level.nearest_open
+        # ((my * width + mx) * 4 + d) -> ((end_mx, end_my), length), filled in by junction_from()
+        self.next_junction = {}
+
+    def _follow_corridor(self, mx, my, d):
+        """Walks from (mx, my) in direction d until a junction, dead end or back at the start."""
+        start = (mx, my)
+        length = 0
+        while True:
+            dx, dy = MOVE_DIRECTIONS[d]
+            mx, my = mx + dx, my + dy
+            length += 1
+            i = my * self.width + mx
+            if self.junctions[i] or (mx, my) == start:
+                return (mx, my), length
+            onward = self.neighbor_masks[i] & ~DIR_BITS[OPPOSITE_DIR[d]]
+            if onward == 0: # Dead end
+                return (mx, my), length
+            d = BIT_TO_DIR[onward] # Corridors and corners have exactly one way on
+
+    def mask(self, mx, my):
+        return self.neighbor_masks[my * self.width + mx]
+
+    def exits(self, mx, my):
+        """Open (dx, dy) directions out of a cell, in MOVE_DIRECTIONS order."""
+        return EXITS_BY_MASK[self.neighbor_masks[my * self.width + mx]]
+
+    def is_junction(self, mx, my):
+        return bool(self.junctions[my * self.width + mx])
+
+    def junction_from(self, mx, my, d):
+        """((end_mx, end_my), length) reached by leaving (mx, my) in direction d, or None if walled."""
+        i = my * self.width + mx
+        if not self.open_cells[i] or not self.neighbor_masks[i] & DIR_BITS[d]:
+            return None
+        key = i * 4 + d
+        edge = self.next_junction.get(key)
+        if edge is None:
+            edge = self.next_junction[key] = self._follow_corridor(mx, my, d)
+        return edge
+
+    def junction_edges(self, mx, my):
+        """Graph edges out of a cell as (direction index, end cell, length) tuples."""
+        return [(d,) + edge for d in range(4) for edge in [self.junction_from(mx, my, d)] if edge]
+
+    def nearest_open_tile(self, mx, my):
+        """Closest open cell to (mx, my), which is clamped into the maze first."""
+        mx = max(0, min(mx, self.width - 1))
+        my = max(0, min(my, self.height - 1))
+        i = self.nearest_open[my * self.width + mx]
+        return (i % self.width, i // self.width) if i >= 0 else (mx, my)
+
+    def needs_decision(self, mx, my, dx, dy):
+        """False when the only non-reversing exit is straight ahead (corridors), so no choice exists."""
+        heading = direction_bit(dx, dy)
+        reverse = direction_bit(-dx, -dy)
+        return (self.neighbor_masks[my * self.width + mx] & ~reverse) != heading
+
+class PartialField(dict):
+    """Cell index -> distance for every cell within a search's last distance ring.
+
+    Cells missing are further away than all of these, or unreachable when
+    the search ran out of cells first (complete).
+    """
+    __slots__ = ("complete",)
+
+class DistanceFields:
+    """BFS distance tables over a MazeGraph, so picking the exit that heads
+    toward a target is four lookups.
+
+    Fixed targets (the scatter corners) get full tables, built up front by
+    precompute() and kept for the level: every cell to its shortest path
+    length (in tiles), or -1 when unreachable. Chase targets move with the
+    player, so a full table per target would cost a whole-maze search (and
+    a table the size of the maze) for every tile the player steps on. They
+    get a PartialField instead, searching only CHASE_SEARCH_CELLS cells
+    around the target, kept in an LRU cache capped at max_bytes. A ghost
+    beyond that range heads for the target in a straight line, like the
+    arcade ghosts always do. On mazes smaller than the search every field is
+    complete, so nothing changes there. Call invalidate() whenever the
+    layout changes.
+    """
+    def __init__(self, maze_graph, max_bytes=DISTANCE_FIELD_CACHE_BYTES, search_cells=CHASE_SEARCH_CELLS):
+        self.maze_graph = maze_graph
+        self.max_bytes = max_bytes
+        self.search_cells = search_cells
+        self.fixed = {} # (mx, my) -> full array of distances, never evicted
+        self.tables = OrderedDict() # (mx, my) -> PartialField, most recently used last
+        self.cached_bytes = 0 # Size of everything in self.tables
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self, maze_graph=None):
+        """Drops every table, optionally switching to a newly compiled maze."""
+        if maze_graph is not None:
+            self.maze_graph = maze_graph
+        self.fixed.clear()
+        self.tables.clear()
+        self.cached_bytes = 0
+
+    def precompute(self, targets=None):
+        """Builds full tables for fixed targets; with no targets it builds all pairs (every open cell)."""
+        graph = self.maze_graph
+        if targets is None:
+            targets = [(i % graph.width, i // graph.width) for i in range(graph.width * graph.height) if graph.open_cells[i]]
+        for mx, my in targets:
+            if (mx, my) not in self.fixed:
+                self.fixed[mx, my] = self._bfs(mx, my)
+
+    def distances_to(self, mx, my):
+        """Full table toward a precomputed target, else a PartialField computed on first use."""
+        key = (mx, my)
+        table = self.fixed.get(key)
+        if table is not None:
+            self.hits += 1
+            return table
+        table = self.tables.get(key)
+        if table is not None:
+            self.hits += 1
+            self.tables.move_to_end(key)
+            return table
+        self.misses += 1
+        table = self._bounded_bfs(mx, my)
+        self.tables[key] = table
+        self.cached_bytes += self._field_bytes(table)
+        while self.cached_bytes > self.max_bytes and len(self.tables) > 1:
+            self.cached_bytes -= self._field_bytes(self.tables.popitem(last=False)[1])
+        return table
+
+    @staticmethod
+    def _field_bytes(table):
+        return sys.getsizeof(table) + len(table) * INT_BYTES # The dict plus its int keys
+
+    def _bfs(self, mx, my):
+        graph = self.maze_graph
+        w = graph.width
+        masks = graph.neighbor_masks
+        offsets = [dx + dy * w for dx, dy in MOVE_DIRECTIONS]
+        steps = list(zip(DIR_BITS, offsets))
+        table = array('i', [-1]) * (w * graph.height)
+        start = my * w + mx
+        table[start] = 0
+        ring = [start]
+        dist = 0
+        while ring: # One distance ring at a time, so distances never need reading back
+            dist += 1
+            next_ring = []
+            append = next_ring.append
+            for i in ring:
+                mask = masks[i]
+                for bit, offset in steps:
+                    if mask & bit:
+                        n = i + offset
+                        if table[n] < 0:
+                            table[n] = dist
+                            append(n)
+            ring = next_ring
+        return table
+
+    def _bounded_bfs(self, mx, my):
+        """BFS one distance ring at a time, stopping after the ring that reaches search_cells."""
+        graph = self.maze_graph
+        w = graph.width
+        masks = graph.neighbor_masks
+        offsets = [dx + dy * w for dx, dy in MOVE_DIRECTIONS]
+        start = my * w + mx
+        steps = list(zip(DIR_BITS, offsets))
+        field = PartialField({start: 0})
+        ring = [start]
+        dist = 0
+        while ring and len(field) < self.search_cells:
+            dist += 1
+            next_ring = []
+            append = next_ring.append
+            for i in ring:
+                mask = masks[i]
+                for bit, offset in steps:
+                    if mask & bit:
+                        n = i + offset
+                        if n not in field:
+                            field[n] = dist
+                            append(n)
+            ring = next_ring
+        field.complete = not ring
+        return field
+
+    def distance(self, from_tile, to_tile):
+        """Path length between two tiles, or -1 when there is no path (or, for a
+        chase target, it's longer than the search reached)."""
+        table = self.distances_to(*to_tile)
+        i = from_tile[1] * self.maze_graph.width + from_tile[0]
+        return table.get(i, -1) if isinstance(table, PartialField) else table[i]
+
+    def best_exit(self, mx, my, target, dx=0, dy=0):
+        """(dx, dy) exit from (mx, my) that is closest to target, or None if it can't be reached.
+
+        Reversing the current heading (dx, dy) is only allowed when it's the
+        only way out. Ties go to the earlier MOVE_DIRECTIONS entry. Out of a
+        chase field's range, the exit closest to the target as the crow flies.
+        """
+        graph = self.maze_graph
+        table = self.distances_to(*target)
+        partial = isinstance(table, PartialField)
+        i = my * graph.width + mx
+        mask = graph.neighbor_masks[i]
+        reverse = direction_bit(-dx, -dy)
+        if mask & ~reverse:
+            mask &= ~reverse
+        best, best_dist = None, -1
+        for d, (exit_dx, exit_dy) in enumerate(MOVE_DIRECTIONS):
+            if mask & DIR_BITS[d]:
+                n = i + exit_dx + exit_dy * graph.width
+                dist = table.get(n, -1) if partial else table[n]
+                if dist >= 0 and (best is None or dist < best_dist):
+                    best, best_dist = (exit_dx, exit_dy), dist
+        if best is None and partial and not table.complete:
+            tx, ty = target
+            for d, (exit_dx, exit_dy) in enumerate(MOVE_DIRECTIONS):
+                if mask & DIR_BITS[d]:
+                    dist = (mx + exit_dx - tx) ** 2 + (my + exit_dy - ty) ** 2
+                    if best is None or dist < best_dist:
+                        best, best_dist = (exit_dx, exit_dy), dist
+        return best
+
+def find_start_positions(maze):
+    """Returns the player start tile and the ghost start tiles (one per ghost color)."""
+    # Player starts on the first non-wall tile
+    player_start = (1, 1) # Default
+    for r in range(maze.height):
+        for c in range(maze.width):
+             if maze.cell(c, r) != CELL_WALL:
+                 player_start = (c, r)
+                 break
+        else: continue
+        break
+
+    # Ghosts take the next non-wall tiles that aren't too close to the player
+    ghost_starts = []
+    for r in range(maze.height):
+        for c in range(maze.width):
+             if maze.cell(c, r) != CELL_WALL and (c, r) != player_start:
+                  if abs(c - player_start[0]) + abs(r - player_start[1]) < 3: continue
+                  ghost_starts.append((c, r))
+                  if len(ghost_starts) == len(COLOR_GHOSTS): return player_start, ghost_starts
+    return player_start, ghost_starts
+
+def swarm_start_positions(maze, player_start, count, rng):
+    """Random open tiles away from the player for `count` swarm ghosts (tiles may repeat)."""
+    px, py = player_start
+    tiles = [(c, r) for r in range(maze.height) for c in range(maze.width)
+             if maze.cell(c, r) != CELL_WALL and abs(c - px) + abs(r - py) >= SWARM_SPAWN_DISTANCE]
+    return [rng.choice(tiles) for _ in range(count)]
+
+def tiled_layout(layout, copies_x, copies_y):
+    """A bigger maze made of copies of layout, e.g. to give a swarm room."""
+    return [row * copies_x for _ in range(copies_y) for row in layout]
+
+# --- Collision Broadphase ---
+class SpatialHash:
+    """Uniform grid of entity buckets keyed on maze tile.
+
+    Entities are filed under their current tile and remember the bucket
+    (Entity.grid_cell), so move() does nothing until the tile changes.
+    Entities are smaller than a tile, so anything touching an entity is in
+    one of the 3x3 tiles around it. Only occupied tiles have a bucket, so
+    huge levels cost nothing extra.
+    """
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.buckets = {} # my * width + mx -> entities on that tile
+        self.offsets = [dx + dy * width for dy in (-1, 0, 1) for dx in (-1, 0, 1)] # 3x3 block around a tile
+
+    def clear(self):
+        self.buckets.clear()
+
+    def rebuild(self, entities):
+        self.clear()
+        for e in entities:
+            self.insert(e)
+
+    def insert(self, entity):
+        i = entity.current_my * self.width + entity.current_mx
+        bucket = self.buckets.get(i)
+        if bucket is None:
+            bucket = self.buckets[i] = []
+        bucket.append(entity)
+        entity.grid_cell = i
+
+    def move(self, entity):
+        """Refiles an entity after it moved; cheap unless it entered a new tile."""
+        if entity.current_my * self.width + entity.current_mx != entity.grid_cell:
+            bucket = self.buckets[entity.grid_cell]
+            bucket.remove(entity)
+            if not bucket:
+                del self.buckets[entity.grid_cell]
+            self.insert(entity)
+
+    def nearby(self, mx, my):
+        """Entities filed in the 3x3 tiles around (mx, my)."""
+        buckets = self.buckets
+        if 0 < mx < self.width - 1 and 0 < my < self.height - 1: # Whole block inside the maze
+            i = my * self.width + mx
+            for offset in self.offsets:
+                bucket = buckets.get(i + offset)
+                if bucket:
+                    yield from bucket
+            return
+        for y in range(max(0, my - 1), min(self.height, my + 2)):
+            row = y * self.width
+            for x in range(max(0, mx - 1), min(self.width, mx + 2)):
+                bucket = buckets.get(row + x)
+                if bucket:
+                    yield from bucket
+
+    def in_area(self, mx0, my0, mx1, my1):
+        """Entities filed on tiles mx0..mx1 x my0..my1 (inclusive), walking whichever is
+        smaller: the tiles of the area or the occupied buckets."""
+        buckets = self.buckets
+        if (mx1 - mx0 + 1) * (my1 - my0 + 1) > len(buckets):
+            for i, bucket in buckets.items():
+                if mx0 <= i % self.width <= mx1 and my0 <= i // self.width <= my1:
+                    yield from bucket
+            return
+        for my in range(max(0, my0), min(self.height, my1 + 1)):
+            row = my * self.width
+            for mx in range(max(0, mx0), min(self.width, mx1 + 1)):
+                bucket = buckets.get(row + mx)
+                if bucket:
+                    yield from bucket
+
+def entities_overlap(a, b):
+    """Same answer as colliderect on both entities' bounding box Rects, without building them."""
+    ax, ay, asize = int(a.px - a.radius), int(a.py - a.radius), int(a.radius * 2)
+    bx, by, bsize = int(b.px - b.radius), int(b.py - b.radius), int(b.radius * 2)
+    return ax < bx + bsize and bx < ax + asize and ay < by + bsize and by < ay + asize
 
 # --- Base Entity Class ---
 class Entity:
-    def __init__(self, mx, my, radius, speed, color):
+    __slots__ = ("maze", "start_mx", "start_my", "px", "py", "radius", "speed", "color",
+                 "dx", "dy", "current_mx", "current_my", "lane", "ux", "uy", "lane_speed", "grid_cell")
+
+    def __init__(self, maze, mx, my, radius, speed, color, movement=MOVEMENT_PIXEL):
+        self.maze = maze
         self.start_mx, self.start_my = mx, my
         self.px, self.py = maze_to_pixel_center(mx, my)
         self.radius = radius
@@ -107,85 +611,204 @@ class Entity:
         self.dx = 0 # velocity in pixels per frame
         self.dy = 0
         self.current_mx, self.current_my = mx, my
+        # Lane engine state: integer position in lane units, px/py mirror it for drawing
+        self.lane = movement == MOVEMENT_LANE
+        self.ux = self.px * LANE_UNITS_PER_PIXEL
+        self.uy = self.py * LANE_UNITS_PER_PIXEL
+        self.lane_speed = round(speed * LANE_UNITS_PER_PIXEL)
+        self.grid_cell = -1 # SpatialHash bucket this entity is filed under
 
     def update_maze_pos(self):
-        self.current_mx, self.current_my = pixel_to_maze(self.px, self.py)
+        self.current_mx, self.current_my = self.maze.pixel_to_maze(self.px, self.py)
+
+    def centered_axes(self):
+        """(is_centered_x, is_centered_y): within half a frame's movement of the tile center."""
+        if self.lane:
+            center = LANE_TILE // 2
+            return (abs(self.ux - self.current_mx * LANE_TILE - center) * 2 < self.lane_speed,
+                    abs(self.uy - self.current_my * LANE_TILE - center) * 2 < self.lane_speed)
+        center_x, center_y = maze_to_pixel_center(self.current_mx, self.current_my)
+        return abs(self.px - center_x) < self.speed * 0.5, abs(self.py - center_y) < self.speed * 0.5
+
+    def snap_to_center(self, snap_x=True, snap_y=True):
+        center_x, center_y = maze_to_pixel_center(self.current_mx, self.current_my)
+        if snap_x:
+            self.px = center_x
+            self.ux = center_x * LANE_UNITS_PER_PIXEL
+        if snap_y:
+            self.py = center_y
+            self.uy = center_y * LANE_UNITS_PER_PIXEL
+
+    def move(self):
+        """Advances one frame with the entity's movement engine."""
+        if self.lane:
+            self.move_along_lane()
+        else:
+            self.move_and_collide()
+
+    def get_snapshot(self):
+        """Movement state as a flat tuple (see restore_snapshot)."""
+        return (self.px, self.py, self.dx, self.dy, self.current_mx, self.current_my)
+
+    def restore_snapshot(self, snapshot):
+        self.px, self.py, self.dx, self.dy, self.current_mx, self.current_my = snapshot
+        self.ux = round(self.px * LANE_UNITS_PER_PIXEL)
+        self.uy = round(self.py * LANE_UNITS_PER_PIXEL)
 
     def move_and_collide(self):
         """Handles movement, wall collision, and tunnel wrapping."""
         # --- X-Axis Movement and Collision ---
-        self.px += self.dx
+        self.px = round(self.px + self.dx, POSITION_DECIMALS)
         sign_x = 1 if self.dx > 0 else -1 if self.dx < 0 else 0
         if sign_x != 0:
             # Check collision using corners in the direction of movement
             check_x_edge = self.px + sign_x * self.radius
             for y_offset in [-self.radius * 0.9, self.radius * 0.9]: # Check near top/bottom edges
-                collided_mx, collided_my = pixel_to_maze(check_x_edge, self.py + y_offset)
-                if is_wall(collided_mx, collided_my):
+                collided_mx, collided_my = self.maze.pixel_to_maze(check_x_edge, self.py + y_offset)
+                if self.maze.is_wall(collided_mx, collided_my):
                     # Collision detected! Snap back to the wall edge
                     if sign_x > 0: # Moving right
-                        self.px = collided_mx * TILE_SIZE - self.radius - 0.01 # Place just left of wall
+                        self.px = round(collided_mx * TILE_SIZE - self.radius - 0.01, POSITION_DECIMALS) # Place just left of wall
                     else: # Moving left
-                        self.px = (collided_mx + 1) * TILE_SIZE + self.radius + 0.01 # Place just right of wall
+                        self.px = round((collided_mx + 1) * TILE_SIZE + self.radius + 0.01, POSITION_DECIMALS) # Place just right of wall
                     self.dx = 0 # Stop horizontal movement
                     break # Stop checking after first collision on this axis
 
         # --- Y-Axis Movement and Collision ---
-        self.py += self.dy
+        self.py = round(self.py + self.dy, POSITION_DECIMALS)
         sign_y = 1 if self.dy > 0 else -1 if self.dy < 0 else 0
         if sign_y != 0:
             # Check collision using corners in the direction of movement
             check_y_edge = self.py + sign_y * self.radius
             for x_offset in [-self.radius * 0.9, self.radius * 0.9]: # Check near left/right edges
-                collided_mx, collided_my = pixel_to_maze(self.px + x_offset, check_y_edge)
-                if is_wall(collided_mx, collided_my):
+                collided_mx, collided_my = self.maze.pixel_to_maze(self.px + x_offset, check_y_edge)
+                if self.maze.is_wall(collided_mx, collided_my):
                     # Collision detected! Snap back to the wall edge
                     if sign_y > 0: # Moving down
-                        self.py = collided_my * TILE_SIZE - self.radius - 0.01 # Place just above wall
+                        self.py = round(collided_my * TILE_SIZE - self.radius - 0.01, POSITION_DECIMALS) # Place just above wall
                     else: # Moving up
-                        self.py = (collided_my + 1) * TILE_SIZE + self.radius + 0.01 # Place just below wall
+                        self.py = round((collided_my + 1) * TILE_SIZE + self.radius + 0.01, POSITION_DECIMALS) # Place just below wall
                     self.dy = 0 # Stop vertical movement
                     break # Stop checking after first collision on this axis
 
         # --- Tunnel Wrapping ---
         self.update_maze_pos() # Get current tile after movement/collision checks
-        if 0 <= self.current_my < MAZE_H_TILES and MAZE_LAYOUT[self.current_my][self.current_mx] == 5:
+        if self.maze.cell(self.current_mx, self.current_my) == CELL_TUNNEL:
             if self.px < TILE_SIZE / 2: # Went off left edge
-                self.px = (MAZE_W_TILES - 1) * TILE_SIZE - TILE_SIZE / 2 # Appear on right
-            elif self.px > SCREEN_WIDTH - TILE_SIZE / 2: # Went off right edge
+                self.px = (self.maze.width - 1) * TILE_SIZE - TILE_SIZE / 2 # Appear on right
+            elif self.px > self.maze.width * TILE_SIZE - TILE_SIZE / 2: # Went off right edge
                 self.px = TILE_SIZE / 2 # Appear on left
 
         self.update_maze_pos() # Update maze coords again after potential wrap
 
-    def draw(self, surface):
-        pygame.draw.circle(surface, self.color, (int(self.px), int(self.py)), int(self.radius))
+    def move_along_lane(self):
+        """move_and_collide in integer lane units: the same steps, wall stops and tunnel wraps.
+
+        Entities only ever move along one axis and stay within half a step of
+        the tile center line across it (turns need that much centering), so
+        both corner probes of move_and_collide always land in the entity's own
+        row or column: one tile lookup at the leading edge does the same job.
+        A wall stops the entity just short of touching it, like the probes
+        do, which is a little past the last tile center.
+        """
+        maze = self.maze
+        edge = self.radius * LANE_UNITS_PER_PIXEL
+        last_mx, last_my = maze.width - 1, maze.height - 1
+        if self.dx != 0:
+            self.ux += self.lane_speed if self.dx > 0 else -self.lane_speed
+            my = max(0, min(self.uy // LANE_TILE, last_my))
+            if self.dx > 0:
+                wall_mx = max(0, min((self.ux + edge) // LANE_TILE, last_mx))
+                if maze.is_wall(wall_mx, my):
+                    self.ux = wall_mx * LANE_TILE - edge - 1 # Place just left of wall
+                    self.dx = 0 # Stop horizontal movement
+            else:
+                wall_mx = max(0, min((self.ux - edge) // LANE_TILE, last_mx))
+                if maze.is_wall(wall_mx, my):
+                    self.ux = (wall_mx + 1) * LANE_TILE + edge + 1 # Place just right of wall
+                    self.dx = 0
+        if self.dy != 0:
+            self.uy += self.lane_speed if self.dy > 0 else -self.lane_speed
+            mx = max(0, min(self.ux // LANE_TILE, last_mx))
+            if self.dy > 0:
+                wall_my = max(0, min((self.uy + edge) // LANE_TILE, last_my))
+                if maze.is_wall(mx, wall_my):
+                    self.uy = wall_my * LANE_TILE - edge - 1 # Place just above wall
+                    self.dy = 0 # Stop vertical movement
+            else:
+                wall_my = max(0, min((self.uy - edge) // LANE_TILE, last_my))
+                if maze.is_wall(mx, wall_my):
+                    self.uy = (wall_my + 1) * LANE_TILE + edge + 1 # Place just below wall
+                    self.dy = 0
+
+        # --- Tunnel Wrapping ---
+        half = LANE_TILE // 2
+        mx = max(0, min(self.ux // LANE_TILE, last_mx))
+        my = max(0, min(self.uy // LANE_TILE, last_my))
+        if maze.cell(mx, my) == CELL_TUNNEL:
+            if self.ux < half: # Went off left edge
+                self.ux = last_mx * LANE_TILE - half # Appear on right
+            elif self.ux > maze.width * LANE_TILE - half: # Went off right edge
+                self.ux = half # Appear on left
+
+        self.px = self.ux / LANE_UNITS_PER_PIXEL
+        self.py = self.uy / LANE_UNITS_PER_PIXEL
+        self.current_mx = max(0, min(self.ux // LANE_TILE, last_mx))
+        self.current_my = max(0, min(self.uy // LANE_TILE, last_my))
+
+    def draw(self, surface, offset=(0, 0)):
+        """Draws the entity, shifted by offset (the negated camera position when scrolling)."""
+        pygame.draw.circle(surface, self.color, (int(self.px) + offset[0], int(self.py) + offset[1]), int(self.radius))
+
+    def get_draw_rect(self):
+        """Screen area touched by draw(), with a pixel of slack for rounding."""
+        r = int(self.radius)
+        return pygame.Rect(int(self.px) - r - 1, int(self.py) - r - 1, r * 2 + 3, r * 2 + 3)
 
 # --- Player Class ---
 class Player(Entity):
-    def __init__(self, mx, my):
-        super().__init__(mx, my, TILE_SIZE // 2 - 2, PLAYER_SPEED, COLOR_PLAYER)
+    __slots__ = ("queued_dx", "queued_dy", "score", "eaten_pellets")
+
+    def __init__(self, maze, mx, my, movement=MOVEMENT_PIXEL):
+        super().__init__(maze, mx, my, ENTITY_RADIUS, PLAYER_SPEED, COLOR_PLAYER, movement)
         self.queued_dx = 0
         self.queued_dy = 0
         self.score = 0
+        self.eaten_pellets = [] # Cells eaten since the pellet layer was last patched
+
+    def get_snapshot(self):
+        return super().get_snapshot() + (self.queued_dx, self.queued_dy, self.score)
+
+    def restore_snapshot(self, snapshot):
+        super().restore_snapshot(snapshot[:6])
+        self.queued_dx, self.queued_dy, self.score = snapshot[6:]
+        self.eaten_pellets.clear()
 
     def handle_input(self):
+        self.apply_action(self.read_action())
+
+    def read_action(self):
+        """Maps the arrow keys currently held to an ACTION_* value."""
         keys = pygame.key.get_pressed()
-        move_x = 0
-        move_y = 0
+        action = ACTION_NONE
 
-        if keys[pygame.K_LEFT]: move_x = -1
-        elif keys[pygame.K_RIGHT]: move_x = 1
-        elif keys[pygame.K_UP]: move_y = -1
-        elif keys[pygame.K_DOWN]: move_y = 1
+        if keys[pygame.K_LEFT]: action = ACTION_LEFT
+        elif keys[pygame.K_RIGHT]: action = ACTION_RIGHT
+        elif keys[pygame.K_UP]: action = ACTION_UP
+        elif keys[pygame.K_DOWN]: action = ACTION_DOWN
 
-        if move_x != 0 or move_y != 0:
+        return action
+
+    def apply_action(self, action):
+        """Queues the direction for an ACTION_* value (ACTION_NONE keeps the current queue)."""
+        if action in ACTION_DIRECTIONS:
+            move_x, move_y = ACTION_DIRECTIONS[action]
             self.queued_dx = move_x * self.speed
             self.queued_dy = move_y * self.speed
 
     def update(self):
         # --- Try to apply queued direction if at center ---
-        is_centered_x = abs(self.px - maze_to_pixel_center(self.current_mx, self.current_my)[0]) < self.speed * 0.5
-        is_centered_y = abs(self.py - maze_to_pixel_center(self.current_mx, self.current_my)[1]) < self.speed * 0.5
+        is_centered_x, is_centered_y = self.centered_axes()
 
         if self.queued_dx != 0 or self.queued_dy != 0:
             # Check if the turn is valid from the current tile center
@@ -206,12 +829,10 @@ class Player(Entity):
                  can_turn = True # Allow reversal anytime (classic behavior)
 
 
-            if can_turn and not is_wall(next_turn_mx, next_turn_my):
+            if can_turn and not self.maze.is_wall(next_turn_mx, next_turn_my):
                  # Snap to center and apply new direction
-                 if self.dx == 0: # If was moving vertically or stopped, snap X
-                     self.px = maze_to_pixel_center(self.current_mx, self.current_my)[0]
-                 if self.dy == 0: # If was moving horizontally or stopped, snap Y
-                     self.py = maze_to_pixel_center(self.current_mx, self.current_my)[1]
+                 # (X if was moving vertically or stopped, Y if was moving horizontally or stopped)
+                 self.snap_to_center(self.dx == 0, self.dy == 0)
 
                  self.dx = self.queued_dx
                  self.dy = self.queued_dy
@@ -219,49 +840,63 @@ class Player(Entity):
                  self.queued_dy = 0
 
         # --- Movement and Collision ---
-        self.move_and_collide()
+        self.move()
 
         # --- Pellet Collection ---
-        if (self.current_mx, self.current_my) in pellet_positions:
-            pellet_positions.remove((self.current_mx, self.current_my))
+        if self.maze.eat_pellet(self.current_mx, self.current_my):
+            self.eaten_pellets.append((self.current_mx, self.current_my))
             self.score += 10
-            # print(f"Score: {self.score}, Pellets left: {len(pellet_positions)}") # Debug
+            # print(f"Score: {self.score}, Pellets left: {self.maze.pellet_count}") # Debug
 
 
 # --- Ghost Class ---
 class Ghost(Entity):
-    def __init__(self, mx, my, color):
-        super().__init__(mx, my, TILE_SIZE // 2 - 2, GHOST_SPEED, color)
+    __slots__ = ("rng", "maze_graph", "distance_fields", "mode", "target_tile", "direction_timer")
+
+    def __init__(self, maze, mx, my, color, rng=random, distance_fields=None, movement=MOVEMENT_PIXEL):
+        super().__init__(maze, mx, my, ENTITY_RADIUS, GHOST_SPEED, color, movement)
+        self.rng = rng # Owning game's RNG so seeded games stay independent
+        self.maze_graph = maze.graph # Compiled once per maze and shared by every ghost
+        self.distance_fields = distance_fields # Needed for scatter/chase targeting
+        self.mode = GHOST_MODE_RANDOM
+        self.target_tile = None # Tile to head for in scatter/chase mode, set by Game
         self.direction_timer = 0 # Timer to decide new direction
         self.choose_new_direction() # Set initial direction
 
+    def get_snapshot(self):
+        return super().get_snapshot() + (self.mode, self.target_tile, self.direction_timer)
+
+    def restore_snapshot(self, snapshot):
+        super().restore_snapshot(snapshot[:6])
+        self.mode, self.target_tile, self.direction_timer = snapshot[6:]
+
     def choose_new_direction(self):
-        """Chooses a random valid direction, attempting not to reverse."""
-        valid_tiles = get_valid_moves(self.current_mx, self.current_my)
+        """Heads for the target tile when targeting, else a random valid direction, attempting not to reverse."""
+        if self.mode != GHOST_MODE_RANDOM and self.target_tile is not None and self.distance_fields:
+            best = self.distance_fields.best_exit(self.current_mx, self.current_my, self.target_tile, self.dx, self.dy)
+            if best:
+                self.dx, self.dy = best[0] * self.speed, best[1] * self.speed
+                return
+        valid_dirs = self.maze_graph.exits(self.current_mx, self.current_my)
         possible_moves = [] # (dx, dy) pairs
 
         current_dir_x = 1 if self.dx > 0 else -1 if self.dx < 0 else 0
         current_dir_y = 1 if self.dy > 0 else -1 if self.dy < 0 else 0
 
-        for next_mx, next_my in valid_tiles:
-            move_dir_x = next_mx - self.current_mx
-            move_dir_y = next_my - self.current_my
-
+        for move_dir_x, move_dir_y in valid_dirs:
             # Avoid reversing if possible (more than 1 option available)
             is_reverse = (move_dir_x == -current_dir_x and move_dir_y == -current_dir_y)
-            if len(valid_tiles) > 1 and is_reverse:
+            if len(valid_dirs) > 1 and is_reverse:
                  continue
 
             possible_moves.append((move_dir_x * self.speed, move_dir_y * self.speed))
 
         if possible_moves:
-            self.dx, self.dy = random.choice(possible_moves)
+            self.dx, self.dy = self.rng.choice(possible_moves)
         else: # Dead end, must reverse or stop
             # Find the reversing move if it exists
             reversed_move = None
-            for next_mx, next_my in valid_tiles:
-                 move_dir_x = next_mx - self.current_mx
-                 move_dir_y = next_my - self.current_my
+            for move_dir_x, move_dir_y in valid_dirs:
                  if move_dir_x == -current_dir_x and move_dir_y == -current_dir_y:
                      reversed_move = (move_dir_x * self.speed, move_dir_y * self.speed)
                      break
@@ -271,156 +906,1099 @@ class Ghost(Entity):
                 self.dx, self.dy = 0, 0
 
 
-        self.direction_timer = random.randint(15, 45) # Frames until next decision
+        self.direction_timer = self.rng.randint(15, 45) # Frames until next decision
 
     def update(self):
         # --- Decision Making at Center ---
-        is_centered_x = abs(self.px - maze_to_pixel_center(self.current_mx, self.current_my)[0]) < self.speed * 0.5
-        is_centered_y = abs(self.py - maze_to_pixel_center(self.current_mx, self.current_my)[1]) < self.speed * 0.5
+        is_centered_x, is_centered_y = self.centered_axes()
 
         if is_centered_x and is_centered_y:
             # Snap to center
-            self.px, self.py = maze_to_pixel_center(self.current_mx, self.current_my)
-            # Decide new direction
-            self.choose_new_direction()
+            self.snap_to_center()
+            # Decide new direction, unless the corridor only goes one way on
+            if self.maze_graph.needs_decision(self.current_mx, self.current_my, self.dx, self.dy):
+                self.choose_new_direction()
 
         # --- Movement and Collision ---
-        self.move_and_collide()
+        self.move()
+
+
+# --- Scrolling View ---
+class MazeChunks:
+    """Pre-rendered CHUNK_TILES square pieces of a level too big for one surface.
+
+    Chunks (walls, tunnels and pellets) are rendered the first time they come
+    into view and dropped again by evict_far() once the camera has moved on,
+    so memory and build work follow the camera, not the level size.
+    """
+    def __init__(self, maze):
+        self.maze = maze
+        self.chunk_px = CHUNK_TILES * TILE_SIZE
+        self.surfaces = {} # (cx, cy) -> Surface
+        self.builds = 0 # Chunks rendered so far, for profiling
+
+    def clear(self):
+        self.surfaces.clear()
+
+    def get(self, cx, cy):
+        surface = self.surfaces.get((cx, cy))
+        if surface is None:
+            surface = self.surfaces[(cx, cy)] = self.build(cx, cy)
+        return surface
+
+    def build(self, cx, cy):
+        maze = self.maze
+        surface = pygame.Surface((self.chunk_px, self.chunk_px)).convert()
+        surface.fill(COLOR_BG)
+        pellet_radius = TILE_SIZE // 8
+        x0, y0 = cx * CHUNK_TILES, cy * CHUNK_TILES
+        for my in range(y0, min(y0 + CHUNK_TILES, maze.height)):
+            for mx in range(x0, min(x0 + CHUNK_TILES, maze.width)):
+                x, y = (mx - x0) * TILE_SIZE, (my - y0) * TILE_SIZE
+                cell = maze.cell(mx, my)
+                if cell == CELL_WALL:
+                    surface.fill(COLOR_WALL, (x, y, TILE_SIZE, TILE_SIZE))
+                elif cell == CELL_TUNNEL:
+                    surface.fill(COLOR_TUNNEL, (x, y, TILE_SIZE, TILE_SIZE))
+                elif maze.has_pellet(mx, my):
+                    pygame.draw.circle(surface, COLOR_PELLET, (x + TILE_SIZE // 2, y + TILE_SIZE // 2), pellet_radius)
+        self.builds += 1
+        return surface
+
+    def erase_pellet(self, mx, my):
+        """Clears an eaten pellet from its chunk, if that chunk is currently built."""
+        surface = self.surfaces.get((mx // CHUNK_TILES, my // CHUNK_TILES))
+        if surface is not None:
+            surface.fill(COLOR_BG, ((mx % CHUNK_TILES) * TILE_SIZE, (my % CHUNK_TILES) * TILE_SIZE, TILE_SIZE, TILE_SIZE))
+
+    def evict_far(self, cx0, cy0, cx1, cy1):
+        """Drops chunks more than CHUNK_KEEP_DISTANCE chunks outside the visible range cx0..cx1 x cy0..cy1."""
+        keep = CHUNK_KEEP_DISTANCE
+        far = [key for key in self.surfaces
+               if not (cx0 - keep <= key[0] <= cx1 + keep and cy0 - keep <= key[1] <= cy1 + keep)]
+        for key in far:
+            del self.surfaces[key]
 
 
 # --- Game Class ---
 class Game:
-    def __init__(self):
-        pygame.init()
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-        pygame.display.set_caption("Pac-Man Zero Asset (Bandai Namco Style Test)")
-        self.clock = pygame.time.Clock()
-        self.font = pygame.font.SysFont(None, 28) # Basic font
+    def __init__(self, headless=False, seed=None, ghost_targeting=GHOST_TARGETING, movement=MOVEMENT_ENGINE,
+                 swarm=SWARM_GHOSTS, layout=MAZE_LAYOUT, maze_file=None):
+        """headless=True skips display setup and rendering; drive it with step()/reset().
+
+        swarm=N replaces the four ghosts with N randomly placed ones that bounce
+        off each other. maze_file loads a level file (see mazefile.py) instead
+        of layout; the window is sized to the level, up to MAX_VIEW_*_TILES.
+        """
+        self.headless = headless
+        self.ghost_targeting = ghost_targeting
+        self.movement = movement # MOVEMENT_PIXEL or MOVEMENT_LANE
+        self.swarm = swarm
+        self.seed = seed
+        self.rng = random.Random(seed) # Per-game RNG for ghost decisions
+        self.frame = 0
+        self.set_level(mazefile.load(maze_file) if maze_file else layout, maze_file)
+        if headless:
+            self.screen = None
+            self.clock = None
+            self.font = None
+        else:
+            pygame.init()
+            self.screen = pygame.display.set_mode((self.screen_width, self.screen_height))
+            pygame.display.set_caption("Pac-Man Zero Asset (Bandai Namco Style Test)")
+            self.clock = pygame.time.Clock()
+            self.font = pygame.font.SysFont(None, 28) # Basic font
         self.game_over = False
         self.win = False
+        self.maze_surface = None # Static background layer (walls + tunnels)
+        self.pellet_surface = None # Pellet layer, patched as pellets get eaten
+        self.maze_chunks = None # MazeChunks, replacing both layers on scrolling levels
+        self.camera_x = 0 # Maze pixel shown at the top-left of the window
+        self.camera_y = 0
+        self.drawn_chunk_range = None # (cx0, cy0, cx1, cy1) of the last scrolling frame
+        # Dirty-rectangle rendering state
+        self.dirty_rendering = DIRTY_RECT_RENDERING
+        self.full_redraw_pending = True # Next frame must be pushed in full (new level, mode switch, banner)
+        self.drawn_frozen = False # Whether the frame on screen shows the game over/win banner
+        self.sprite_rects = [] # Entity rects drawn in the previous frame
+        self.score_rect = pygame.Rect(0, 0, 0, 0) # Where the score was drawn last
+        self.drawn_score = None
+        self.recorder = None # ReplayRecorder capturing run()'s inputs, if any
+        # Phase timing for run(); disabled (and nearly free) until --profile or F3
+        self.profiler = profiler.FrameProfiler(PROFILE_PHASES, budget_ms=FRAME_BUDGET_MS, export_path=PROFILE_EXPORT_PATH)
+        self.start_game()
+
+    def set_level(self, layout, maze_file=None):
+        """Switches to a layout or mazefile.CompiledMaze; call start_game() afterwards."""
+        self.maze_file = maze_file
+        self.maze = Maze(layout) # Owned by this game, pellets included
+        self.maze_graph = self.maze.graph # Compiled once, the layout never changes mid-level
+        self.distance_fields = DistanceFields(self.maze_graph)
+        self.spatial_hash = SpatialHash(self.maze.width, self.maze.height) # Ghosts by tile, for collisions
+        # Scatter corners: top-right, top-left, bottom-right, bottom-left (snapped to open tiles)
+        right, bottom = self.maze.width - 1, self.maze.height - 1
+        self.scatter_tiles = [self.maze_graph.nearest_open_tile(mx, my) for mx, my in
+                              [(right, 0), (0, 0), (right, bottom), (0, bottom)]]
+        self.distance_fields.precompute(self.scatter_tiles) # Fixed for the level; chase targets are searched as they come
+        self.view_w_tiles = min(self.maze.width, MAX_VIEW_W_TILES)
+        self.view_h_tiles = min(self.maze.height, MAX_VIEW_H_TILES)
+        self.screen_width = self.view_w_tiles * TILE_SIZE
+        self.screen_height = (self.view_h_tiles + 3) * TILE_SIZE # Extra space for score/lives
+        self.scrolling = self.maze.width > self.view_w_tiles or self.maze.height > self.view_h_tiles
+
+    def load_level(self, maze_file):
+        """Loads a level file (compiled and cached on first use) and starts a game on it."""
+        self.set_level(mazefile.load(maze_file), maze_file)
+        if not self.headless and self.screen.get_size() != (self.screen_width, self.screen_height):
+            self.screen = pygame.display.set_mode((self.screen_width, self.screen_height))
         self.start_game()
 
     def start_game(self):
         """Initializes or restarts the game state."""
-        initialize_pellets()
+        self.maze.reset_pellets()
         self.game_over = False
         self.win = False
-        # Find a valid starting position for the player (first non-wall tile)
-        player_start_mx, player_start_my = 1, 1 # Default
-        for r in range(MAZE_H_TILES):
-            for c in range(MAZE_W_TILES):
-                 if MAZE_LAYOUT[r][c] != 1:
-                     player_start_mx, player_start_my = c, r
-                     break
-            else: continue
-            break
-        self.player = Player(player_start_mx, player_start_my)
-
-        # Find valid starting positions for ghosts (e.g., near center, non-wall)
-        ghost_starts = [(13, 10), (14, 10), (13, 11), (14, 11)] # Example positions near center
-        self.ghosts = []
-        valid_ghost_starts_found = 0
-        current_ghost_index = 0
-        for r in range(MAZE_H_TILES):
-            for c in range(MAZE_W_TILES):
-                 if MAZE_LAYOUT[r][c] != 1 and (c,r) != (player_start_mx, player_start_my) and valid_ghost_starts_found < len(COLOR_GHOSTS):
-                      # Use distinct starting points if possible
-                      start_pos = (c,r)
-                      # Quick check if too close to player start
-                      if abs(c - player_start_mx) + abs(r - player_start_my) < 3: continue
-
-                      self.ghosts.append(Ghost(start_pos[0], start_pos[1], COLOR_GHOSTS[current_ghost_index]))
-                      valid_ghost_starts_found += 1
-                      current_ghost_index += 1
-                      if valid_ghost_starts_found == len(COLOR_GHOSTS): break # Stop once all ghosts are placed
-            if valid_ghost_starts_found == len(COLOR_GHOSTS): break
+        self.frame = 0
+        player_start, ghost_starts = find_start_positions(self.maze)
+        if self.swarm:
+            ghost_starts = swarm_start_positions(self.maze, player_start, self.swarm, self.rng)
+        self.player = Player(self.maze, *player_start, movement=self.movement)
+        self.ghosts = [Ghost(self.maze, mx, my, COLOR_GHOSTS[i % len(COLOR_GHOSTS)], self.rng, self.distance_fields, self.movement)
+                       for i, (mx, my) in enumerate(ghost_starts)]
+        self.spatial_hash.rebuild(self.ghosts)
 
+        if not self.headless:
+            self.build_maze_layers()
+        self.full_redraw_pending = True
 
-    def draw_maze(self):
-        # Draw Walls and Tunnels first
-        for r in range(MAZE_H_TILES):
-            for c in range(MAZE_W_TILES):
-                cell = MAZE_LAYOUT[r][c]
-                rect = pygame.Rect(c * TILE_SIZE, r * TILE_SIZE, TILE_SIZE, TILE_SIZE)
-                if cell == 1:
-                    pygame.draw.rect(self.screen, COLOR_WALL, rect)
-                elif cell == 5:
-                    pygame.draw.rect(self.screen, COLOR_TUNNEL, rect) # Optional tunnel background
-
-        # Draw Pellets
+    def reset(self, seed=None):
+        """Restarts the game, reseeding the RNG when a seed is given. Returns the new state."""
+        if seed is not None:
+            self.seed = seed
+            self.rng.seed(seed)
+        self.start_game()
+        return self.get_state()
+
+    def step(self, action=ACTION_NONE):
+        """Advances one frame with a programmatic ACTION_* input, unthrottled. Returns the new state."""
+        if not self.game_over and not self.win:
+            self.player.apply_action(action)
+            self.update()
+        if self.headless:
+            self.player.eaten_pellets.clear() # No pellet layer to patch
+        return self.get_state()
+
+    def snapshot(self, include_rng=False):
+        """Captures the game state for restore().
+
+        Pellets are a ~100 byte bitset and entities a few numbers each. The
+        RNG state (about 2.5 KB) is left out unless include_rng is set; pass
+        it when ghosts must draw the same random numbers after the restore.
+        """
+        return (self.frame, self.game_over, self.win, self.maze.snapshot_pellets(),
+                self.player.get_snapshot(), tuple(g.get_snapshot() for g in self.ghosts),
+                self.rng.getstate() if include_rng else None)
+
+    def restore(self, snapshot):
+        """Rewinds to a state captured by snapshot() on this game."""
+        self.frame, self.game_over, self.win, pellets, player, ghosts, rng_state = snapshot
+        self.maze.restore_pellets(pellets)
+        self.player.restore_snapshot(player)
+        for g, ghost in zip(self.ghosts, ghosts):
+            g.restore_snapshot(ghost)
+        self.spatial_hash.rebuild(self.ghosts)
+        if rng_state is not None:
+            self.rng.setstate(rng_state)
+        if not self.headless:
+            self.build_pellet_layer()
+            self.full_redraw_pending = True
+
+    def snapshot_bytes(self):
+        """snapshot() packed into a compact binary blob."""
+        frame, game_over, win, (pellet_bits, pellet_count), player, ghosts, _ = self.snapshot()
+        parts = [SNAPSHOT_HEADER.pack(frame, game_over, win, pellet_count), pellet_bits, PLAYER_SNAPSHOT.pack(*player)]
+        for px, py, dx, dy, mx, my, mode, target, timer in ghosts:
+            target_mx, target_my = target if target is not None else (-1, -1)
+            parts.append(GHOST_SNAPSHOT.pack(px, py, dx, dy, mx, my, GHOST_MODES.index(mode), target_mx, target_my, timer))
+        return b"".join(parts)
+
+    def restore_bytes(self, data):
+        """Restores a blob from snapshot_bytes(); the RNG is left untouched."""
+        frame, game_over, win, pellet_count = SNAPSHOT_HEADER.unpack_from(data)
+        pos = SNAPSHOT_HEADER.size
+        pellet_bits = data[pos:pos + len(self.maze.pellet_bits)]
+        pos += len(pellet_bits)
+        player = PLAYER_SNAPSHOT.unpack_from(data, pos)
+        pos += PLAYER_SNAPSHOT.size
+        ghosts = []
+        for _ in self.ghosts:
+            px, py, dx, dy, mx, my, mode, target_mx, target_my, timer = GHOST_SNAPSHOT.unpack_from(data, pos)
+            pos += GHOST_SNAPSHOT.size
+            target = (target_mx, target_my) if target_mx >= 0 else None
+            ghosts.append((px, py, dx, dy, mx, my, GHOST_MODES[mode], target, timer))
+        self.restore((frame, game_over, win, (pellet_bits, pellet_count), player, ghosts, None))
+
+    def ghost_mode(self):
+        """Current scatter/chase phase from GHOST_MODE_SCHEDULE."""
+        frame = self.frame
+        for mode, frames in GHOST_MODE_SCHEDULE:
+            if frames is None or frame < frames:
+                return mode
+            frame -= frames
+        return GHOST_MODE_CHASE
+
+    def update_ghost_targets(self):
+        """Sets each ghost's mode and target tile for this frame."""
+        mode = self.ghost_mode()
+        for i, g in enumerate(self.ghosts):
+            g.mode = mode
+            if mode == GHOST_MODE_SCATTER:
+                g.target_tile = self.scatter_tiles[i % len(self.scatter_tiles)]
+            else:
+                g.target_tile = self.chase_target(i)
+
+    def chase_target(self, index):
+        """Classic per-ghost chase tile: red hunts the player, pink ambushes ahead,
+        cyan flanks off the red ghost and orange backs off when close."""
+        player = self.player
+        pmx, pmy = player.current_mx, player.current_my
+        head_x = 1 if player.dx > 0 else -1 if player.dx < 0 else 0
+        head_y = 1 if player.dy > 0 else -1 if player.dy < 0 else 0
+        personality = index % 4
+        if personality == 1: # Pink: four tiles ahead of the player
+            target = (pmx + 4 * head_x, pmy + 4 * head_y)
+        elif personality == 2: # Cyan: two tiles ahead, doubled away from the red ghost
+            red = self.ghosts[0]
+            target = (2 * (pmx + 2 * head_x) - red.current_mx, 2 * (pmy + 2 * head_y) - red.current_my)
+        elif personality == 3: # Orange: chase from afar, scatter when within 8 tiles
+            ghost = self.ghosts[index]
+            if abs(ghost.current_mx - pmx) + abs(ghost.current_my - pmy) <= 8:
+                return self.scatter_tiles[index % len(self.scatter_tiles)]
+            target = (pmx, pmy)
+        else: # Red: straight at the player
+            target = (pmx, pmy)
+        return self.maze_graph.nearest_open_tile(*target)
+
+    def get_state(self):
+        """Snapshot of the simulation as plain Python values."""
+        return {
+            "frame": self.frame,
+            "player": (self.player.px, self.player.py, self.player.dx, self.player.dy),
+            "ghosts": [(g.px, g.py, g.dx, g.dy) for g in self.ghosts],
+            "score": self.player.score,
+            "pellets_left": self.maze.pellet_count,
+            "game_over": self.game_over,
+            "win": self.win,
+        }
+
+    def build_maze_layers(self):
+        """Pre-renders the static maze and the pellet layer once per level."""
+        if self.scrolling: # Too big to pre-render, chunks get built as they scroll into view
+            self.maze_chunks = MazeChunks(self.maze)
+            self.drawn_chunk_range = None
+            self.player.eaten_pellets.clear()
+            return
+        layer_path = self.layer_cache_path()
+        if layer_path and os.path.exists(layer_path) and os.path.getmtime(layer_path) >= os.path.getmtime(self.maze_file):
+            self.maze_surface = pygame.image.load(layer_path).convert()
+        else:
+            # Background covers the whole screen so blitting it also clears the frame
+            self.maze_surface = pygame.Surface((self.screen_width, self.screen_height)).convert()
+            self.maze_surface.fill(COLOR_BG)
+            for r in range(self.view_h_tiles):
+                for c in range(self.view_w_tiles):
+                    cell = self.maze.cell(c, r)
+                    if cell == CELL_WALL:
+                        self.maze_surface.fill(COLOR_WALL, (c * TILE_SIZE, r * TILE_SIZE, TILE_SIZE, TILE_SIZE))
+                    elif cell == CELL_TUNNEL:
+                        self.maze_surface.fill(COLOR_TUNNEL, (c * TILE_SIZE, r * TILE_SIZE, TILE_SIZE, TILE_SIZE)) # Optional tunnel background
+            if layer_path:
+                try:
+                    pygame.image.save(self.maze_surface, layer_path)
+                except (OSError, pygame.error):
+                    pass # Read-only level directory, just draw it again next time
+        self.build_pellet_layer()
+
+    def layer_cache_path(self):
+        """Where the static layer of a level file is cached, keyed by everything that changes its look."""
+        if not self.maze_file:
+            return None
+        key = zlib.crc32(repr((TILE_SIZE, self.screen_width, self.screen_height, COLOR_BG, COLOR_WALL, COLOR_TUNNEL)).encode())
+        return "%s.layer%08x.png" % (os.path.splitext(self.maze_file)[0], key)
+
+    def build_pellet_layer(self):
+        """Draws the remaining pellets onto their own layer."""
+        if self.scrolling:
+            self.maze_chunks.clear() # Pellets are baked into the chunks
+            self.player.eaten_pellets.clear()
+            return
+        # Pellets live on their own colorkeyed layer so eating one is a single small fill
+        self.pellet_surface = pygame.Surface((self.view_w_tiles * TILE_SIZE, self.view_h_tiles * TILE_SIZE)).convert()
+        self.pellet_surface.fill(COLOR_BG)
+        self.pellet_surface.set_colorkey(COLOR_BG)
         pellet_radius = TILE_SIZE // 8
-        for mx, my in pellet_positions:
-            cx, cy = maze_to_pixel_center(mx, my)
-            pygame.draw.circle(self.screen, COLOR_PELLET, (cx, cy), pellet_radius)
+        for mx, my in self.maze.pellet_cells():
+            if mx < self.view_w_tiles and my < self.view_h_tiles:
+                pygame.draw.circle(self.pellet_surface, COLOR_PELLET, maze_to_pixel_center(mx, my), pellet_radius)
+        self.player.eaten_pellets.clear()
 
-    def draw_ui(self):
-        score_text = self.font.render(f"Score: {self.player.score}", True, COLOR_WHITE)
-        text_rect = score_text.get_rect(topleft=(10, MAZE_H_TILES * TILE_SIZE + 10))
+    def update_pellet_layer(self):
+        """Erases pellets the player ate since the last frame; returns the patched tile rects."""
+        patched = []
+        for mx, my in self.player.eaten_pellets:
+            rect = pygame.Rect(mx * TILE_SIZE, my * TILE_SIZE, TILE_SIZE, TILE_SIZE)
+            self.pellet_surface.fill(COLOR_BG, rect)
+            patched.append(rect)
+        self.player.eaten_pellets.clear()
+        return patched
+
+    def restore_background(self, rect):
+        """Copies the maze and pellet layers back over a screen region."""
+        self.screen.blit(self.maze_surface, rect, rect)
+        self.screen.blit(self.pellet_surface, rect, rect)
+
+    def draw_maze(self):
+        self.update_pellet_layer()
+        self.screen.blit(self.maze_surface, (0, 0)) # Also clears the previous frame
+        self.screen.blit(self.pellet_surface, (0, 0))
+
+    def draw_score(self):
+        score_text = textcache.render_text(self.font, f"Score: {self.player.score}", COLOR_WHITE)
+        text_rect = score_text.get_rect(topleft=(10, self.view_h_tiles * TILE_SIZE + 10))
         self.screen.blit(score_text, text_rect)
+        self.score_rect = text_rect
+        self.drawn_score = self.player.score
+        return text_rect
+
+    def draw_ui(self):
+        self.draw_score()
 
         if self.game_over:
-             end_text = self.font.render("GAME OVER! Press R to Restart", True, COLOR_GHOSTS[0])
-             end_rect = end_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
-             # Draw a semi-transparent background for better readability
-             s = pygame.Surface((end_rect.width + 20, end_rect.height + 20), pygame.SRCALPHA)
-             s.fill((0,0,0,180))
-             self.screen.blit(s, (end_rect.left - 10, end_rect.top - 10))
-             self.screen.blit(end_text, end_rect)
+             self.draw_banner("GAME OVER! Press R to Restart", COLOR_GHOSTS[0])
 
         if self.win:
-             win_text = self.font.render("YOU WIN! Press R to Restart", True, COLOR_PLAYER)
-             win_rect = win_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
-             s = pygame.Surface((win_rect.width + 20, win_rect.height + 20), pygame.SRCALPHA)
-             s.fill((0,0,0,180))
-             self.screen.blit(s, (win_rect.left - 10, win_rect.top - 10))
-             self.screen.blit(win_text, win_rect)
-
-    def run(self):
-        while True:
+             self.draw_banner("YOU WIN! Press R to Restart", COLOR_PLAYER)
+
+    def draw_banner(self, message, color):
+        """Centered message on a semi-transparent box (both cached, they never change)."""
+        text = textcache.render_text(self.font, message, color)
+        text_rect = text.get_rect(center=(self.screen_width // 2, self.screen_height // 2))
+        # Draw a semi-transparent background for better readability
+        backdrop = textcache.overlay_surface((text_rect.width + 20, text_rect.height + 20), (0, 0, 0, 180))
+        self.screen.blit(backdrop, (text_rect.left - 10, text_rect.top - 10))
+        self.screen.blit(text, text_rect)
+
+    def draw_profiler(self):
+        """Ends the "draw" phase and draws the profiler overlay (its own phase) if it's shown."""
+        self.profiler.mark("draw")
+        self.profiler.draw(self.screen)
+        self.profiler.mark("overlay")
+
+    def run(self, sim_hz=FPS, render_fps=FPS, unthrottled=False):
+        """Plays interactively: fixed-rate simulation steps, frames drawn at render_fps (0 = uncapped)
+        with entities interpolated between steps. unthrottled runs a step per frame, flat out."""
+        prof = self.profiler
+        restart = False # R pressed; consumed by the next simulation step
+
+        def handle_events():
+            nonlocal restart
             # --- Event Handling ---
             for evt in pygame.event.get():
                 if evt.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
+                    return False
                 if evt.type == pygame.KEYDOWN:
                     if (self.game_over or self.win) and evt.key == pygame.K_r:
-                        self.start_game() # Restart the game
-
-            # --- Input ---
-            if not self.game_over and not self.win:
-                self.player.handle_input()
-
-            # --- Update ---
-            if not self.game_over and not self.win:
-                self.player.update()
-                for g in self.ghosts:
-                    g.update()
-
-                # --- Check Collisions ---
-                player_rect = pygame.Rect(self.player.px - self.player.radius, self.player.py - self.player.radius,
-                                          self.player.radius * 2, self.player.radius * 2)
-                for g in self.ghosts:
-                    ghost_rect = pygame.Rect(g.px - g.radius, g.py - g.radius, g.radius * 2, g.radius * 2)
-                    if player_rect.colliderect(ghost_rect):
-                        self.game_over = True
-                        # print("Game Over! Player collided with ghost.") # Debug
-                        break # No need to check other ghosts
-
-                # --- Check Win Condition ---
-                if not pellet_positions:
-                    self.win = True
-                    # print("You win! All pellets collected.") # Debug
+                        restart = True # Restart the game
+                    elif evt.key == pygame.K_F2: # Toggle dirty-rect / full-frame rendering
+                        self.dirty_rendering = not self.dirty_rendering
+                        self.full_redraw_pending = True
+                    elif evt.key == pygame.K_F3: # Toggle the profiler overlay
+                        prof.toggle_overlay()
+                        self.full_redraw_pending = True
+                    elif evt.key == pygame.K_F4 and prof.enabled: # Export the frame-time ring
+                        print("Wrote", prof.export(prof.export_path.format(frame=prof.frames)))
+            prof.mark("events")
+
+        def step():
+            nonlocal restart
+            # --- Input + Update ---
+            input_code = self.player.read_action() | (INPUT_RESTART if restart else 0)
+            restart = False
+            if self.recorder:
+                self.recorder.record_frame(input_code)
+            prof.mark("input")
+            self.previous_positions = [(e, e.px, e.py) for e in [self.player] + self.ghosts]
+            self.run_frame(input_code) # Marks player/ghosts/collide
 
+        def render(alpha):
             # --- Render ---
-            self.screen.fill(COLOR_BG)
-            self.draw_maze()
-            self.player.draw(self.screen)
-            for g in self.ghosts:
-                g.draw(self.screen)
-            self.draw_ui() # Draw score and game over/win messages
+            simulated = self.interpolate_entities(alpha)
+            self.render() # Marks draw/overlay
+            for e, px, py in simulated:
+                e.px, e.py = px, py
+            prof.mark("flip")
+
+        self.previous_positions = []
+        loop = gameloop.FixedStepLoop(sim_hz, render_fps, unthrottled=unthrottled, profiler=prof)
+        try:
+            loop.run(handle_events, step, render)
+        finally:
+            if self.recorder: # Even on a crash or Ctrl+C, so the replay up to here still loads
+                self.recorder.close()
+        pygame.quit()
+        sys.exit()
+
+    def interpolate_entities(self, alpha):
+        """Moves entities `alpha` of the way from their previous step's position to the current one,
+        for drawing only; returns (entity, px, py) to put the simulated positions back."""
+        simulated = []
+        if alpha >= 1.0:
+            return simulated
+        for e, px, py in self.previous_positions:
+            if abs(e.px - px) > TILE_SIZE or abs(e.py - py) > TILE_SIZE:
+                continue # Wrapped through a tunnel (or respawned): don't slide across the maze
+            simulated.append((e, e.px, e.py))
+            e.px = gameloop.lerp(px, e.px, alpha)
+            e.py = gameloop.lerp(py, e.py, alpha)
+        return simulated
+
+    def run_frame(self, input_code):
+        """Game logic for one loop iteration, driven by an input code (action | INPUT_RESTART)."""
+        if input_code & INPUT_RESTART and (self.game_over or self.win):
+            self.start_game()
+        if not self.game_over and not self.win:
+            self.player.apply_action(input_code & ~INPUT_RESTART)
+            self.update()
+
+    def update(self):
+        """Advances the simulation by one frame (movement, collisions, win check)."""
+        mark = self.profiler.mark
+        self.frame += 1
+        self.player.update()
+        mark("player")
+        self.update_ghosts()
+        mark("ghosts")
+        self.check_collisions()
+        self.check_win()
+        mark("collide")
+
+    def update_ghosts(self):
+        if self.ghost_targeting:
+            self.update_ghost_targets()
+        spatial_hash = self.spatial_hash
+        for g in self.ghosts:
+            g.update()
+            spatial_hash.move(g)
+
+    def check_win(self):
+        if self.maze.pellet_count == 0:
+            self.win = True
+            # print("You win! All pellets collected.") # Debug
+
+    def check_collisions(self):
+        """Player vs ghosts (game over) and, in swarm mode, ghost vs ghost."""
+        if self.swarm:
+            self.bounce_ghosts()
+        player = self.player
+        for g in self.spatial_hash.nearby(player.current_mx, player.current_my):
+            if entities_overlap(player, g):
+                self.game_over = True
+                # print("Game Over! Player collided with ghost.") # Debug
+                break # No need to check other ghosts
+
+    def bounce_ghosts(self):
+        """Ghosts that run into another ghost turn back."""
+        spatial_hash = self.spatial_hash
+        bounced = []
+        for g in self.ghosts:
+            for other in spatial_hash.nearby(g.current_mx, g.current_my):
+                # Only the ghost heading into the other one turns, so a pair never locks up
+                if other is not g and entities_overlap(g, other) and (other.px - g.px) * g.dx + (other.py - g.py) * g.dy > 0:
+                    bounced.append(g)
+                    break
+        for g in bounced:
+            g.dx, g.dy = -g.dx, -g.dy
+
+    def render(self):
+        if self.scrolling:
+            self.render_scrolling()
+            return
+        frozen = self.game_over or self.win
+        if self.profiler.overlay_visible:
+            self.full_redraw_pending = True # The overlay changes every frame and covers the maze, so push it all
+        if not self.dirty_rendering or self.full_redraw_pending or frozen != self.drawn_frozen:
+            self.render_full()
+        elif not frozen: # A frozen frame is already on screen, nothing to push
+            self.render_dirty()
+
+    def render_full(self):
+        """Redraws and pushes the whole frame."""
+        self.draw_maze()
+        self.player.draw(self.screen)
+        for g in self.ghosts:
+            g.draw(self.screen)
+        self.draw_ui() # Draw score and game over/win messages
+        self.draw_profiler()
+        pygame.display.flip()
+
+        screen_rect = self.screen.get_rect()
+        self.sprite_rects = [e.get_draw_rect().clip(screen_rect) for e in [self.player] + self.ghosts]
+        self.full_redraw_pending = False
+        self.drawn_frozen = self.game_over or self.win
+
+    def render_dirty(self):
+        """Restores the background under last frame's sprites and pushes only changed regions."""
+        dirty = self.update_pellet_layer()
+        for rect in dirty + self.sprite_rects:
+            self.restore_background(rect)
+        dirty.extend(self.sprite_rects)
+
+        if self.player.score != self.drawn_score:
+            old_score_rect = self.score_rect
+            self.restore_background(old_score_rect)
+            dirty.append(old_score_rect.union(self.draw_score()))
+
+        screen_rect = self.screen.get_rect()
+        self.sprite_rects = []
+        for e in [self.player] + self.ghosts:
+            e.draw(self.screen)
+            self.sprite_rects.append(e.get_draw_rect().clip(screen_rect))
+        dirty.extend(self.sprite_rects)
+        self.profiler.mark("draw")
+
+        pygame.display.update(dirty)
+
+    def update_camera(self):
+        """Centers the view on the player, clamped to the maze edges."""
+        view_w, view_h = self.view_w_tiles * TILE_SIZE, self.view_h_tiles * TILE_SIZE
+        self.camera_x = max(0, min(int(self.player.px) - view_w // 2, self.maze.width * TILE_SIZE - view_w))
+        self.camera_y = max(0, min(int(self.player.py) - view_h // 2, self.maze.height * TILE_SIZE - view_h))
+
+    def render_scrolling(self):
+        """Draws a frame of a level bigger than the window: the chunks and entities in view, then the UI."""
+        chunks = self.maze_chunks
+        for mx, my in self.player.eaten_pellets:
+            chunks.erase_pellet(mx, my)
+        self.player.eaten_pellets.clear()
+
+        self.update_camera()
+        cam_x, cam_y = self.camera_x, self.camera_y
+        view_w, view_h = self.view_w_tiles * TILE_SIZE, self.view_h_tiles * TILE_SIZE
+        chunk_range = (cam_x // chunks.chunk_px, cam_y // chunks.chunk_px,
+                       (cam_x + view_w - 1) // chunks.chunk_px, (cam_y + view_h - 1) // chunks.chunk_px)
+        cx0, cy0, cx1, cy1 = chunk_range
+        self.screen.set_clip((0, 0, view_w, view_h)) # Keep the maze off the score strip
+        for cy in range(cy0, cy1 + 1):
+            for cx in range(cx0, cx1 + 1):
+                self.screen.blit(chunks.get(cx, cy), (cx * chunks.chunk_px - cam_x, cy * chunks.chunk_px - cam_y))
+
+        # Entities on (or a tile around) the visible tiles; everything else is skipped entirely
+        offset = (-cam_x, -cam_y)
+        mx0, my0 = cam_x // TILE_SIZE - 1, cam_y // TILE_SIZE - 1
+        mx1, my1 = (cam_x + view_w) // TILE_SIZE + 1, (cam_y + view_h) // TILE_SIZE + 1
+        self.player.draw(self.screen, offset)
+        for g in self.spatial_hash.in_area(mx0, my0, mx1, my1):
+            g.draw(self.screen, offset)
+        self.screen.set_clip(None)
+
+        self.screen.fill(COLOR_BG, (0, view_h, self.screen_width, self.screen_height - view_h))
+        self.draw_ui()
+        self.draw_profiler()
+        pygame.display.flip()
+
+        if chunk_range != self.drawn_chunk_range: # Only worth sweeping when the view crossed a chunk edge
+            chunks.evict_far(*chunk_range)
+            self.drawn_chunk_range = chunk_range
+
+
+# --- Batched Simulation ---
+class BatchGame:
+    """Steps many headless games at once, with all state held in NumPy arrays.
+
+    Follows the same movement, tunnel-wrap, pellet, collision and win rules as
+    Player/Ghost/Game.update, but each frame is a fixed number of array
+    operations no matter how many games are running. Ghosts wander randomly as
+    in Game(ghost_targeting=False); their decisions use a NumPy generator, so
+    ghost paths differ from a Game with the same seed.
+    """
+    # Lookup tables indexed by ACTION_* / MOVE_DIRECTIONS index
+    ACTION_DX = [0, -1, 1, 0, 0]
+    ACTION_DY = [0, 0, 0, -1, 1]
+
+    def __init__(self, num_games, seed=None, auto_reset=False):
+        if np is None:
+            raise RuntimeError("BatchGame needs numpy installed")
+        self.num_games = num_games
+        self.auto_reset = auto_reset # Restart finished games inside step()
+        self.rng = np.random.default_rng(seed)
+        self.action_dx = np.array(self.ACTION_DX)
+        self.action_dy = np.array(self.ACTION_DY)
+        self.dir_x = np.array([dx for dx, dy in MOVE_DIRECTIONS])
+        self.dir_y = np.array([dy for dx, dy in MOVE_DIRECTIONS])
+
+        # --- Static maze tables ---
+        self.maze = Maze(MAZE_LAYOUT)
+        layout = np.frombuffer(bytes(self.maze.cells), dtype=np.uint8).reshape(self.maze.height, self.maze.width)
+        self.walls = layout == CELL_WALL
+        self.tunnels = layout == CELL_TUNNEL
+        self.start_pellets = layout == CELL_PELLET
+        # Walls with a 1-tile border so out-of-bounds lookups count as walls (like Maze.is_wall)
+        self.padded_walls = np.ones((MAZE_H_TILES + 2, MAZE_W_TILES + 2), dtype=bool)
+        self.padded_walls[1:-1, 1:-1] = self.walls
+        # exits[my, mx, d]: neighbor in MOVE_DIRECTIONS[d] is open (same as MazeGraph masks)
+        self.exits = np.stack([~self.padded_walls[1 + dy:1 + dy + MAZE_H_TILES, 1 + dx:1 + dx + MAZE_W_TILES]
+                               for dx, dy in MOVE_DIRECTIONS], axis=-1)
+        self.neighbor_masks = (self.exits * np.array(DIR_BITS)).sum(axis=-1)
+        self.dir_bits = np.array(DIR_BITS)
+
+        player_start, ghost_starts = find_start_positions(self.maze)
+        self.player_start = player_start
+        self.ghost_start_mx = np.array([mx for mx, my in ghost_starts])
+        self.ghost_start_my = np.array([my for mx, my in ghost_starts])
+        self.num_ghosts = len(ghost_starts)
+
+        # --- Per-game state ---
+        n, g = num_games, self.num_ghosts
+        self.frame = np.zeros(n, dtype=np.int64)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.pellets = np.zeros((n, MAZE_H_TILES, MAZE_W_TILES), dtype=bool)
+        self.pellets_left = np.zeros(n, dtype=np.int64)
+        self.game_over = np.zeros(n, dtype=bool)
+        self.win = np.zeros(n, dtype=bool)
+        self.player_px = np.zeros(n)
+        self.player_py = np.zeros(n)
+        self.player_dx = np.zeros(n)
+        self.player_dy = np.zeros(n)
+        self.player_mx = np.zeros(n, dtype=np.int64)
+        self.player_my = np.zeros(n, dtype=np.int64)
+        self.queued_dx = np.zeros(n)
+        self.queued_dy = np.zeros(n)
+        # Ghost arrays are (games, ghosts)
+        self.ghost_px = np.zeros((n, g))
+        self.ghost_py = np.zeros((n, g))
+        self.ghost_dx = np.zeros((n, g))
+        self.ghost_dy = np.zeros((n, g))
+        self.ghost_mx = np.zeros((n, g), dtype=np.int64)
+        self.ghost_my = np.zeros((n, g), dtype=np.int64)
+        self.ghost_timer = np.zeros((n, g), dtype=np.int64)
+        self.reset()
+
+    def reset(self, indices=None):
+        """Restarts the given games (all of them by default)."""
+        if indices is None:
+            indices = np.arange(self.num_games)
+        indices = np.asarray(indices)
+        pmx, pmy = self.player_start
+        self.frame[indices] = 0
+        self.score[indices] = 0
+        self.pellets[indices] = self.start_pellets
+        self.pellets_left[indices] = int(self.start_pellets.sum())
+        self.game_over[indices] = False
+        self.win[indices] = False
+        self.player_px[indices], self.player_py[indices] = maze_to_pixel_center(pmx, pmy)
+        self.player_dx[indices] = 0
+        self.player_dy[indices] = 0
+        self.player_mx[indices] = pmx
+        self.player_my[indices] = pmy
+        self.queued_dx[indices] = 0
+        self.queued_dy[indices] = 0
+        self.ghost_mx[indices] = self.ghost_start_mx
+        self.ghost_my[indices] = self.ghost_start_my
+        self.ghost_px[indices] = self.ghost_mx[indices] * TILE_SIZE + TILE_SIZE // 2
+        self.ghost_py[indices] = self.ghost_my[indices] * TILE_SIZE + TILE_SIZE // 2
+        self.ghost_dx[indices] = 0
+        self.ghost_dy[indices] = 0
+        # Like Ghost.__init__, every ghost picks its first direction right away
+        choose = np.zeros((self.num_games, self.num_ghosts), dtype=bool)
+        choose[indices] = True
+        self._choose_ghost_directions(choose)
+
+    def step(self, actions):
+        """Advances every running game one frame.
+
+        actions is one ACTION_* value per game. Returns (rewards, done) arrays;
+        finished games stay frozen until reset() unless auto_reset is on.
+        """
+        actions = np.asarray(actions)
+        active = ~(self.game_over | self.win)
+        rewards = np.zeros(self.num_games, dtype=np.int64)
+        self.frame[active] += 1
+
+        # --- Input (Player.apply_action) ---
+        queue = active & (actions != ACTION_NONE)
+        self.queued_dx[queue] = self.action_dx[actions[queue]] * PLAYER_SPEED
+        self.queued_dy[queue] = self.action_dy[actions[queue]] * PLAYER_SPEED
+
+        # --- Update ---
+        self._update_player(active, rewards)
+        self._update_ghosts(active)
+
+        # --- Check Collisions (same truncation as pygame.Rect) ---
+        size = ENTITY_RADIUS * 2
+        player_x = np.trunc(self.player_px - ENTITY_RADIUS)[:, None]
+        player_y = np.trunc(self.player_py - ENTITY_RADIUS)[:, None]
+        ghost_x = np.trunc(self.ghost_px - ENTITY_RADIUS)
+        ghost_y = np.trunc(self.ghost_py - ENTITY_RADIUS)
+        hit = ((player_x < ghost_x + size) & (ghost_x < player_x + size) &
+               (player_y < ghost_y + size) & (ghost_y < player_y + size))
+        self.game_over |= active & hit.any(axis=1)
+
+        # --- Check Win Condition ---
+        self.win |= active & (self.pellets_left == 0)
+
+        done = self.game_over | self.win
+        if self.auto_reset and done.any():
+            self.reset(np.flatnonzero(done))
+        return rewards, done
+
+    def get_state(self, index):
+        """State of one game in the same format as Game.get_state()."""
+        return {
+            "frame": int(self.frame[index]),
+            "player": (float(self.player_px[index]), float(self.player_py[index]),
+                       float(self.player_dx[index]), float(self.player_dy[index])),
+            "ghosts": [(float(self.ghost_px[index, i]), float(self.ghost_py[index, i]),
+                        float(self.ghost_dx[index, i]), float(self.ghost_dy[index, i])) for i in range(self.num_ghosts)],
+            "score": int(self.score[index]),
+            "pellets_left": int(self.pellets_left[index]),
+            "game_over": bool(self.game_over[index]),
+            "win": bool(self.win[index]),
+        }
+
+    def _pixel_to_maze(self, px, py):
+        col = np.clip(np.floor_divide(px, TILE_SIZE).astype(np.int64), 0, MAZE_W_TILES - 1)
+        row = np.clip(np.floor_divide(py, TILE_SIZE).astype(np.int64), 0, MAZE_H_TILES - 1)
+        return col, row
+
+    def _move_and_collide(self, px, py, dx, dy):
+        """Array version of Entity.move_and_collide; returns px, py, dx, dy, mx, my."""
+        r = ENTITY_RADIUS
+        # --- X-Axis Movement and Collision ---
+        px = np.round(px + dx, POSITION_DECIMALS)
+        sign_x = np.sign(dx)
+        col, _ = self._pixel_to_maze(px + sign_x * r, py)
+        _, row_a = self._pixel_to_maze(px, py + -r * 0.9)
+        _, row_b = self._pixel_to_maze(px, py + r * 0.9)
+        hit = (sign_x != 0) & (self.walls[row_a, col] | self.walls[row_b, col])
+        snap = np.round(np.where(sign_x > 0, col * TILE_SIZE - r - 0.01, (col + 1) * TILE_SIZE + r + 0.01), POSITION_DECIMALS)
+        px = np.where(hit, snap, px)
+        dx = np.where(hit, 0.0, dx)
+
+        # --- Y-Axis Movement and Collision ---
+        py = np.round(py + dy, POSITION_DECIMALS)
+        sign_y = np.sign(dy)
+        _, row = self._pixel_to_maze(px, py + sign_y * r)
+        col_a, _ = self._pixel_to_maze(px + -r * 0.9, py)
+        col_b, _ = self._pixel_to_maze(px + r * 0.9, py)
+        hit = (sign_y != 0) & (self.walls[row, col_a] | self.walls[row, col_b])
+        snap = np.round(np.where(sign_y > 0, row * TILE_SIZE - r - 0.01, (row + 1) * TILE_SIZE + r + 0.01), POSITION_DECIMALS)
+        py = np.where(hit, snap, py)
+        dy = np.where(hit, 0.0, dy)
+
+        # --- Tunnel Wrapping ---
+        mx, my = self._pixel_to_maze(px, py)
+        in_tunnel = self.tunnels[my, mx]
+        px = np.where(in_tunnel & (px < TILE_SIZE / 2), (MAZE_W_TILES - 1) * TILE_SIZE - TILE_SIZE / 2,
+                      np.where(in_tunnel & (px > SCREEN_WIDTH - TILE_SIZE / 2), TILE_SIZE / 2, px))
+        mx, my = self._pixel_to_maze(px, py)
+        return px, py, dx, dy, mx, my
+
+    def _update_player(self, active, rewards):
+        """Array version of Player.update for the active games."""
+        px, py, dx, dy = self.player_px, self.player_py, self.player_dx, self.player_dy
+        qdx, qdy = self.queued_dx, self.queued_dy
+        center_x = self.player_mx * TILE_SIZE + TILE_SIZE // 2
+        center_y = self.player_my * TILE_SIZE + TILE_SIZE // 2
+        is_centered_x = np.abs(px - center_x) < PLAYER_SPEED * 0.5
+        is_centered_y = np.abs(py - center_y) < PLAYER_SPEED * 0.5
+
+        # --- Try to apply queued direction if at center ---
+        next_turn_mx = self.player_mx + np.sign(qdx).astype(np.int64)
+        next_turn_my = self.player_my + np.sign(qdy).astype(np.int64)
+        can_turn = (((qdx != 0) & (dx == 0) & is_centered_y) |
+                    ((qdy != 0) & (dy == 0) & is_centered_x) |
+                    ((qdx != 0) & (dx != 0) & (qdx * dx < 0)) |
+                    ((qdy != 0) & (dy != 0) & (qdy * dy < 0)))
+        turn = active & can_turn & ~self.padded_walls[next_turn_my + 1, next_turn_mx + 1]
+        px = np.where(turn & (dx == 0), center_x, px)
+        py = np.where(turn & (dy == 0), center_y, py)
+        dx = np.where(turn, qdx, dx)
+        dy = np.where(turn, qdy, dy)
+        self.queued_dx = np.where(turn, 0.0, qdx)
+        self.queued_dy = np.where(turn, 0.0, qdy)
+
+        # --- Movement and Collision ---
+        px, py, dx, dy, mx, my = self._move_and_collide(px, py, dx, dy)
+        self.player_px = np.where(active, px, self.player_px)
+        self.player_py = np.where(active, py, self.player_py)
+        self.player_dx = np.where(active, dx, self.player_dx)
+        self.player_dy = np.where(active, dy, self.player_dy)
+        self.player_mx = np.where(active, mx, self.player_mx)
+        self.player_my = np.where(active, my, self.player_my)
+
+        # --- Pellet Collection ---
+        games = np.flatnonzero(active)
+        games = games[self.pellets[games, self.player_my[games], self.player_mx[games]]]
+        self.pellets[games, self.player_my[games], self.player_mx[games]] = False
+        self.pellets_left[games] -= 1
+        self.score[games] += 10
+        rewards[games] += 10
+
+    def _update_ghosts(self, active):
+        """Array version of Ghost.update for every ghost of the active games."""
+        active = np.broadcast_to(active[:, None], self.ghost_px.shape)
+        center_x = self.ghost_mx * TILE_SIZE + TILE_SIZE // 2
+        center_y = self.ghost_my * TILE_SIZE + TILE_SIZE // 2
+
+        # --- Decision Making at Center ---
+        centered = (active & (np.abs(self.ghost_px - center_x) < GHOST_SPEED * 0.5) &
+                    (np.abs(self.ghost_py - center_y) < GHOST_SPEED * 0.5))
+        self.ghost_px = np.where(centered, center_x, self.ghost_px)
+        self.ghost_py = np.where(centered, center_y, self.ghost_py)
+        # Same test as MazeGraph.needs_decision: skip cells whose only way on is straight ahead
+        heading = self._direction_bits(self.ghost_dx, self.ghost_dy)
+        reverse = self._direction_bits(-self.ghost_dx, -self.ghost_dy)
+        masks = self.neighbor_masks[self.ghost_my, self.ghost_mx]
+        self._choose_ghost_directions(centered & ((masks & ~reverse) != heading))
+
+        # --- Movement and Collision ---
+        px, py, dx, dy, mx, my = self._move_and_collide(self.ghost_px, self.ghost_py, self.ghost_dx, self.ghost_dy)
+        self.ghost_px = np.where(active, px, self.ghost_px)
+        self.ghost_py = np.where(active, py, self.ghost_py)
+        self.ghost_dx = np.where(active, dx, self.ghost_dx)
+        self.ghost_dy = np.where(active, dy, self.ghost_dy)
+        self.ghost_mx = np.where(active, mx, self.ghost_mx)
+        self.ghost_my = np.where(active, my, self.ghost_my)
+
+    def _direction_bits(self, dx, dy):
+        """Array version of direction_bit."""
+        return np.select([dy < 0, dy > 0, dx < 0, dx > 0], self.dir_bits, 0)
+
+    def _choose_ghost_directions(self, mask):
+        """Array version of Ghost.choose_new_direction for the (game, ghost) pairs in mask."""
+        games, ghosts = np.nonzero(mask)
+        if len(games) == 0:
+            return
+        exits = self.exits[self.ghost_my[games, ghosts], self.ghost_mx[games, ghosts]]
+        dir_x = np.sign(self.ghost_dx[games, ghosts])[:, None]
+        dir_y = np.sign(self.ghost_dy[games, ghosts])[:, None]
+        is_reverse = (self.dir_x == -dir_x) & (self.dir_y == -dir_y)
+        # Avoid reversing if possible (more than 1 option available)
+        options = exits & ~(is_reverse & (exits.sum(axis=1) > 1)[:, None])
+        num_options = options.sum(axis=1)
+        # Uniform pick among the options: index of the k-th True per row
+        pick = (self.rng.random(len(games)) * num_options).astype(np.int64)
+        choice = np.argmax(np.cumsum(options, axis=1) > pick[:, None], axis=1)
+        stuck = num_options == 0
+        self.ghost_dx[games, ghosts] = np.where(stuck, 0.0, self.dir_x[choice] * GHOST_SPEED)
+        self.ghost_dy[games, ghosts] = np.where(stuck, 0.0, self.dir_y[choice] * GHOST_SPEED)
+        self.ghost_timer[games, ghosts] = self.rng.integers(15, 46, len(games)) # Frames until next decision
+
+
+# --- Benchmarks ---
+def benchmark_swarm(ghost_counts=(4, 16, 64, 250, 1000), frames=300, seed=0, ghosts_per_maze=64):
+    """Prints the collision cost per frame of swarm games of growing size.
+
+    Bigger swarms get a tiled maze with the same ghost density, so the spatial
+    hash should keep the per-ghost cost flat. The pairwise column is the
+    all-pairs ghost/ghost test the broadphase replaces, timed on a few frames.
+    """
+    import time
+    print(f"{'ghosts':>7} {'maze':>7} {'collide us/frame':>17} {'us/ghost':>9} {'pairwise us/frame':>18}")
+    for count in ghost_counts:
+        copies = max(1, math.ceil(math.sqrt(count / ghosts_per_maze)))
+        game = Game(headless=True, seed=seed, movement=MOVEMENT_LANE, swarm=count,
+                    layout=tiled_layout(MAZE_LAYOUT, copies, copies))
+        inputs = random.Random(seed)
+        collide_time = 0.0
+        check_collisions = game.check_collisions
+        for frame in range(frames):
+            if frame % 20 == 0:
+                game.player.apply_action(inputs.choice(list(ACTION_DIRECTIONS)))
+            # Game.update without the early out on game over, timing the collision part
+            game.frame += 1
+            game.player.update()
+            game.update_ghost_targets()
+            for g in game.ghosts:
+                g.update()
+            start = time.perf_counter()
+            for g in game.ghosts:
+                game.spatial_hash.move(g)
+            check_collisions()
+            collide_time += time.perf_counter() - start
+
+        pairwise_frames = 3
+        start = time.perf_counter()
+        for _ in range(pairwise_frames):
+            ghosts = game.ghosts
+            for i, g in enumerate(ghosts):
+                for other in ghosts[i + 1:]:
+                    entities_overlap(g, other)
+        pairwise_time = (time.perf_counter() - start) / pairwise_frames
+
+        per_frame = collide_time / frames * 1e6
+        print(f"{count:>7} {f'{copies}x{copies}':>7} {per_frame:>17.1f} {per_frame / count:>9.2f} {pairwise_time * 1e6:>18.1f}")
+
+def check_movement_engines(seeds=range(5), frames=5000, swarm=0, maze_file=None):
+    """Plays the same random inputs with both movement engines and checks every
+    frame's state matches exactly (restarting games that end, like pressing R).
+    Prints one line per seed; returns False at the first seed that diverges."""
+    for seed in seeds:
+        games = [Game(headless=True, seed=seed, movement=movement, swarm=swarm, maze_file=maze_file)
+                 for movement in (MOVEMENT_PIXEL, MOVEMENT_LANE)]
+        inputs = random.Random(seed)
+        action = ACTION_NONE
+        for frame in range(frames):
+            if frame % inputs.choice((3, 7, 20)) == 0:
+                action = inputs.randrange(5)
+            for game in games:
+                if game.game_over or game.win:
+                    game.start_game()
+                game.step(action)
+            pixel, lane = (game.snapshot_bytes() for game in games)
+            if pixel != lane:
+                pixel_state, lane_state = (game.get_state() for game in games)
+                print(f"seed {seed}: engines diverge at step {frame}")
+                print(f"  pixel player {pixel_state['player']}, score {pixel_state['score']}")
+                print(f"  lane  player {lane_state['player']}, score {lane_state['score']}")
+                return False
+        print(f"seed {seed}: {frames} steps identical, score {games[0].player.score}")
+    return True
+
+
+# --- Replays ---
+def replay_tag(game):
+    tag = REPLAY_TAG # Either movement engine replays the other's runs
+    if game.swarm:
+        tag += b":swarm%d" % game.swarm
+    if game.maze_file:
+        tag += b":" + game.maze.level.name.encode()
+    return tag
+
+def replay_rng_seed(seed, frame):
+    """Seed the game RNG gets at each checkpoint frame of a replay."""
+    return (seed << 32) ^ frame
+
+class ReplayRecorder:
+    """Records a Game's per-frame input codes to a replay file (see replay.py).
+
+    The game is reset with the replay seed, and at every checkpoint frame its
+    RNG is reseeded from (seed, frame). Playback does the same, so checkpoints
+    never have to store the RNG state and stay a few hundred bytes.
+    """
+    def __init__(self, game, path, seed=None, checkpoint_interval=REPLAY_CHECKPOINT_INTERVAL):
+        if seed is None:
+            seed = game.seed if game.seed is not None else random.getrandbits(32)
+        self.game = game
+        self.seed = seed
+        self.checkpoint_interval = checkpoint_interval
+        self.frame = 0
+        game.reset(seed)
+        self.writer = replay.ReplayWriter(path, seed, checkpoint_interval, replay_tag(game))
+
+    def record_frame(self, input_code):
+        """Call right before the game runs the frame for input_code."""
+        if self.frame % self.checkpoint_interval == 0:
+            self.game.rng.seed(replay_rng_seed(self.seed, self.frame))
+            self.writer.add_checkpoint(self.game.snapshot_bytes())
+        self.writer.add_input(input_code)
+        self.frame += 1
+
+    def close(self):
+        self.writer.close()
+
+class ReplayPlayer:
+    """Drives a Game from a replay file, in real time or as fast as possible."""
+    def __init__(self, game, path):
+        self.reader = replay.ReplayReader(path)
+        if self.reader.tag != replay_tag(game):
+            raise replay.ReplayError("replay tag %r does not match this game (%r)" % (self.reader.tag, replay_tag(game)))
+        self.game = game
+        self.seed = self.reader.seed
+        self.checkpoint_interval = self.reader.checkpoint_interval
+        self.frame = 0 # Next frame to play
+        game.reset(self.seed)
+
+    @property
+    def frame_count(self):
+        return self.reader.frame_count
+
+    def step_frame(self, input_code):
+        if self.frame % self.checkpoint_interval == 0:
+            self.game.rng.seed(replay_rng_seed(self.seed, self.frame))
+        self.game.run_frame(input_code)
+        self.frame += 1
+
+    def seek(self, frame):
+        """Jumps to just before `frame`: restores the nearest checkpoint, then simulates the rest."""
+        frame = max(0, min(frame, self.frame_count))
+        checkpoint = self.reader.checkpoint_before(frame)
+        if checkpoint and (frame < self.frame or checkpoint[0] > self.frame):
+            self.frame, payload = checkpoint
+            self.game.restore_bytes(payload)
+        elif frame < self.frame: # No checkpoint to go back to
+            self.game.reset(self.seed)
+            self.frame = 0
+        inputs = self.reader.inputs(self.frame)
+        while self.frame < frame:
+            self.step_frame(next(inputs))
+
+    def play(self, realtime=True):
+        """Plays to the end. Headless games just simulate; windowed ones render every frame."""
+        for input_code in self.reader.inputs(self.frame):
+            if not self.game.headless:
+                for evt in pygame.event.get():
+                    if evt.type == pygame.QUIT:
+                        return
+            self.step_frame(input_code)
+            if not self.game.headless:
+                self.game.render()
+                if realtime:
+                    self.game.clock.tick(FPS)
 
-            pygame.display.flip()
-            self.clock.tick(FPS)
 
 if __name__ == "__main__":
-    Game().run()
+    import argparse
+    parser = argparse.ArgumentParser(description="Pac-Man Zero Asset")
+    parser.add_argument("--seed", type=int, help="seed for the ghost RNG")
+    parser.add_argument("--record", metavar="FILE", help="record inputs to a replay file")
+    parser.add_argument("--replay", metavar="FILE", help="play back a replay file")
+    parser.add_argument("--fast", action="store_true", help="play the replay headless, as fast as possible")
+    parser.add_argument("--seek", type=int, default=0, metavar="FRAME", help="start the replay at this frame")
+    parser.add_argument("--movement", choices=[MOVEMENT_PIXEL, MOVEMENT_LANE], default=MOVEMENT_ENGINE,
+                        help="movement engine (both follow the same paths, the lane one is cheaper)")
+    parser.add_argument("--maze", metavar="FILE", help="play a level file (see mazefile.py) instead of the built-in maze")
+    parser.add_argument("--swarm", type=int, default=SWARM_GHOSTS, metavar="N", help="play against N ghosts")
+    parser.add_argument("--bench-swarm", action="store_true", help="benchmark swarm collision cost and exit")
+    parser.add_argument("--check-movement", action="store_true",
+                        help="check both movement engines play identical games (with --swarm/--maze) and exit")
+    parser.add_argument("--render-fps", type=int, default=FPS, metavar="FPS",
+                        help="frame rate cap (0 = uncapped); the simulation always runs at %d steps/s" % FPS)
+    parser.add_argument("--unthrottled", action="store_true", help="simulate and draw as fast as possible")
+    parser.add_argument("--profile", action="store_true", help="time loop phases and show the profiler overlay (F3)")
+    parser.add_argument("--frame-budget", type=float, default=FRAME_BUDGET_MS, metavar="MS",
+                        help="frames slower than this are exported while profiling")
+    parser.add_argument("--profile-out", default=PROFILE_EXPORT_PATH, metavar="PATTERN",
+                        help="export file pattern with a {frame} field; .json or .csv")
+    args = parser.parse_args()
+
+    if args.bench_swarm:
+        benchmark_swarm()
+    elif args.check_movement:
+        sys.exit(0 if check_movement_engines(swarm=args.swarm, maze_file=args.maze) else 1)
+    elif args.replay:
+        game = Game(headless=args.fast, movement=args.movement, swarm=args.swarm, maze_file=args.maze)
+        player = ReplayPlayer(game, args.replay)
+        player.seek(args.seek)
+        player.play(realtime=not args.fast)
+        state = game.get_state()
+        print(f"Replayed {player.frame} frames: score {state['score']}, game over {state['game_over']}, win {state['win']}")
+    else:
+        game = Game(seed=args.seed, movement=args.movement, swarm=args.swarm, maze_file=args.maze)
+        if args.record:
+            game.recorder = ReplayRecorder(game, args.record)
+        game.profiler.budget_ms = args.frame_budget
+        game.profiler.export_path = args.profile_out
+        if args.profile:
+            game.profiler.toggle_overlay()
+        game.run(render_fps=args.render_fps, unthrottled=args.unthrottled)
@@ -1,8 +1,15 @@
 import pygame
 import random
 import sys
-import numpy as np # Meow! We need numpy to make sound waves!
+from collections import deque
 import math # For sine waves, purr!
+import numpy as np # Meow! PONG 10 keeps all its balls in numpy arrays!
+import profiler # Stopwatches for every part of the frame, shared with the other games!
+from textcache import render_text # Words get drawn once and remembered, nya!
+from soundbank import default_bank as sound_bank # Beeps made with numpy and saved for next time, purr!
+from frametimer import FrameScheduler # Timers that count frames instead of napping, nya!
+import gameloop # Same game speed on every screen, purr!
+import netplay # Play over the network, only paw-presses on the wire!
 
 # --- Constants ---
 SCREEN_WIDTH = 600
@@ -18,270 +25,868 @@ PADDLE_SPEED = 7 # How fast the paddles zip!
 BALL_SPEED_X = 5 # How fast the ball zooms sideways!
 BALL_SPEED_Y = 5 # How fast the ball zooms up/down!
 WINNING_SCORE = 5 # First to 5 points wins, nya!
+MULTIBALL_COUNT = 300 # Balls on the field in PONG 10, nya!
+MAX_BOUNCES_PER_STEP = 8 # Plenty even for a ball zooming corner to corner in one step
+LERP_SNAP_DISTANCE = SCREEN_WIDTH // 3 # Moves longer than this in one step are teleports (a serve), not slides
+FPS = 60 # Simulation steps per second (all the speeds above are per step!)
+RENDER_FPS = 60 # Frames drawn per second (0 = as many as the screen can take)
+UNTHROTTLED = False # True = simulate and draw flat out, zoom!
+SERVE_DELAY_FRAMES = FPS // 2 # Little pause (with a countdown!) before the ball comes back after a point in the interactive game
+FRAME_BUDGET_MS = 1.5 * 1000 / FPS # Slower frames get counted (and exported while profiling)
+PROFILE_PHASES = ["events", "input", "step", "draw", "overlay", "flip", "wait"]
+ATTRACT_RESTART_FRAMES = 3 * FPS # CPU vs CPU starts a new match after showing game over this long
 
 # --- Game States ---
 MENU = "menu"
 PLAYING = "playing"
 GAME_OVER = "game_over"
 
-# --- Initialize Pygame ---
-pygame.mixer.pre_init(44100, -16, 1, 512) # Initialize mixer first with good settings! Nya!
-pygame.init()
-pygame.font.init() # Need this for scores and text, teehee!
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Cute Pong! Beep Boop!")
-clock = pygame.time.Clock()
-
-# --- Fonts ---
-title_font = pygame.font.Font(None, 100) # Big title font!
-score_font = pygame.font.Font(None, 74) # Big clear numbers!
-menu_font = pygame.font.Font(None, 36) # Font for menu and game over text
-game_over_font = pygame.font.Font(None, 80) # Font for "GAME OVER"
-copyright_font = pygame.font.Font(None, 24) # Smaller font for copyright
+# --- Paddle Inputs (bit flags, both can be held at once like the keys!) ---
+INPUT_NONE = 0
+INPUT_UP = 1
+INPUT_DOWN = 2
+INPUT_START = 4 # "Y" on the game over screen; in net play it travels with the paddle keys so both sides restart together
+
+# --- CPU Difficulty (how late the kitty notices, and how far off it guesses) ---
+CPU_DIFFICULTIES = {
+    "easy": {"reaction_frames": 24, "error": 90}, # Misses when it guesses over half a paddle (+ half a ball) off
+    "normal": {"reaction_frames": 10, "error": 64},
+    "hard": {"reaction_frames": 3, "error": 24}, # Never misses a ball it has time to reach
+}
+DEFAULT_CPU_DIFFICULTY = "normal"
 
 # --- Sound Generation (Beep Boop Time!) ---
-SAMPLE_RATE = 44100
 DURATION_SHORT = 0.05 # Short beep duration in seconds
 DURATION_MEDIUM = 0.1 # Medium beep duration
 
-def generate_sine_wave(frequency, duration, amplitude=4096):
-    """Generates a numpy array for a sine wave sound."""
-    num_samples = int(SAMPLE_RATE * duration)
-    buf = np.zeros((num_samples,), dtype=np.int16) # 16-bit sound
-    max_sample = 2**(16 - 1) - 1 # Max value for 16-bit audio
-
-    for i in range(num_samples):
-        t = float(i) / SAMPLE_RATE # Time in seconds
-        buf[i] = int(np.clip(amplitude * np.sin(2 * np.pi * frequency * t), -max_sample, max_sample))
-    return buf
-
-# Create Sound objects from generated waves
-# Frequency in Hz (Higher number = higher pitch)
-beep_wall = pygame.mixer.Sound(buffer=generate_sine_wave(440.0, DURATION_SHORT)) # A note (middle C-ish)
-beep_score = pygame.mixer.Sound(buffer=generate_sine_wave(880.0, DURATION_MEDIUM)) # Higher pitch for score!
-beep_paddle = pygame.mixer.Sound(buffer=generate_sine_wave(220.0, DURATION_SHORT)) # Lower pitch for paddle
-
-# --- Game Objects (Rectangles are easy!) ---
-# Player 1 (Left Paddle)
-player1_paddle = pygame.Rect(
-    30, # X position (near left edge)
-    SCREEN_HEIGHT // 2 - PADDLE_HEIGHT // 2, # Y position (centered)
-    PADDLE_WIDTH,
-    PADDLE_HEIGHT
-)
-
-# Player 2 (Right Paddle)
-player2_paddle = pygame.Rect(
-    SCREEN_WIDTH - 30 - PADDLE_WIDTH, # X position (near right edge)
-    SCREEN_HEIGHT // 2 - PADDLE_HEIGHT // 2, # Y position (centered)
-    PADDLE_WIDTH,
-    PADDLE_HEIGHT
-)
-
-# Ball
-ball = pygame.Rect(
-    SCREEN_WIDTH // 2 - BALL_SIZE // 2, # X position (center)
-    SCREEN_HEIGHT // 2 - BALL_SIZE // 2, # Y position (center)
-    BALL_SIZE,
-    BALL_SIZE
-)
-
-# --- Game Variables ---
-ball_speed_x_current = BALL_SPEED_X * random.choice((1, -1)) # Start direction random!
-ball_speed_y_current = BALL_SPEED_Y * random.choice((1, -1)) # Start direction random!
-player1_score = 0
-player2_score = 0
-game_state = MENU # Start in the menu state
-winner_text = ""
-
-# --- Function to reset game state for playing ---
-def start_game():
-    global player1_score, player2_score, game_state, winner_text
-    player1_score = 0
-    player2_score = 0
-    winner_text = ""
-    # Center paddles vertically
-    player1_paddle.centery = SCREEN_HEIGHT // 2
-    player2_paddle.centery = SCREEN_HEIGHT // 2
-    reset_ball(True) # Reset ball without delay
-    game_state = PLAYING
-
-# --- Function to reset ball ---
-def reset_ball(immediate=False):
-    global ball_speed_x_current, ball_speed_y_current
-    ball.center = (SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)
-    # Pause briefly before starting again, meow! unless immediate reset
-    if not immediate:
-        pygame.time.wait(500)
-    ball_speed_y_current = BALL_SPEED_Y * random.choice((1, -1))
-    ball_speed_x_current = BALL_SPEED_X * random.choice((1, -1))
-
-# --- Drawing Functions ---
-def draw_menu():
-    screen.fill(BG_COLOR)
-    # Title "PONG 10"
-    title_surface = title_font.render("PONG", True, TEXT_COLOR)
-    title_rect = title_surface.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 80))
-    screen.blit(title_surface, title_rect)
-
-    ten_surface = score_font.render("10", True, TEXT_COLOR) # Using score font for "10"
-    ten_rect = ten_surface.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 10)) # Positioned below PONG
-    screen.blit(ten_surface, ten_rect)
-
-    # Start instruction
-    start_surface = menu_font.render("Press SPACE to start game", True, TEXT_COLOR)
-    start_rect = start_surface.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 60))
-    screen.blit(start_surface, start_rect)
-
-    # Copyright
-    copyright_surface = copyright_font.render("copyright [@Team Flames HDR] 1.0", True, TEXT_COLOR)
-    copyright_rect = copyright_surface.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 20)) # Bottom center
-    screen.blit(copyright_surface, copyright_rect)
-
-def draw_game():
-    screen.fill(BG_COLOR) # Fill the background first!
-    # Draw Paddles
-    pygame.draw.rect(screen, PADDLE_COLOR, player1_paddle)
-    pygame.draw.rect(screen, PADDLE_COLOR, player2_paddle)
-    # Draw Ball
-    pygame.draw.ellipse(screen, BALL_COLOR, ball) # Ellipse looks more ball-like!
-    # Draw Center Line (optional aesthetic)
-    pygame.draw.aaline(screen, PADDLE_COLOR, (SCREEN_WIDTH // 2, 0), (SCREEN_WIDTH // 2, SCREEN_HEIGHT))
-    # Draw Scores
-    player1_text = score_font.render(str(player1_score), True, PADDLE_COLOR)
-    screen.blit(player1_text, (SCREEN_WIDTH // 4, 20))
-    player2_text = score_font.render(str(player2_score), True, PADDLE_COLOR)
-    screen.blit(player2_text, (SCREEN_WIDTH * 3 // 4 - player2_text.get_width() // 2 , 20)) # Adjust position slightly
-
-def draw_game_over():
-    screen.fill(BG_COLOR)
-    # Display "GAME OVER"
-    game_over_surface = game_over_font.render("GAME OVER", True, TEXT_COLOR)
-    game_over_rect = game_over_surface.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 100))
-    screen.blit(game_over_surface, game_over_rect)
-
-    # Display winner text
-    win_surface = menu_font.render(winner_text, True, PADDLE_COLOR) # Using menu font now
-    win_rect = win_surface.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
-    screen.blit(win_surface, win_rect)
-
-    # Display instruction text
-    restart_surface = menu_font.render("Restart? (Y/N)", True, PADDLE_COLOR)
-    restart_rect = restart_surface.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 50))
-    screen.blit(restart_surface, restart_rect)
-
-    # Copyright (optional, keep it consistent?)
-    copyright_surface = copyright_font.render("copyright [@Team Flames HDR] 1.0", True, TEXT_COLOR)
-    copyright_rect = copyright_surface.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 20)) # Bottom center
-    screen.blit(copyright_surface, copyright_rect)
-
-
-# --- Game Loop ---
-running = True
-while running:
-    # --- Event Handling ---
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        if event.type == pygame.KEYDOWN:
-            if game_state == MENU:
-                if event.key == pygame.K_SPACE:
-                    start_game() # Start the game from menu
-            elif game_state == GAME_OVER:
-                if event.key == pygame.K_y: # Yes to restart
-                    start_game() # Restart the game
-                elif event.key == pygame.K_n: # No to restart
-                    running = False # Quit the program
-
-    # --- Game Logic based on State ---
-    if game_state == PLAYING:
-        # --- Player Input ---
-        keys = pygame.key.get_pressed()
+# One set of stopwatches for the whole court: F3 pops them up over the net, F4 writes them to a CSV, nya!
+frame_profiler = profiler.FrameProfiler(PROFILE_PHASES, budget_ms=FRAME_BUDGET_MS, export_path="pong-profile-{frame}.csv")
+
+# --- Match Engine ---
+class PongMatch:
+    """One match of Pong: paddles, ball, scores and rules, nya!
+
+    Needs no display or mixer, so it can run headless and unthrottled (bots,
+    tests, benchmarks). Drive it with reset() and step(); attach a PongAudio
+    as `audio` and a PongRenderer as `renderer` for the interactive game.
+    Every step's sound cues ("wall", "paddle", "score") are also left in
+    `events` for code that wants them. Delays (like the serve after a point)
+    are frame timers in `timers`, advanced by step(), so nothing ever sleeps.
+    """
+    multiball = False # MultiBallMatch (PONG 10) says True
+
+    def __init__(self, seed=None, serve_delay_frames=0, audio=None, renderer=None,
+                 ball_speed_x=BALL_SPEED_X, ball_speed_y=BALL_SPEED_Y):
+        self.seed = seed
+        self.ball_speed_x = ball_speed_x # Serve speed; any speed works, collisions are swept!
+        self.ball_speed_y = ball_speed_y
+        self.winning_score = WINNING_SCORE
+        self.rng = random.Random(seed) # Own RNG for serves, so matches don't disturb each other
+        self.serve_delay_frames = serve_delay_frames # Frames the ball waits in the middle after a point
+        self.timers = FrameScheduler()
+        self.audio = audio
+        self.renderer = renderer
+        # --- Game Objects (Rectangles are easy!) ---
+        # Player 1 (Left Paddle)
+        self.player1_paddle = pygame.Rect(
+            30, # X position (near left edge)
+            SCREEN_HEIGHT // 2 - PADDLE_HEIGHT // 2, # Y position (centered)
+            PADDLE_WIDTH,
+            PADDLE_HEIGHT
+        )
+        # Player 2 (Right Paddle)
+        self.player2_paddle = pygame.Rect(
+            SCREEN_WIDTH - 30 - PADDLE_WIDTH, # X position (near right edge)
+            SCREEN_HEIGHT // 2 - PADDLE_HEIGHT // 2, # Y position (centered)
+            PADDLE_WIDTH,
+            PADDLE_HEIGHT
+        )
+        # Ball
+        self.ball = pygame.Rect(
+            SCREEN_WIDTH // 2 - BALL_SIZE // 2, # X position (center)
+            SCREEN_HEIGHT // 2 - BALL_SIZE // 2, # Y position (center)
+            BALL_SIZE,
+            BALL_SIZE
+        )
+        # --- Game Variables ---
+        self.ball_speed_x_current = 0
+        self.ball_speed_y_current = 0
+        self.player1_score = 0
+        self.player2_score = 0
+        self.game_state = MENU # Sits in the menu until reset() starts play
+        self.winner_text = ""
+        self.frame = 0
+        self.events = []
+        self.muted = False # Net play mutes the steps it re-simulates after a rollback
+
+    def reset(self, seed=None):
+        """Starts a fresh match (reseeding the serve RNG when a seed is given). Returns the new state."""
+        if seed is not None:
+            self.seed = seed
+            self.rng.seed(seed)
+        self.player1_score = 0
+        self.player2_score = 0
+        self.winner_text = ""
+        self.frame = 0
+        self.timers.clear() # No serve left over from the last match, meow
+        # Center paddles vertically
+        self.player1_paddle.centery = SCREEN_HEIGHT // 2
+        self.player2_paddle.centery = SCREEN_HEIGHT // 2
+        self.reset_ball(True) # Reset ball without delay
+        self.game_state = PLAYING
+        return self.get_state()
+
+    def reset_ball(self, immediate=False):
+        self.ball.center = (SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)
+        # Pause briefly before starting again, meow! unless immediate reset
+        # The ball just sits still while the serve timer runs; the game keeps going around it
+        self.ball_speed_x_current = 0
+        self.ball_speed_y_current = 0
+        self.timers.after(0 if immediate else self.serve_delay_frames, self.serve, "serve")
+
+    def serve(self):
+        self.ball_speed_y_current = self.ball_speed_y * self.rng.choice((1, -1))
+        self.ball_speed_x_current = self.ball_speed_x * self.rng.choice((1, -1))
+
+    def serve_countdown(self):
+        """Frames until the ball is served, or None when it's in play."""
+        return self.timers.remaining("serve")
+
+    def step(self, p1_input=INPUT_NONE, p2_input=INPUT_NONE):
+        """Advances one frame with INPUT_* flags for each paddle. Returns the new state."""
+        self.events = []
+        if self.game_state == PLAYING:
+            self.frame += 1
+            self.timers.tick() # Serves that came due happen before the ball moves
+            self.move_paddles(p1_input, p2_input)
+            self.update_ball()
+            if self.audio and self.events and not self.muted:
+                self.audio.play(self.events)
+        return self.get_state()
+
+    def move_paddles(self, p1_input, p2_input):
         # Player 1 (W and S)
-        if keys[pygame.K_w] and player1_paddle.top > 0:
-            player1_paddle.y -= PADDLE_SPEED
-        if keys[pygame.K_s] and player1_paddle.bottom < SCREEN_HEIGHT:
-            player1_paddle.y += PADDLE_SPEED
+        if p1_input & INPUT_UP and self.player1_paddle.top > 0:
+            self.player1_paddle.y -= PADDLE_SPEED
+        if p1_input & INPUT_DOWN and self.player1_paddle.bottom < SCREEN_HEIGHT:
+            self.player1_paddle.y += PADDLE_SPEED
         # Player 2 (Up and Down Arrows)
-        if keys[pygame.K_UP] and player2_paddle.top > 0:
-            player2_paddle.y -= PADDLE_SPEED
-        if keys[pygame.K_DOWN] and player2_paddle.bottom < SCREEN_HEIGHT:
-            player2_paddle.y += PADDLE_SPEED
-
-        # --- Ball Movement ---
-        ball.x += ball_speed_x_current
-        ball.y += ball_speed_y_current
-
-        # --- Ball Collision ---
-        # Top/Bottom Walls
-        if ball.top <= 0 or ball.bottom >= SCREEN_HEIGHT:
-            ball_speed_y_current *= -1 # Bounce! Boing!
-            # Keep ball in bounds slightly to prevent sticking
-            if ball.top < 0:
-                ball.top = 0
-            if ball.bottom > SCREEN_HEIGHT:
-                ball.bottom = SCREEN_HEIGHT
-            beep_wall.play() # Play wall bounce beep!
-
-        # Left/Right Walls (Scoring)
-        if ball.left <= 0:
-            player2_score += 1
-            beep_score.play() # Play score beep!
-            if player2_score >= WINNING_SCORE:
-                winner_text = "Player 2 Wins! Purrrrfect!"
-                game_state = GAME_OVER # Change state to game over
+        if p2_input & INPUT_UP and self.player2_paddle.top > 0:
+            self.player2_paddle.y -= PADDLE_SPEED
+        if p2_input & INPUT_DOWN and self.player2_paddle.bottom < SCREEN_HEIGHT:
+            self.player2_paddle.y += PADDLE_SPEED
+
+    def update_ball(self):
+        """Moves the ball one step, bounces it and keeps score, nya!
+
+        Swept collision: the ball's path for the step is checked against the
+        walls, the paddles' faces and the goal lines, and it bounces off the
+        first one it reaches at the exact moment of contact, then carries on
+        for the rest of the step (up to MAX_BOUNCES_PER_STEP times). So no
+        speed or step size lets it slip through a paddle. Bounces mirror the
+        path, so integer speeds keep the ball on whole pixels.
+        """
+        ball = self.ball
+        self.push_out_of_paddles()
+        x, y = float(ball.x), float(ball.y)
+        width, height = ball.width, ball.height
+        remaining = 1.0 # Fraction of the step still to travel
+        for _ in range(MAX_BOUNCES_PER_STEP):
+            vx, vy = self.ball_speed_x_current, self.ball_speed_y_current
+            if not vx and not vy: # Waiting for a serve, purr
+                break
+            hit_t, hit = remaining, None
+            # Top/Bottom Walls
+            if vy < 0:
+                hit_t, hit = earliest(hit_t, hit, -y / vy, "wall")
+            elif vy > 0:
+                hit_t, hit = earliest(hit_t, hit, (SCREEN_HEIGHT - height - y) / vy, "wall")
+            # Paddle faces (only from the front, and only if the ball is level with the paddle then)
+            if vx < 0:
+                paddle = self.player1_paddle
+                if x >= paddle.right:
+                    t = (paddle.right - x) / vx
+                    if paddle.top < y + vy * t + height and y + vy * t < paddle.bottom:
+                        hit_t, hit = earliest(hit_t, hit, t, "paddle")
+                hit_t, hit = earliest(hit_t, hit, -x / vx, "goal") # Left Wall (Scoring)
+            elif vx > 0:
+                paddle = self.player2_paddle
+                if x + width <= paddle.left:
+                    t = (paddle.left - width - x) / vx
+                    if paddle.top < y + vy * t + height and y + vy * t < paddle.bottom:
+                        hit_t, hit = earliest(hit_t, hit, t, "paddle")
+                hit_t, hit = earliest(hit_t, hit, (SCREEN_WIDTH - width - x) / vx, "goal") # Right Wall (Scoring)
+
+            # --- Ball Movement (up to the hit) ---
+            x += vx * hit_t
+            y += vy * hit_t
+            remaining -= hit_t
+            if hit is None:
+                break
+            # --- Ball Collision ---
+            if hit == "wall":
+                self.ball_speed_y_current = -vy # Bounce! Boing!
+                self.events.append("wall") # Wall bounce beep!
+            elif hit == "paddle":
+                self.ball_speed_x_current = -vx # Bounce off paddle!
+                self.events.append("paddle") # Paddle hit beep!
             else:
-                reset_ball()
-        if ball.right >= SCREEN_WIDTH:
-            player1_score += 1
-            beep_score.play() # Play score beep!
-            if player1_score >= WINNING_SCORE:
-                winner_text = "Player 1 Wins! Meow-tastic!"
-                game_state = GAME_OVER # Change state to game over
+                self.score_point(2 if vx < 0 else 1) # The ball is re-served, nothing left to move
+                return
+        ball.topleft = (round(x), round(y))
+
+    def push_out_of_paddles(self):
+        """A paddle that moved onto the ball knocks it out in front of it (if it was heading in)."""
+        ball = self.ball
+        if ball.colliderect(self.player1_paddle) and self.ball_speed_x_current < 0:
+            ball.left = self.player1_paddle.right # Push out
+            self.ball_speed_x_current *= -1
+            self.events.append("paddle")
+        elif ball.colliderect(self.player2_paddle) and self.ball_speed_x_current > 0:
+            ball.right = self.player2_paddle.left # Push out
+            self.ball_speed_x_current *= -1
+            self.events.append("paddle")
+
+    def score_point(self, player):
+        self.events.append("score") # Score beep!
+        if player == 1:
+            self.player1_score += 1
+            if self.player1_score >= self.winning_score:
+                self.winner_text = "Player 1 Wins! Meow-tastic!"
+                self.game_state = GAME_OVER # Change state to game over
+                return
+        else:
+            self.player2_score += 1
+            if self.player2_score >= self.winning_score:
+                self.winner_text = "Player 2 Wins! Purrrrfect!"
+                self.game_state = GAME_OVER # Change state to game over
+                return
+        self.reset_ball()
+
+    def get_state(self):
+        """The match as plain Python values, purr."""
+        return {
+            "frame": self.frame,
+            "ball": tuple(self.ball),
+            "ball_speed": (self.ball_speed_x_current, self.ball_speed_y_current),
+            "paddles": (tuple(self.player1_paddle), tuple(self.player2_paddle)),
+            "score": (self.player1_score, self.player2_score),
+            "game_state": self.game_state,
+        }
+
+    def snapshot(self):
+        """Everything step() depends on, for restore(); used by net play to roll back, nya."""
+        return (tuple(self.ball), tuple(self.player1_paddle), tuple(self.player2_paddle),
+                self.ball_speed_x_current, self.ball_speed_y_current, self.player1_score, self.player2_score,
+                self.game_state, self.winner_text, self.frame, self.seed, self.rng.getstate(), self.timers.snapshot())
+
+    def restore(self, snapshot):
+        (ball, paddle1, paddle2, self.ball_speed_x_current, self.ball_speed_y_current,
+         self.player1_score, self.player2_score, self.game_state, self.winner_text, self.frame,
+         self.seed, rng_state, timers) = snapshot
+        self.ball.update(ball)
+        self.player1_paddle.update(paddle1)
+        self.player2_paddle.update(paddle2)
+        self.rng.setstate(rng_state)
+        self.timers.restore(timers)
+
+    def positions(self):
+        """(ball, paddle 1, paddle 2) rects as tuples, for interpolating between steps."""
+        return tuple(self.ball), tuple(self.player1_paddle), tuple(self.player2_paddle)
+
+    def render(self, alpha=1.0, previous=None):
+        """Draws the match with the attached renderer, if there is one; see PongRenderer.draw."""
+        if self.renderer:
+            self.renderer.draw(self, alpha, previous)
+
+
+# --- PONG 10: Lots and lots of balls! ---
+class MultiBallMatch(PongMatch):
+    """PONG 10 mode: hundreds of balls at once, meow!
+
+    Ball positions and velocities live in NumPy arrays, and each step resolves
+    walls, paddles, goals and respawns for every ball together with the same
+    swept collision as the single ball (one round of array operations per
+    bounce, not per ball). A ball that scores respawns in the middle right
+    away. Each kind of sound cue is reported at most once per step, so 300
+    balls hitting a wall together beep once; `event_counts` has the real
+    numbers. First to WINNING_SCORE points per ball wins.
+    """
+    multiball = True
+
+    def __init__(self, num_balls=MULTIBALL_COUNT, seed=None, **kwargs):
+        self.num_balls = num_balls
+        self.ball_rng = np.random.default_rng(seed)
+        self.ball_x = np.zeros(num_balls) # Top-left corners, floats (speeds are random!)
+        self.ball_y = np.zeros(num_balls)
+        self.ball_vx = np.zeros(num_balls)
+        self.ball_vy = np.zeros(num_balls)
+        self.event_counts = {"wall": 0, "paddle": 0, "score": 0}
+        super().__init__(seed=seed, **kwargs)
+        self.winning_score = WINNING_SCORE * num_balls
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.ball_rng = np.random.default_rng(seed)
+        super().reset(seed)
+        self.spawn_balls(np.ones(self.num_balls, dtype=bool))
+        return self.get_state()
+
+    def spawn_balls(self, which):
+        """Puts the balls in the `which` mask back in the middle band, flying off every which way."""
+        count = int(np.count_nonzero(which))
+        if not count:
+            return
+        rng = self.ball_rng
+        self.ball_x[which] = SCREEN_WIDTH // 2 - BALL_SIZE // 2
+        self.ball_y[which] = rng.uniform(SCREEN_HEIGHT / 4, SCREEN_HEIGHT * 3 / 4 - BALL_SIZE, count)
+        self.ball_vx[which] = rng.choice((-1.0, 1.0), count) * self.ball_speed_x * rng.uniform(0.6, 1.4, count)
+        self.ball_vy[which] = rng.uniform(-1.4, 1.4, count) * self.ball_speed_y
+
+    def update_ball(self):
+        """Moves every ball one step: swept bounces, goals and respawns, all at once, purr!"""
+        x, y, vx, vy = self.ball_x, self.ball_y, self.ball_vx, self.ball_vy
+        p1, p2 = self.player1_paddle, self.player2_paddle
+        size = BALL_SIZE
+        counts = {"wall": 0, "paddle": 0, "score": 0}
+
+        # Paddles that moved onto balls heading into them knock them out (like push_out_of_paddles)
+        for paddle, heading_in, face in ((p1, vx < 0, p1.right), (p2, vx > 0, p2.left - size)):
+            overlap = heading_in & (x < paddle.right) & (x + size > paddle.left) & (y < paddle.bottom) & (y + size > paddle.top)
+            if overlap.any():
+                x[overlap] = face
+                vx[overlap] *= -1
+                counts["paddle"] += int(np.count_nonzero(overlap))
+
+        remaining = np.ones(self.num_balls) # Fraction of the step each ball still has to travel
+        moving = (vx != 0) | (vy != 0)
+        scored = np.zeros(self.num_balls, dtype=bool)
+        with np.errstate(divide="ignore", invalid="ignore"): # Zero speeds make infinities, which never win
+            for _ in range(MAX_BOUNCES_PER_STEP):
+                # Contact times for every ball: walls, paddle faces (when level with them), goal lines
+                t_wall = np.where(vy < 0, -y / vy, (SCREEN_HEIGHT - size - y) / vy)
+                t_paddle = np.full(self.num_balls, np.inf)
+                for paddle, facing, face_x in ((p1, (vx < 0) & (x >= p1.right), p1.right - x),
+                                               (p2, (vx > 0) & (x + size <= p2.left), p2.left - size - x)):
+                    t = face_x / vx
+                    y_at = y + vy * t
+                    level = facing & (y_at + size > paddle.top) & (y_at < paddle.bottom)
+                    t_paddle = np.where(level, np.minimum(t_paddle, t), t_paddle)
+                t_goal = np.where(vx < 0, -x / vx, (SCREEN_WIDTH - size - x) / vx)
+                times = np.nan_to_num(np.stack((t_wall, t_paddle, t_goal)), nan=np.inf, posinf=np.inf)
+                np.maximum(times, 0.0, out=times)
+                kind = times.argmin(axis=0) # Ties go to the wall, then the paddle, like the single ball
+                t = np.take_along_axis(times, kind[None], axis=0)[0]
+                hit = moving & (t <= remaining)
+
+                # --- Ball Movement (up to each ball's hit) ---
+                travel = np.where(hit, t, remaining) * moving
+                x += vx * travel
+                y += vy * travel
+                remaining -= travel
+
+                # --- Ball Collision ---
+                wall = hit & (kind == 0)
+                paddle_hit = hit & (kind == 1)
+                goal = hit & (kind == 2)
+                vy[wall] *= -1 # Boing!
+                vx[paddle_hit] *= -1
+                counts["wall"] += int(np.count_nonzero(wall))
+                counts["paddle"] += int(np.count_nonzero(paddle_hit))
+                if goal.any():
+                    left_goals = int(np.count_nonzero(goal & (vx < 0)))
+                    self.player2_score += left_goals
+                    self.player1_score += int(np.count_nonzero(goal)) - left_goals
+                    counts["score"] += int(np.count_nonzero(goal))
+                    scored |= goal
+                moving = hit & ~goal # Balls that didn't hit anything are done for this step
+                if not moving.any():
+                    break
+
+        self.spawn_balls(scored)
+        self.event_counts = counts
+        self.events.extend(name for name in ("wall", "paddle", "score") if counts[name]) # One beep per kind, purr
+        if self.player1_score >= self.winning_score or self.player2_score >= self.winning_score:
+            if self.player2_score > self.player1_score:
+                self.winner_text = "Player 2 Wins! Purrrrfect!"
             else:
-                reset_ball()
-
-        # Paddles
-        if ball.colliderect(player1_paddle) or ball.colliderect(player2_paddle):
-            # Prevent ball getting stuck inside paddle slightly
-            if ball.colliderect(player1_paddle):
-                 # Check if ball center is within paddle bounds vertically
-                if player1_paddle.top < ball.centery < player1_paddle.bottom:
-                    ball.left = player1_paddle.right # Move ball outside
-                    ball_speed_x_current *= -1 # Bounce off paddle!
-                    beep_paddle.play() # Play paddle hit beep!
-                # Handle edge case where ball hits corner slightly outside vertical bounds
-                elif ball.left < player1_paddle.right and ball_speed_x_current < 0:
-                    ball.left = player1_paddle.right # Push out
-                    ball_speed_x_current *= -1
-                    beep_paddle.play()
-
-            elif ball.colliderect(player2_paddle):
-                 # Check if ball center is within paddle bounds vertically
-                if player2_paddle.top < ball.centery < player2_paddle.bottom:
-                    ball.right = player2_paddle.left # Move ball outside
-                    ball_speed_x_current *= -1 # Bounce off paddle!
-                    beep_paddle.play() # Play paddle hit beep!
-                # Handle edge case
-                elif ball.right > player2_paddle.left and ball_speed_x_current > 0:
-                     ball.right = player2_paddle.left # Push out
-                     ball_speed_x_current *= -1
-                     beep_paddle.play()
-
-    # --- Drawing based on State ---
-    if game_state == MENU:
-        draw_menu()
-    elif game_state == PLAYING:
-        draw_game()
-    elif game_state == GAME_OVER:
-        draw_game_over()
-
-    # --- Update Display ---
-    pygame.display.flip() # Show the new frame! Nya!
+                self.winner_text = "Player 1 Wins! Meow-tastic!"
+            self.game_state = GAME_OVER
+
+    def serve_countdown(self):
+        return None # Balls respawn straight away in PONG 10
+
+    def snapshot(self):
+        return (super().snapshot(), self.ball_x.copy(), self.ball_y.copy(), self.ball_vx.copy(), self.ball_vy.copy(),
+                self.ball_rng.bit_generator.state)
+
+    def restore(self, snapshot):
+        base, ball_x, ball_y, ball_vx, ball_vy, rng_state = snapshot
+        super().restore(base)
+        self.ball_x[:], self.ball_y[:], self.ball_vx[:], self.ball_vy[:] = ball_x, ball_y, ball_vx, ball_vy
+        self.ball_rng.bit_generator.state = rng_state
+
+    def positions(self):
+        """Like PongMatch.positions, plus copies of every ball's x and y."""
+        return super().positions() + (self.ball_x.copy(), self.ball_y.copy())
+
+    def get_state(self):
+        state = super().get_state()
+        state["balls"] = (self.ball_x.copy(), self.ball_y.copy(), self.ball_vx.copy(), self.ball_vy.copy())
+        return state
+
+
+def earliest(hit_t, hit, t, name):
+    """Keeps whichever contact comes first (contacts already touching count as now)."""
+    t = max(t, 0.0)
+    return (t, name) if t < hit_t or (t == hit_t and hit is None) else (hit_t, hit)
+
+
+# --- CPU Player ---
+def intercept(x, y, vx, vy, face_x):
+    """Where a ball at (x, y) moving (vx, vy) per step reaches face_x: (steps, top y).
+
+    Closed form: the path runs straight to face_x, then the wall bounces are
+    folded back in (each bounce mirrors it, so the path repeats every
+    2 * span). Works on floats or on NumPy arrays of balls alike. vx must
+    point at face_x.
+    """
+    steps = (face_x - x) / vx
+    span = SCREEN_HEIGHT - BALL_SIZE # Range of the ball's top edge
+    unfolded = (y + vy * steps) % (2 * span)
+    return steps, span - abs(unfolded - span)
+
+
+class CpuPaddle:
+    """Plays one paddle: aims it where the ball will reach it, meow!
+
+    The intercept is worked out in closed form (see intercept()) only when a
+    ball's velocity changes, i.e. on a bounce or a serve, not every frame. The
+    kitty only "sees" a new intercept reaction_frames after it happens, and
+    guesses up to `error` pixels off, rolled again only when the intercept
+    moves (a wall bounce doesn't move it). With no ball coming it heads back
+    to the middle. For PONG 10 it keeps every ball's intercept, works out just
+    the ones whose velocity changed, and watches the ball that will reach it
+    first.
+    """
+
+    def __init__(self, player, difficulty=DEFAULT_CPU_DIFFICULTY, reaction_frames=None, error=None, seed=None):
+        settings = CPU_DIFFICULTIES[difficulty]
+        self.player = player
+        self.reaction_frames = settings["reaction_frames"] if reaction_frames is None else reaction_frames
+        self.error = settings["error"] if error is None else error
+        self.rng = random.Random(seed)
+        self.frame = 0
+        self.velocity = None # Ball velocity the current plan was made for
+        self.pending = deque() # (frame it's noticed, target y), oldest first
+        self.target = SCREEN_HEIGHT / 2 # Where the paddle's center is headed
+        # PONG 10: per-ball velocities the intercepts were worked out for, arrival frames and top y there
+        self.ball_vx = self.ball_vy = None
+        self.arrivals = None # Frame each ball reaches our face (inf if it's going the other way)
+        self.intercepts = None
+        self.watched = None # Index of the ball arriving first (None: no ball coming)
+        self.watched_top = None # Its intercept when the current target was noticed (also for the single ball)
+        # Stats
+        self.predictions = 0 # Intercepts worked out (per ball for PONG 10)
+        self.plans = 0 # New targets noticed
+
+    def input(self, match):
+        """INPUT_* flags for this paddle this step."""
+        self.frame += 1
+        if match.multiball:
+            self.watch_balls(match)
+        else:
+            velocity = (match.ball_speed_x_current, match.ball_speed_y_current)
+            if velocity != self.velocity or "score" in match.events: # A serve may keep the last velocity
+                self.velocity = velocity
+                top, watched_top = self.plan(match), self.watched_top
+                if top is None or watched_top is None:
+                    same = top is watched_top
+                else:
+                    same = abs(top - watched_top) < 1.0 # A wall bounce: same spot
+                self.watched_top = top
+                if not same:
+                    self.notice(SCREEN_HEIGHT / 2 if top is None else self.aim(top))
+        while self.pending and self.pending[0][0] <= self.frame:
+            self.target = self.pending.popleft()[1]
+
+        paddle = match.player1_paddle if self.player == 1 else match.player2_paddle
+        offset = self.target - paddle.centery
+        if offset < -PADDLE_SPEED / 2: # Close enough is close enough, or it would jitter around the target
+            return INPUT_UP
+        if offset > PADDLE_SPEED / 2:
+            return INPUT_DOWN
+        return INPUT_NONE
+
+    def notice(self, target):
+        """Queues a new target for reaction_frames from now."""
+        self.plans += 1
+        self.pending.append((self.frame + self.reaction_frames, target))
+
+    def face_x(self, match):
+        """The x a ball's left edge has when it touches our paddle."""
+        return match.player1_paddle.right if self.player == 1 else match.player2_paddle.left - BALL_SIZE
+
+    def aim(self, ball_top):
+        return ball_top + BALL_SIZE / 2 + self.rng.uniform(-self.error, self.error)
+
+    def plan(self, match):
+        """The ball's top y when it reaches our face, or None when it isn't coming."""
+        face_x = self.face_x(match)
+        ball = match.ball
+        vx, vy = match.ball_speed_x_current, match.ball_speed_y_current
+        incoming = (vx < 0 and ball.x >= face_x) if self.player == 1 else (vx > 0 and ball.x <= face_x)
+        if not incoming:
+            return None
+        self.predictions += 1
+        return intercept(ball.x, ball.y, vx, vy, face_x)[1]
+
+    def watch_balls(self, match):
+        """PONG 10: works out the intercepts of the balls whose velocity changed,
+        then notices a new target if one of them now arrives first (or the one
+        we were watching bounced or went past)."""
+        vx, vy = match.ball_vx, match.ball_vy
+        if self.ball_vx is None or len(self.ball_vx) != len(vx): # First look, or a different match
+            self.ball_vx = np.full(len(vx), np.nan) # NaN equals nothing, so every ball counts as changed
+            self.ball_vy = np.full(len(vx), np.nan)
+            self.arrivals = np.full(len(vx), np.inf)
+            self.intercepts = np.zeros(len(vx))
+            self.watched = None
+        changed = np.flatnonzero((vx != self.ball_vx) | (vy != self.ball_vy))
+        watched = self.watched
+        rescan = watched is not None and self.arrivals[watched] < self.frame # Went past us, it'll score
+        if len(changed):
+            self.ball_vx[changed] = vx[changed]
+            self.ball_vy[changed] = vy[changed]
+            face_x = self.face_x(match)
+            arrivals, intercepts = [], []
+            # A few balls bounce per frame: plain floats beat a dozen tiny array operations
+            for x, y, ball_vx, ball_vy in zip(match.ball_x[changed].tolist(), match.ball_y[changed].tolist(),
+                                              vx[changed].tolist(), vy[changed].tolist()):
+                if (ball_vx < 0 and x >= face_x) if self.player == 1 else (ball_vx > 0 and x <= face_x):
+                    steps, top = intercept(x, y, ball_vx, ball_vy, face_x)
+                    arrivals.append(self.frame + steps)
+                    intercepts.append(top)
+                else:
+                    arrivals.append(math.inf)
+                    intercepts.append(0.0)
+            self.predictions += len(changed)
+            self.arrivals[changed] = arrivals
+            self.intercepts[changed] = intercepts
+            changed = changed.tolist()
+            rescan = rescan or watched in changed
+
+        if rescan:
+            future = np.where(self.arrivals >= self.frame, self.arrivals, np.inf)
+            ball = int(future.argmin())
+            if future[ball] == math.inf:
+                ball = None
+        elif len(changed):
+            first = min(range(len(arrivals)), key=arrivals.__getitem__)
+            if arrivals[first] == math.inf or (watched is not None and arrivals[first] >= self.arrivals[watched]):
+                return # Still the same ball first
+            ball = changed[first]
+        else:
+            return
+
+        top = None if ball is None else self.intercepts[ball]
+        same = ball == watched and (ball is None or abs(top - self.watched_top) < 1.0) # A wall bounce: same spot
+        self.watched, self.watched_top = ball, top
+        if not same:
+            self.notice(SCREEN_HEIGHT / 2 if ball is None else self.aim(top))
+
+
+# --- Audio (optional attachment) ---
+class PongAudio:
+    """Plays a match's sound cues; needs the mixer initialized."""
+
+    def __init__(self, bank=sound_bank):
+        # Create Sound objects from generated waves (synthesized on the first run, loaded from the cache after that!)
+        # Frequency in Hz (Higher number = higher pitch)
+        self.sounds = {
+            "wall": bank.sound(440.0, DURATION_SHORT), # A note (middle C-ish)
+            "score": bank.sound(880.0, DURATION_MEDIUM), # Higher pitch for score!
+            "paddle": bank.sound(220.0, DURATION_SHORT), # Lower pitch for paddle
+        }
+
+    def play(self, events):
+        for event in events:
+            self.sounds[event].play()
+
+
+# --- Rendering (optional attachment) ---
+def lerp_rect(old, new, alpha):
+    """A rect `alpha` of the way from old to new, unless it jumped (the ball going back to the middle)."""
+    if abs(new[0] - old[0]) > LERP_SNAP_DISTANCE or abs(new[1] - old[1]) > LERP_SNAP_DISTANCE:
+        return pygame.Rect(new)
+    return pygame.Rect(round(gameloop.lerp(old[0], new[0], alpha)), round(gameloop.lerp(old[1], new[1], alpha)), new[2], new[3])
+
+
+class PongRenderer:
+    """Draws a PongMatch (menu, play field or game over) onto a surface."""
+
+    def __init__(self, screen):
+        self.screen = screen
+        # --- Fonts ---
+        self.title_font = pygame.font.Font(None, 100) # Big title font!
+        self.score_font = pygame.font.Font(None, 74) # Big clear numbers!
+        self.menu_font = pygame.font.Font(None, 36) # Font for menu and game over text
+        self.game_over_font = pygame.font.Font(None, 80) # Font for "GAME OVER"
+        self.copyright_font = pygame.font.Font(None, 24) # Smaller font for copyright
+        # One pre-drawn ball for PONG 10, blitted everywhere in a single blits() call
+        self.ball_image = pygame.Surface((BALL_SIZE, BALL_SIZE), pygame.SRCALPHA)
+        pygame.draw.ellipse(self.ball_image, BALL_COLOR, self.ball_image.get_rect())
+        # Lines under the title on the menu (net play swaps in a "waiting" message)
+        self.menu_prompts = ["Press SPACE to start game", "Press M for PONG 10 (so many balls!)"]
+
+    def draw(self, match, alpha=1.0, previous=None):
+        """previous is match.positions() from before the last step; things are drawn `alpha` of
+        the way from there to where they are now, so motion stays smooth at any frame rate."""
+        if match.game_state == MENU:
+            self.draw_menu()
+        elif match.game_state == PLAYING:
+            self.draw_game(match, alpha, previous)
+        elif match.game_state == GAME_OVER:
+            self.draw_game_over(match)
+
+    def draw_menu(self):
+        screen = self.screen
+        screen.fill(BG_COLOR)
+        # Title "PONG 10"
+        title_surface = render_text(self.title_font, "PONG", TEXT_COLOR)
+        title_rect = title_surface.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 80))
+        screen.blit(title_surface, title_rect)
+
+        ten_surface = render_text(self.score_font, "10", TEXT_COLOR) # Using score font for "10"
+        ten_rect = ten_surface.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 10)) # Positioned below PONG
+        screen.blit(ten_surface, ten_rect)
+
+        # Start instructions
+        for i, prompt in enumerate(self.menu_prompts):
+            prompt_surface = render_text(self.menu_font, prompt, TEXT_COLOR)
+            screen.blit(prompt_surface, prompt_surface.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 60 + 35 * i)))
+
+        # Copyright
+        self.draw_copyright()
+
+    def draw_game(self, match, alpha=1.0, previous=None):
+        screen = self.screen
+        ball, paddle1, paddle2 = match.ball, match.player1_paddle, match.player2_paddle
+        if previous and alpha < 1.0:
+            ball, paddle1, paddle2 = (lerp_rect(old, new, alpha) for old, new in zip(previous, (ball, paddle1, paddle2)))
+        screen.fill(BG_COLOR) # Fill the background first!
+        # Draw Paddles
+        pygame.draw.rect(screen, PADDLE_COLOR, paddle1)
+        pygame.draw.rect(screen, PADDLE_COLOR, paddle2)
+        # Draw Ball
+        if match.multiball:
+            self.draw_balls(match, alpha, previous)
+        else:
+            pygame.draw.ellipse(screen, BALL_COLOR, ball) # Ellipse looks more ball-like!
+        # Draw Center Line (optional aesthetic)
+        pygame.draw.aaline(screen, PADDLE_COLOR, (SCREEN_WIDTH // 2, 0), (SCREEN_WIDTH // 2, SCREEN_HEIGHT))
+        # Draw Scores
+        player1_text = render_text(self.score_font, str(match.player1_score), PADDLE_COLOR)
+        screen.blit(player1_text, (SCREEN_WIDTH // 4, 20))
+        player2_text = render_text(self.score_font, str(match.player2_score), PADDLE_COLOR)
+        screen.blit(player2_text, (SCREEN_WIDTH * 3 // 4 - player2_text.get_width() // 2 , 20)) # Adjust position slightly
+        # Serve countdown, so everyone knows the ball is coming, nya!
+        countdown = match.serve_countdown()
+        if countdown is not None:
+            countdown_text = render_text(self.menu_font, "%.1f" % (countdown / FPS), TEXT_COLOR)
+            screen.blit(countdown_text, countdown_text.get_rect(midbottom=(SCREEN_WIDTH // 2, match.ball.top - 10)))
+
+    def draw_balls(self, match, alpha=1.0, previous=None):
+        """Every PONG 10 ball in one batched blits() call, nya! Slid `alpha` of the way
+        from previous positions like lerp_rect does, except balls that just respawned."""
+        image = self.ball_image
+        x, y = match.ball_x, match.ball_y
+        if previous and alpha < 1.0 and len(previous) == 5 and len(previous[3]) == len(x):
+            old_x, old_y = previous[3], previous[4]
+            jumped = (np.abs(x - old_x) > LERP_SNAP_DISTANCE) | (np.abs(y - old_y) > LERP_SNAP_DISTANCE)
+            x = np.where(jumped, x, old_x + (x - old_x) * alpha)
+            y = np.where(jumped, y, old_y + (y - old_y) * alpha)
+        positions = zip(x.astype(np.int32).tolist(), y.astype(np.int32).tolist())
+        self.screen.blits([(image, pos) for pos in positions], doreturn=False)
+
+    def draw_game_over(self, match):
+        screen = self.screen
+        screen.fill(BG_COLOR)
+        # Display "GAME OVER"
+        game_over_surface = render_text(self.game_over_font, "GAME OVER", TEXT_COLOR)
+        game_over_rect = game_over_surface.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 100))
+        screen.blit(game_over_surface, game_over_rect)
+
+        # Display winner text
+        win_surface = render_text(self.menu_font, match.winner_text, PADDLE_COLOR) # Using menu font now
+        win_rect = win_surface.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
+        screen.blit(win_surface, win_rect)
+
+        # Display instruction text
+        restart_surface = render_text(self.menu_font, "Restart? (Y/N)", PADDLE_COLOR)
+        restart_rect = restart_surface.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 50))
+        screen.blit(restart_surface, restart_rect)
+
+        # Copyright (optional, keep it consistent?)
+        self.draw_copyright()
+
+    def draw_copyright(self):
+        copyright_surface = render_text(self.copyright_font, "copyright [@Team Flames HDR] 1.0", TEXT_COLOR)
+        copyright_rect = copyright_surface.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 20)) # Bottom center
+        self.screen.blit(copyright_surface, copyright_rect)
+
+
+# --- Game Loop (the interactive game is just a client of PongMatch!) ---
+def read_paddle_input(keys, up_key, down_key):
+    """INPUT_* flags for one paddle from pygame.key.get_pressed() (or anything indexed the same way)."""
+    return (INPUT_UP if keys[up_key] else INPUT_NONE) | (INPUT_DOWN if keys[down_key] else INPUT_NONE)
+
+def main(net_player=None, link=None, seed=None, cpu_players=(), difficulty=DEFAULT_CPU_DIFFICULTY, multiball=False):
+    """Runs the game. With net_player (1 or 2) and a netplay link, your paddle plays the one on
+    the other end of the link instead of someone sharing your keyboard, purr! Paddles listed in
+    cpu_players are played by a CpuPaddle; both of them makes an endless attract mode. multiball
+    starts in PONG 10 (the only way to get it in net play, where M isn't read)."""
+    # --- Initialize Pygame ---
+    pygame.mixer.pre_init(44100, -16, 1, 512) # Initialize mixer first with good settings! Nya!
+    pygame.init()
+    pygame.font.init() # Need this for scores and text, teehee!
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Cute Pong! Beep Boop!")
+    if multiball: # PONG 10 from the start
+        match = MultiBallMatch(audio=PongAudio(), renderer=PongRenderer(screen))
+    else:
+        match = PongMatch(serve_delay_frames=SERVE_DELAY_FRAMES, audio=PongAudio(), renderer=PongRenderer(screen))
+
+    cpus = {player: CpuPaddle(player, difficulty) for player in cpu_players}
+    attract = len(cpus) == 2 and not net_player
+    game_over_frames = 0
+    if attract:
+        match.reset() # No one to press SPACE
+
+    session = None
+    if net_player:
+        # Both sides simulate the whole match from the same seed; only inputs go over the wire
+        def net_step(p1_input, p2_input):
+            match.muted = session.resimulating # Those sounds already played the first time, nya
+            if match.game_state == MENU: # Frame 0: both sides start together
+                match.reset(session.seed)
+            elif match.game_state == GAME_OVER and (p1_input | p2_input) & INPUT_START:
+                match.reset()
+            match.step(p1_input, p2_input)
+
+        if seed is None:
+            seed = random.getrandbits(63) # Player 2 gets player 1's over the network
+        session = netplay.RollbackSession(link, net_player, match.snapshot, match.restore, net_step, seed=seed)
+        match.renderer.menu_prompts = ["Waiting for player %d..." % (3 - net_player), "You're player %d, nya!" % net_player]
+        pygame.display.set_caption("Cute Pong! Beep Boop! (player %d)" % net_player)
+
+    prof = frame_profiler
+    previous = None # Positions before the last step, for smooth drawing
+
+    def handle_events():
+        nonlocal match
+        # --- Event Handling ---
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return False
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_F3: # Peek at the stopwatches!
+                    prof.toggle_overlay()
+                elif event.key == pygame.K_F4 and prof.enabled: # Save them for later, nya!
+                    print("Wrote", prof.export(prof.export_path.format(frame=prof.frames)))
+                elif session:
+                    if match.game_state == GAME_OVER and event.key == pygame.K_n:
+                        return False # Restarting is a paddle input in net play (hold Y), quitting isn't
+                elif match.game_state == MENU:
+                    if event.key == pygame.K_SPACE:
+                        match.reset() # Start the game from menu
+                    elif event.key == pygame.K_m: # PONG 10 time!
+                        match = MultiBallMatch(audio=match.audio, renderer=match.renderer)
+                        match.reset()
+                elif match.game_state == GAME_OVER:
+                    if event.key == pygame.K_y: # Yes to restart
+                        match.reset() # Restart the game
+                    elif event.key == pygame.K_n: # No to restart
+                        return False # Quit the program
+        prof.mark("events")
+
+    def step():
+        nonlocal previous, game_over_frames
+        # --- Game Logic based on State ---
+        if session:
+            # Either set of keys drives your own paddle; the other one comes over the network
+            keys = pygame.key.get_pressed()
+            local_input = read_paddle_input(keys, pygame.K_w, pygame.K_s) | read_paddle_input(keys, pygame.K_UP, pygame.K_DOWN)
+            if net_player in cpus: # A kitty plays for you (great for soak testing the netcode)
+                local_input = cpus[net_player].input(match)
+            if keys[pygame.K_y]:
+                local_input |= INPUT_START
+            prof.mark("input")
+            previous = match.positions()
+            session.advance(local_input) # Rolls back and catches up first if a guess was wrong
+            prof.mark("step")
+        elif match.game_state == PLAYING:
+            # --- Player Input ---
+            keys = pygame.key.get_pressed()
+            p1_input = cpus[1].input(match) if 1 in cpus else read_paddle_input(keys, pygame.K_w, pygame.K_s)
+            p2_input = cpus[2].input(match) if 2 in cpus else read_paddle_input(keys, pygame.K_UP, pygame.K_DOWN)
+            prof.mark("input")
+            previous = match.positions()
+            match.step(p1_input, p2_input)
+            prof.mark("step")
+        elif attract and match.game_state == GAME_OVER:
+            game_over_frames += 1
+            if game_over_frames >= ATTRACT_RESTART_FRAMES: # And again, and again, nya!
+                game_over_frames = 0
+                match.reset()
+
+    def render(alpha):
+        # --- Drawing based on State ---
+        match.render(alpha, previous)
+        prof.mark("draw")
+        prof.draw(screen)
+        prof.mark("overlay")
+
+        # --- Update Display ---
+        pygame.display.flip() # Show the new frame! Nya!
+        prof.mark("flip")
 
     # --- Frame Rate ---
-    clock.tick(60) # Keep it running smoothly at 60 FPS, like a graceful kitty!
-
-# --- Quit Pygame ---
-pygame.quit()
-sys.exit() # Clean exit! Bye-bye!
+    # Steps at FPS, draws at RENDER_FPS, like a graceful kitty! (the loop marks "wait" and ends profiler frames)
+    loop = gameloop.FixedStepLoop(FPS, RENDER_FPS, unthrottled=UNTHROTTLED, profiler=prof)
+    loop.run(handle_events, step, render)
+    if session:
+        session.close()
+        print("Net play:", session.stats())
+
+    # --- Quit Pygame ---
+    pygame.quit()
+    sys.exit() # Clean exit! Bye-bye!
+
+if __name__ == "__main__": # Only play when run directly, so benchmarks can import us, purr!
+    import argparse
+    parser = argparse.ArgumentParser(description="Cute Pong! Beep Boop!")
+    parser.add_argument("--net", type=int, choices=[1, 2], metavar="PLAYER",
+                        help="play over UDP as player 1 or 2 (run the other player with the other number)")
+    parser.add_argument("--peer", default="127.0.0.1", metavar="HOST", help="the other player's address")
+    parser.add_argument("--port", type=int, default=netplay.DEFAULT_PORT, metavar="PORT",
+                        help="player 1's UDP port; player 2 uses the next one")
+    parser.add_argument("--seed", type=int, help="serve seed (player 1's is used)")
+    parser.add_argument("--cpu", type=int, choices=[1, 2], action="append", default=[], metavar="PLAYER",
+                        help="let the computer play this paddle (give it twice for attract mode; in net play, your own)")
+    parser.add_argument("--difficulty", choices=list(CPU_DIFFICULTIES), default=DEFAULT_CPU_DIFFICULTY,
+                        help="how good the computer is")
+    parser.add_argument("--multiball", action="store_true",
+                        help="play PONG 10 (in net play both players must give it, or the games drift apart)")
+    parser.add_argument("--fake-delay", type=float, default=0.0, metavar="MS", help="add this much delay to incoming packets")
+    parser.add_argument("--fake-jitter", type=float, default=0.0, metavar="MS", help="add up to this much more, at random")
+    parser.add_argument("--fake-loss", type=float, default=0.0, metavar="FRACTION", help="drop this share of incoming packets")
+    args = parser.parse_args()
+
+    link = None
+    if args.net:
+        ports = (args.port, args.port + 1)
+        link = netplay.UdpLink(ports[args.net - 1], (args.peer, ports[2 - args.net]))
+        if args.fake_delay or args.fake_jitter or args.fake_loss:
+            link = netplay.FlakyLink(link, args.fake_delay, args.fake_jitter, args.fake_loss)
+    main(args.net, link, args.seed, args.cpu, args.difficulty, args.multiball)
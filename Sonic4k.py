@@ -2,6 +2,9 @@
 import pygame
 import os
 import sys
+import profiler # Stopwatches for every part of the frame, shared with the other games!
+import gameloop # Same game speed on every screen, purr!
+import tileworld # Big levels in 128px chunks, streamed in as we run, zoom!
 import random # Nya, let's add some random stars!
 
 # --- Constants ---
@@ -19,14 +22,25 @@ PLAYER_JUMP = -10 # Wee!
 PLAYER_WIDTH = 30
 PLAYER_HEIGHT = 40
 GROUND_HEIGHT = 50
+FPS = 60 # Physics steps per second (GRAVITY and friends are per step!)
+RENDER_FPS = 60 # Frames drawn per second (0 = as many as the screen can take)
+UNTHROTTLED = False # True = simulate and draw flat out, zoom!
+FRAME_BUDGET_MS = 1.5 * 1000 / FPS # Slower frames get counted (and exported while profiling)
+PROFILE_PHASES = ["events", "update", "draw", "overlay", "flip", "wait"]
+PROFILE_EXPORT_PATH = "sonic-profile-{frame}.csv"
+# Level (see tileworld.py); made the first time it's needed if it isn't there yet, nya!
+LEVEL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "levels", "generated-zone.tlvl")
+LEVEL_CHUNKS_WIDE = 320 # 40960 px of running, meow!
+LEVEL_SEED = 4
 
 # --- Helper Function for Background ---
-def create_background(width, height):
-    """Creates a simple sky and ground background, purrr."""
+def create_background(width, height, ground=True):
+    """Creates a simple sky and ground background, purrr. (Levels bring their own ground.)"""
     background = pygame.Surface((width, height))
     background.fill(SKY_BLUE) # Fill the sky
     # Draw the ground rectangle
-    pygame.draw.rect(background, GREEN, (0, height - GROUND_HEIGHT, width, GROUND_HEIGHT)) 
+    if ground:
+        pygame.draw.rect(background, GREEN, (0, height - GROUND_HEIGHT, width, GROUND_HEIGHT)) 
     # Draw some stars, nya!
     for _ in range(50): # 50 stars!
         x = random.randint(0, width)
@@ -38,8 +52,9 @@ def create_background(width, height):
 # --- Player Class ---
 # Using Pygame Sprites makes things easier, purrrr! 
 class Player(pygame.sprite.Sprite):
-    def __init__(self):
+    def __init__(self, world=None):
         pygame.sprite.Sprite.__init__(self)
+        self.world = world # A tileworld.TileWorld to run around in, or None for the flat one-screen floor
         # Create the player surface with code, meow!
         self.image = pygame.Surface((PLAYER_WIDTH, PLAYER_HEIGHT))
         self.image.fill(BLUE) # Make the player a blue rectangle
@@ -49,19 +64,27 @@ class Player(pygame.sprite.Sprite):
         self.rect.centerx = SCREEN_WIDTH / 2
         self.rect.bottom = SCREEN_HEIGHT - GROUND_HEIGHT # Start on the ground
         self.pos = pygame.math.Vector2(self.rect.centerx, self.rect.bottom)
+        self.prev_pos = pygame.math.Vector2(self.pos) # Where we were one step ago, for smooth drawing
         self.vel = pygame.math.Vector2(0, 0)
         self.acc = pygame.math.Vector2(0, 0)
+        self.on_ground = True
+        if world is not None:
+            self.pos.update(world.spawn)
+            self.prev_pos.update(self.pos)
+            self.rect.midbottom = world.spawn
 
     def jump(self):
         # Only jump if standing on the ground, nya!
-        if self.rect.bottom >= SCREEN_HEIGHT - GROUND_HEIGHT:
+        if self.on_ground:
              self.vel.y = PLAYER_JUMP 
 
-    def update(self):
+    def update(self, keys=None):
+        self.prev_pos.update(self.pos)
         # Reset acceleration each frame
         self.acc = pygame.math.Vector2(0, GRAVITY) # Gravity always pulls down! 
         
-        keys = pygame.key.get_pressed()
+        if keys is None: # Benchmarks hand us pretend keys, nya!
+            keys = pygame.key.get_pressed()
         if keys[pygame.K_LEFT]:
             self.acc.x = -PLAYER_ACC
         if keys[pygame.K_RIGHT]:
@@ -75,65 +98,127 @@ class Player(pygame.sprite.Sprite):
         # Limit max fall speed, nya!
         if self.vel.y > 15:
             self.vel.y = 15
-        self.pos += self.vel + 0.5 * self.acc
-        
-        # Keep Player on screen (simple boundary check)
-        if self.pos.x > SCREEN_WIDTH - self.rect.width / 2:
-            self.pos.x = SCREEN_WIDTH - self.rect.width / 2
-            self.vel.x = 0 # Stop at edge
-        if self.pos.x < self.rect.width / 2:
-            self.pos.x = self.rect.width / 2
-            self.vel.x = 0 # Stop at edge
-            
-        # Simple ground check - stop exactly at ground level
-        if self.pos.y > SCREEN_HEIGHT - GROUND_HEIGHT:
-             self.pos.y = SCREEN_HEIGHT - GROUND_HEIGHT
-             self.vel.y = 0 # Stop falling at the bottom
-             
+        move = self.vel + 0.5 * self.acc
+        if self.world is not None:
+            self.move_in_world(move)
+        else:
+            self.pos += move
+
+            # Keep Player on screen (simple boundary check)
+            if self.pos.x > SCREEN_WIDTH - self.rect.width / 2:
+                self.pos.x = SCREEN_WIDTH - self.rect.width / 2
+                self.vel.x = 0 # Stop at edge
+            if self.pos.x < self.rect.width / 2:
+                self.pos.x = self.rect.width / 2
+                self.vel.x = 0 # Stop at edge
+
+            # Simple ground check - stop exactly at ground level
+            if self.pos.y > SCREEN_HEIGHT - GROUND_HEIGHT:
+                 self.pos.y = SCREEN_HEIGHT - GROUND_HEIGHT
+                 self.vel.y = 0 # Stop falling at the bottom
+            self.on_ground = round(self.pos.y) >= SCREEN_HEIGHT - GROUND_HEIGHT
+
         self.rect.midbottom = (round(self.pos.x), round(self.pos.y)) # Use round for better positioning
 
+    def move_in_world(self, move):
+        """Moves through the level's tiles, landing on (and bonking into) solid ones, nya!"""
+        width, height = self.rect.width, self.rect.height
+        step_up = tileworld.TILE_SIZE if self.on_ground else 0 # Walk up single-tile steps, no hop needed
+        x, y, hit_x, hit_y = self.world.move_box(self.pos.x - width / 2, self.pos.y - height, width, height,
+                                                 move.x, move.y, step_up)
+        self.pos.update(x + width / 2, y + height)
+        if hit_x:
+            self.vel.x = 0 # Bonk!
+        if hit_y:
+            self.vel.y = 0
+        self.on_ground = hit_y and move.y > 0
+        if y > self.world.pixel_height: # Fell down a pit: back to the start, meow
+            self.pos.update(self.world.spawn)
+            self.prev_pos.update(self.pos)
+            self.vel.update(0, 0)
+
+    def draw_rect(self, alpha):
+        """Our rect `alpha` of the way from last step's position to this one, nya!"""
+        pos = self.prev_pos.lerp(self.pos, alpha)
+        return self.image.get_rect(midbottom=(round(pos.x), round(pos.y)))
+
 # --- Game Initialization ---
-pygame.init()
-# pygame.mixer.init() # Still commented out, meow! Add sound later if you want!
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Meow! Sonic CD Code Shapes!")
-clock = pygame.time.Clock()
-
-# --- Create Assets with Code ---
-background_surface = create_background(SCREEN_WIDTH, SCREEN_HEIGHT)
-
-# --- Sprites ---
-all_sprites = pygame.sprite.Group()
-player = Player()
-all_sprites.add(player)
-
-# --- Game Loop ---
-running = True
-while running:
-    # Keep loop running at the right speed, purrrr!
-    clock.tick(60) # Aim for 60 FPS
-    
-    # Process Input (Events)
-    for event in pygame.event.get():
-        # Check for closing window
-        if event.type == pygame.QUIT:
-            running = False
-        # Check for key presses
-        if event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_SPACE or event.key == pygame.K_UP: # Jump keys!
-                player.jump()
-
-    # Update
-    all_sprites.update() # Calls the update() method of all sprites (our player!)
-
-    # Draw / Render
-    screen.blit(background_surface, (0,0)) # Draw the background surface first! 
-        
-    all_sprites.draw(screen) # Pygame draws all sprites in the group, nya!
-    
-    # *after* drawing everything, flip the display
-    pygame.display.flip() # Shows the new frame! 
-
-# --- Done ---
-pygame.quit()
-sys.exit() # Ensures the program closes cleanly, purr!
+def main(level=LEVEL_FILE):
+    """Runs the game in the level file `level` (None: the flat one-screen floor)."""
+    pygame.init()
+    # pygame.mixer.init() # Still commented out, meow! Add sound later if you want!
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Meow! Sonic CD Code Shapes!")
+    # How long each bit of the frame takes: F3 to peek, F4 to save. Sleeps until you ask, meow!
+    prof = profiler.FrameProfiler(PROFILE_PHASES, budget_ms=FRAME_BUDGET_MS, export_path=PROFILE_EXPORT_PATH)
+
+    # --- Create Assets with Code ---
+    world = None
+    if level:
+        if level == LEVEL_FILE and not os.path.exists(level): # First run: make the default level, nya!
+            os.makedirs(os.path.dirname(level), exist_ok=True)
+            tileworld.generate(level, LEVEL_CHUNKS_WIDE, seed=LEVEL_SEED)
+        world = tileworld.TileWorld(level) # Maps the file; chunks get drawn as they scroll into view
+    background_surface = create_background(SCREEN_WIDTH, SCREEN_HEIGHT, ground=world is None)
+
+    # --- Sprites ---
+    all_sprites = pygame.sprite.Group()
+    player = Player(world)
+    all_sprites.add(player)
+
+    # --- Game Loop ---
+    def handle_events():
+        # Process Input (Events)
+        for event in pygame.event.get():
+            # Check for closing window
+            if event.type == pygame.QUIT:
+                return False
+            # Check for key presses
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE or event.key == pygame.K_UP: # Jump keys!
+                    player.jump()
+                elif event.key == pygame.K_F3: # Peek at the stopwatches!
+                    prof.toggle_overlay()
+                elif event.key == pygame.K_F4 and prof.enabled: # Save them for later, nya!
+                    print("Wrote", prof.export(prof.export_path.format(frame=prof.frames)))
+        prof.mark("events")
+
+    def step():
+        # Update
+        all_sprites.update() # Calls the update() method of all sprites (our player!)
+        prof.mark("update")
+
+    def render(alpha):
+        # Draw / Render
+        screen.blit(background_surface, (0,0)) # Draw the background surface first! 
+        camera = (0, 0)
+        if world: # The camera follows the player (where it's drawn, so it glides too)
+            camera = world.camera(player.draw_rect(alpha).center, (SCREEN_WIDTH, SCREEN_HEIGHT))
+            world.draw(screen, camera)
+
+        for sprite in all_sprites: # Each sprite drawn between its last two steps, so it glides, nya!
+            screen.blit(sprite.image, sprite.draw_rect(alpha).move(-camera[0], -camera[1]))
+        prof.mark("draw")
+        prof.draw(screen)
+        prof.mark("overlay")
+
+        # *after* drawing everything, flip the display
+        pygame.display.flip() # Shows the new frame! 
+        prof.mark("flip")
+
+    # Keep loop running at the right speed, purrrr! Physics at FPS, drawing at RENDER_FPS
+    loop = gameloop.FixedStepLoop(FPS, RENDER_FPS, unthrottled=UNTHROTTLED, profiler=prof)
+    loop.run(handle_events, step, render)
+
+    # --- Done ---
+    pygame.quit()
+    sys.exit() # Ensures the program closes cleanly, purr!
+
+if __name__ == "__main__": # Only run the loop when started directly, purr!
+    import argparse
+    parser = argparse.ArgumentParser(description="Meow! Sonic CD Code Shapes!")
+    parser.add_argument("--level", default=LEVEL_FILE, metavar="FILE",
+                        help="tile level to play (see tileworld.py; the default one is generated on first run)")
+    parser.add_argument("--flat", action="store_true", help="play on the old flat one-screen floor instead")
+    args = parser.parse_args()
+    main(None if args.flat else args.level)
@@ -2,6 +2,10 @@
 import pygame
 import os
 import sys
+import profiler # Stopwatches for every part of the frame, shared with the other games!
+import gameloop # Same game speed on every screen, purr!
+import tileworld # Big levels in 128px chunks, streamed in as we run, zoom!
+import spriteatlas # Every pose drawn once, then it's just one blit a frame, nya!
 import random # Nya, let's add some random stars!
 import math # For spikes, meow!
 
@@ -28,14 +32,31 @@ PLAYER_JUMP = -10 # Wee!
 PLAYER_WIDTH = 40 
 PLAYER_HEIGHT = 50 # Slightly taller to fit spikes, maybe?
 GROUND_HEIGHT = 50
+FPS = 60 # Physics steps per second (GRAVITY and friends are per step!)
+RENDER_FPS = 60 # Frames drawn per second (0 = as many as the screen can take)
+UNTHROTTLED = False # True = simulate and draw flat out, zoom!
+FRAME_BUDGET_MS = 1.5 * 1000 / FPS # Slower frames get counted (and exported while profiling)
+PROFILE_PHASES = ["events", "update", "draw", "overlay", "flip", "wait"]
+PROFILE_EXPORT_PATH = "sonic-a-profile-{frame}.csv" # Not sonic-profile: Sonic4k.py writes those
+# Level (see tileworld.py); made the first time it's needed if it isn't there yet, nya!
+LEVEL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "levels", "generated-zone.tlvl")
+LEVEL_CHUNKS_WIDE = 320 # 40960 px of running, meow!
+LEVEL_SEED = 4
+# Animation, meow!
+SPRITE_ANGLES = 16 # Rotation steps baked into the atlas (22.5 degrees apart)
+IDLE_SPEED = 0.5 # Slower than this and Sonic just stands there
+RUN_FRAME_DISTANCE = 12 # Pixels run per running frame, so the feet keep up with the ground
+ROLL_SPIN = 20 # Degrees per step when spinning in the air...
+ROLL_SPIN_PER_SPEED = 3 # ...plus this much per pixel/step of sideways speed
 
 # --- Helper Function for Background ---
-def create_background(width, height):
-    """Creates a simple sky and ground background, purrr."""
+def create_background(width, height, ground=True):
+    """Creates a simple sky and ground background, purrr. (Levels bring their own ground.)"""
     background = pygame.Surface((width, height))
     background.fill(SKY_BLUE) # Fill the sky
     # Draw the ground rectangle
-    pygame.draw.rect(background, GREEN, (0, height - GROUND_HEIGHT, width, GROUND_HEIGHT)) 
+    if ground:
+        pygame.draw.rect(background, GREEN, (0, height - GROUND_HEIGHT, width, GROUND_HEIGHT)) 
     # Draw some stars, nya!
     for _ in range(50): # 50 stars!
         x = random.randint(0, width)
@@ -44,80 +65,130 @@ def create_background(width, height):
         pygame.draw.circle(background, YELLOW, (x, y), size)
     return background
 
+# --- Sonic's Poses (drawn with shapes once, then kept in the atlas) ---
+def draw_sonic(image, back_shoe=(-13, 0), front_shoe=(1, 0)):
+    """Sonic facing right on a PLAYER_WIDTH x PLAYER_HEIGHT canvas; shoes are (x offset, lift), nya!"""
+    # --- Draw Sonic with Shapes! Nya! ---
+    center_x = PLAYER_WIDTH // 2
+    body_bottom = PLAYER_HEIGHT - 10 # Leave space for feet
+
+    # Body (Blue ellipse)
+    body_rect = pygame.Rect(center_x - 12, 5, 24, 30)
+    pygame.draw.ellipse(image, SONIC_BLUE, body_rect)
+
+    # Belly (Skin ellipse)
+    belly_rect = pygame.Rect(center_x - 7, 15, 14, 18)
+    pygame.draw.ellipse(image, SONIC_SKIN, belly_rect)
+
+    # Muzzle (Skin circle/ellipse) - drawn slightly lower and forward
+    muzzle_rect = pygame.Rect(center_x - 2, body_bottom - 20, 14, 10)
+    pygame.draw.ellipse(image, SONIC_SKIN, muzzle_rect)
+
+    # Nose (Small black circle)
+    nose_pos = (muzzle_rect.centerx + 5 , muzzle_rect.centery)
+    pygame.draw.circle(image, BLACK, nose_pos, 2)
+
+    # Eyes (White ovals with black dots) - Basic version
+    eye_y = body_rect.centery - 5
+    pygame.draw.ellipse(image, WHITE, (center_x - 7, eye_y -3 , 6, 8))
+    pygame.draw.ellipse(image, WHITE, (center_x + 1, eye_y - 3, 6, 8))
+    pygame.draw.circle(image, BLACK, (center_x - 4, eye_y + 1), 1) # Pupils
+    pygame.draw.circle(image, BLACK, (center_x + 4, eye_y + 1), 1)
+
+    # Spikes (Blue triangles) - Simplified! Nya!
+    spike_base_y = body_rect.centery
+    # Spike 1 (Top)
+    pygame.draw.polygon(image, SONIC_BLUE, [(center_x - 12, spike_base_y - 5), (center_x - 20, spike_base_y - 15), (center_x - 10, spike_base_y)])
+    # Spike 2 (Middle)
+    pygame.draw.polygon(image, SONIC_BLUE, [(center_x - 14, spike_base_y + 5), (center_x - 25, spike_base_y + 5), (center_x - 12, spike_base_y + 12)])
+    # Spike 3 (Lower)
+    pygame.draw.polygon(image, SONIC_BLUE, [(center_x - 12, spike_base_y + 15), (center_x - 20, spike_base_y + 25), (center_x - 10, spike_base_y + 18)])
+
+    # Feet/Shoes (Red ovals with white stripe) - Simple!
+    shoe_y = body_bottom + 2
+    for shoe_x, lift in (back_shoe, front_shoe):
+        pygame.draw.ellipse(image, SONIC_RED, (center_x + shoe_x, shoe_y - lift, 12, 8))
+        pygame.draw.rect(image, WHITE, (center_x + shoe_x + 1, shoe_y - lift + 1, 10, 3)) # Stripe
+    # --- End Drawing Sonic ---
+
+def draw_sonic_stand(image):
+    draw_sonic(image)
+
+# Running: the shoes take turns stretching out and lifting, zoom zoom!
+def draw_sonic_run0(image):
+    draw_sonic(image, back_shoe=(-18, 0), front_shoe=(6, 3))
+
+def draw_sonic_run1(image):
+    draw_sonic(image, back_shoe=(-13, 3), front_shoe=(1, 0))
+
+def draw_sonic_run2(image):
+    draw_sonic(image, back_shoe=(-8, 0), front_shoe=(-4, 3))
+
+def draw_sonic_run3(image):
+    draw_sonic(image, back_shoe=(-13, 0), front_shoe=(1, 3))
+
+def draw_sonic_roll(image):
+    """Curled up in a spiky ball (centered on the canvas, so spinning it doesn't wobble), nya!"""
+    center = (PLAYER_WIDTH // 2, PLAYER_HEIGHT // 2)
+    pygame.draw.circle(image, SONIC_BLUE, center, 18)
+    # Spikes swirling around the back, so the spin shows
+    for dx, dy in ((-14, -14), (-20, 2), (-10, 16)):
+        pygame.draw.polygon(image, SONIC_BLUE, [(center[0] + dx, center[1] + dy), (center[0], center[1] - 8), (center[0], center[1] + 8)])
+    pygame.draw.ellipse(image, SONIC_SKIN, (center[0] + 2, center[1] - 2, 14, 12)) # Muzzle tucked in
+    pygame.draw.ellipse(image, WHITE, (center[0] + 4, center[1] - 11, 6, 8)) # One eye peeking out
+    pygame.draw.circle(image, BLACK, (center[0] + 8, center[1] - 7), 1)
+
+SONIC_POSES = {
+    "stand": draw_sonic_stand,
+    "run0": draw_sonic_run0,
+    "run1": draw_sonic_run1,
+    "run2": draw_sonic_run2,
+    "run3": draw_sonic_run3,
+    "roll": draw_sonic_roll,
+}
+RUN_POSES = ["run0", "run1", "run2", "run3"]
+
 # --- Player Class ---
 # Using Pygame Sprites makes things easier, purrrr! 
 class Player(pygame.sprite.Sprite):
-    def __init__(self):
+    def __init__(self, world=None):
         pygame.sprite.Sprite.__init__(self)
-        
-        # Create the player surface with code, meow! Make it transparent!
-        self.image = pygame.Surface((PLAYER_WIDTH, PLAYER_HEIGHT)).convert()
-        self.image.fill(TRANSPARENT_BG) # Fill with transparent background color
-        self.image.set_colorkey(TRANSPARENT_BG) # Make this color transparent
-
-        # --- Draw Sonic with Shapes! Nya! ---
-        center_x = PLAYER_WIDTH // 2
-        body_bottom = PLAYER_HEIGHT - 10 # Leave space for feet
-
-        # Body (Blue ellipse)
-        body_rect = pygame.Rect(center_x - 12, 5, 24, 30)
-        pygame.draw.ellipse(self.image, SONIC_BLUE, body_rect)
-
-        # Belly (Skin ellipse)
-        belly_rect = pygame.Rect(center_x - 7, 15, 14, 18)
-        pygame.draw.ellipse(self.image, SONIC_SKIN, belly_rect)
-        
-        # Muzzle (Skin circle/ellipse) - drawn slightly lower and forward
-        muzzle_rect = pygame.Rect(center_x - 2, body_bottom - 20, 14, 10) 
-        pygame.draw.ellipse(self.image, SONIC_SKIN, muzzle_rect)
-        
-        # Nose (Small black circle)
-        nose_pos = (muzzle_rect.centerx + 5 , muzzle_rect.centery)
-        pygame.draw.circle(self.image, BLACK, nose_pos, 2)
-
-        # Eyes (White ovals with black dots) - Basic version
-        eye_y = body_rect.centery - 5
-        pygame.draw.ellipse(self.image, WHITE, (center_x - 7, eye_y -3 , 6, 8))
-        pygame.draw.ellipse(self.image, WHITE, (center_x + 1, eye_y - 3, 6, 8))
-        pygame.draw.circle(self.image, BLACK, (center_x - 4, eye_y + 1), 1) # Pupils
-        pygame.draw.circle(self.image, BLACK, (center_x + 4, eye_y + 1), 1)
-
-        # Spikes (Blue triangles) - Simplified! Nya!
-        spike_base_y = body_rect.centery
-        # Spike 1 (Top)
-        pygame.draw.polygon(self.image, SONIC_BLUE, [(center_x - 12, spike_base_y - 5), (center_x - 20, spike_base_y - 15), (center_x - 10, spike_base_y)])
-        # Spike 2 (Middle)
-        pygame.draw.polygon(self.image, SONIC_BLUE, [(center_x - 14, spike_base_y + 5), (center_x - 25, spike_base_y + 5), (center_x - 12, spike_base_y + 12)])
-        # Spike 3 (Lower)
-        pygame.draw.polygon(self.image, SONIC_BLUE, [(center_x - 12, spike_base_y + 15), (center_x - 20, spike_base_y + 25), (center_x - 10, spike_base_y + 18)])
-
-        # Feet/Shoes (Red ovals with white stripe) - Simple!
-        shoe_y = body_bottom + 2
-        # Left Shoe
-        pygame.draw.ellipse(self.image, SONIC_RED, (center_x - 13, shoe_y, 12, 8))
-        pygame.draw.rect(self.image, WHITE, (center_x - 12, shoe_y + 1, 10, 3)) # Stripe
-        # Right Shoe
-        pygame.draw.ellipse(self.image, SONIC_RED, (center_x + 1, shoe_y, 12, 8))
-        pygame.draw.rect(self.image, WHITE, (center_x + 2, shoe_y + 1, 10, 3)) # Stripe
-        # --- End Drawing Sonic ---
-
-        self.rect = self.image.get_rect()
+        self.world = world # A tileworld.TileWorld to run around in, or None for the flat one-screen floor
+
+        # All of Sonic's frames, drawn once (or loaded from sprite_cache/), meow!
+        self.atlas = spriteatlas.load_atlas("sonic", SONIC_POSES, (PLAYER_WIDTH, PLAYER_HEIGHT),
+                                            SPRITE_ANGLES, TRANSPARENT_BG)
+        self.pose = "stand"
+        self.facing_left = False # The drawing faces right; the atlas has the mirror image
+        self.angle = 0.0 # Degrees, counterclockwise
+        self.run_distance = 0.0 # How far we've run, picks the running frame
+        self.frame_rect = self.atlas.frame(self.pose)
+
+        self.rect = pygame.Rect(0, 0, PLAYER_WIDTH, PLAYER_HEIGHT) # Where Sonic is; frames are drawn centered on it
         self.rect.centerx = SCREEN_WIDTH / 2
         self.rect.bottom = SCREEN_HEIGHT - GROUND_HEIGHT # Start on the ground
         self.pos = pygame.math.Vector2(self.rect.centerx, self.rect.bottom)
+        self.prev_pos = pygame.math.Vector2(self.pos) # Where we were one step ago, for smooth drawing
         self.vel = pygame.math.Vector2(0, 0)
         self.acc = pygame.math.Vector2(0, 0)
+        self.on_ground = True
+        if world is not None:
+            self.pos.update(world.spawn)
+            self.prev_pos.update(self.pos)
+            self.rect.midbottom = world.spawn
 
     def jump(self):
         # Only jump if standing on the ground, nya!
-        if self.rect.bottom >= SCREEN_HEIGHT - GROUND_HEIGHT:
+        if self.on_ground:
              self.vel.y = PLAYER_JUMP 
 
-    def update(self):
+    def update(self, keys=None):
+        self.prev_pos.update(self.pos)
         # Reset acceleration each frame
         self.acc = pygame.math.Vector2(0, GRAVITY) # Gravity always pulls down! 
         
-        keys = pygame.key.get_pressed()
+        if keys is None: # Benchmarks hand us pretend keys, nya!
+            keys = pygame.key.get_pressed()
         if keys[pygame.K_LEFT]:
             self.acc.x = -PLAYER_ACC
         if keys[pygame.K_RIGHT]:
@@ -131,67 +202,155 @@ class Player(pygame.sprite.Sprite):
         # Limit max fall speed, nya!
         if self.vel.y > 15:
             self.vel.y = 15
-        self.pos += self.vel + 0.5 * self.acc
-        
-        # Keep Player on screen (simple boundary check)
-        # Adjust bounds for the new player width
-        if self.pos.x > SCREEN_WIDTH - self.rect.width / 2:
-            self.pos.x = SCREEN_WIDTH - self.rect.width / 2
-            self.vel.x = 0 # Stop at edge
-        if self.pos.x < self.rect.width / 2:
-            self.pos.x = self.rect.width / 2
-            self.vel.x = 0 # Stop at edge
-            
-        # Simple ground check - stop exactly at ground level
-        if self.pos.y > SCREEN_HEIGHT - GROUND_HEIGHT:
-             self.pos.y = SCREEN_HEIGHT - GROUND_HEIGHT
-             self.vel.y = 0 # Stop falling at the bottom
-             
+        move = self.vel + 0.5 * self.acc
+        if self.world is not None:
+            self.move_in_world(move)
+        else:
+            self.pos += move
+
+            # Keep Player on screen (simple boundary check)
+            # Adjust bounds for the new player width
+            if self.pos.x > SCREEN_WIDTH - self.rect.width / 2:
+                self.pos.x = SCREEN_WIDTH - self.rect.width / 2
+                self.vel.x = 0 # Stop at edge
+            if self.pos.x < self.rect.width / 2:
+                self.pos.x = self.rect.width / 2
+                self.vel.x = 0 # Stop at edge
+
+            # Simple ground check - stop exactly at ground level
+            if self.pos.y > SCREEN_HEIGHT - GROUND_HEIGHT:
+                 self.pos.y = SCREEN_HEIGHT - GROUND_HEIGHT
+                 self.vel.y = 0 # Stop falling at the bottom
+            self.on_ground = round(self.pos.y) >= SCREEN_HEIGHT - GROUND_HEIGHT
+
         # Update rect position using midbottom for better ground alignment
         self.rect.midbottom = (round(self.pos.x), round(self.pos.y)) 
+        self.animate()
+
+    def animate(self):
+        """Picks this step's frame from the atlas: standing, running or spinning, nya!"""
+        if self.vel.x > IDLE_SPEED:
+            self.facing_left = False
+        elif self.vel.x < -IDLE_SPEED:
+            self.facing_left = True
+        if not self.on_ground: # In the air: spin ball!
+            self.pose = "roll"
+            spin = ROLL_SPIN + ROLL_SPIN_PER_SPEED * abs(self.vel.x)
+            self.angle = (self.angle + (spin if self.facing_left else -spin)) % 360 # Rolls the way we're going
+        elif abs(self.vel.x) < IDLE_SPEED:
+            self.pose = "stand"
+            self.angle = 0.0
+            self.run_distance = 0.0
+        else:
+            self.run_distance += abs(self.vel.x)
+            self.pose = RUN_POSES[int(self.run_distance / RUN_FRAME_DISTANCE) % len(RUN_POSES)]
+            self.angle = 0.0 # Flat ground; slopes would tilt this
+        self.frame_rect = self.atlas.frame(self.pose, self.facing_left, self.angle)
+
+    def move_in_world(self, move):
+        """Moves through the level's tiles, landing on (and bonking into) solid ones, nya!"""
+        width, height = self.rect.width, self.rect.height
+        step_up = tileworld.TILE_SIZE if self.on_ground else 0 # Walk up single-tile steps, no hop needed
+        x, y, hit_x, hit_y = self.world.move_box(self.pos.x - width / 2, self.pos.y - height, width, height,
+                                                 move.x, move.y, step_up)
+        self.pos.update(x + width / 2, y + height)
+        if hit_x:
+            self.vel.x = 0 # Bonk!
+        if hit_y:
+            self.vel.y = 0
+        self.on_ground = hit_y and move.y > 0
+        if y > self.world.pixel_height: # Fell down a pit: back to the start, meow
+            self.pos.update(self.world.spawn)
+            self.prev_pos.update(self.pos)
+            self.vel.update(0, 0)
+
+    def draw_rect(self, alpha):
+        """Where this step's frame goes, `alpha` of the way from last step's position to this one, nya!"""
+        pos = self.prev_pos.lerp(self.pos, alpha)
+        return spriteatlas.placed(self.frame_rect, (round(pos.x), round(pos.y - PLAYER_HEIGHT / 2)))
+
+    def draw(self, surface, alpha=1.0, camera=(0, 0)):
+        """Blits this step's frame; camera is the level position of the screen's top-left."""
+        dest = self.draw_rect(alpha).move(-camera[0], -camera[1])
+        surface.blit(self.atlas.surface, dest, self.frame_rect) # One little blit, purr!
 
 # --- Game Initialization ---
-pygame.init()
-# pygame.mixer.init() # Still commented out, meow! 
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Meow! Sonic CD Code Shapes!")
-clock = pygame.time.Clock()
-
-# --- Create Assets with Code ---
-background_surface = create_background(SCREEN_WIDTH, SCREEN_HEIGHT)
-
-# --- Sprites ---
-all_sprites = pygame.sprite.Group()
-player = Player()
-all_sprites.add(player)
-
-# --- Game Loop ---
-running = True
-while running:
-    # Keep loop running at the right speed, purrrr!
-    clock.tick(60) # Aim for 60 FPS
-    
-    # Process Input (Events)
-    for event in pygame.event.get():
-        # Check for closing window
-        if event.type == pygame.QUIT:
-            running = False
-        # Check for key presses
-        if event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_SPACE or event.key == pygame.K_UP: # Jump keys!
-                player.jump()
-
-    # Update
-    all_sprites.update() # Calls the update() method of all sprites (our player!)
-
-    # Draw / Render
-    screen.blit(background_surface, (0,0)) # Draw the background surface first! 
-        
-    all_sprites.draw(screen) # Pygame draws all sprites in the group, nya!
-    
-    # *after* drawing everything, flip the display
-    pygame.display.flip() # Shows the new frame! 
-
-# --- Done ---
-pygame.quit()
-sys.exit() # Ensures the program closes cleanly, purr!
+def main(level=LEVEL_FILE):
+    """Runs the game in the level file `level` (None: the flat one-screen floor)."""
+    pygame.init()
+    # pygame.mixer.init() # Still commented out, meow! 
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Meow! Sonic CD Code Shapes!")
+    # Frame stopwatches (F3 overlay, F4 export), so we can see what the atlas saves, purr!
+    prof = profiler.FrameProfiler(PROFILE_PHASES, budget_ms=FRAME_BUDGET_MS, export_path=PROFILE_EXPORT_PATH)
+
+    # --- Create Assets with Code ---
+    world = None
+    if level:
+        if level == LEVEL_FILE and not os.path.exists(level): # First run: make the default level, nya!
+            os.makedirs(os.path.dirname(level), exist_ok=True)
+            tileworld.generate(level, LEVEL_CHUNKS_WIDE, seed=LEVEL_SEED)
+        world = tileworld.TileWorld(level) # Maps the file; chunks get drawn as they scroll into view
+    background_surface = create_background(SCREEN_WIDTH, SCREEN_HEIGHT, ground=world is None)
+
+    # --- Sprites ---
+    all_sprites = pygame.sprite.Group()
+    player = Player(world)
+    all_sprites.add(player)
+
+    # --- Game Loop ---
+    def handle_events():
+        # Process Input (Events)
+        for event in pygame.event.get():
+            # Check for closing window
+            if event.type == pygame.QUIT:
+                return False
+            # Check for key presses
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE or event.key == pygame.K_UP: # Jump keys!
+                    player.jump()
+                elif event.key == pygame.K_F3: # Peek at the stopwatches!
+                    prof.toggle_overlay()
+                elif event.key == pygame.K_F4 and prof.enabled: # Save them for later, nya!
+                    print("Wrote", prof.export(prof.export_path.format(frame=prof.frames)))
+        prof.mark("events")
+
+    def step():
+        # Update
+        all_sprites.update() # Calls the update() method of all sprites (our player!)
+        prof.mark("update")
+
+    def render(alpha):
+        # Draw / Render
+        screen.blit(background_surface, (0,0)) # Draw the background surface first! 
+        camera = (0, 0)
+        if world: # The camera follows Sonic (where he's drawn, so it glides too)
+            camera = world.camera(player.draw_rect(alpha).center, (SCREEN_WIDTH, SCREEN_HEIGHT))
+            world.draw(screen, camera)
+
+        for sprite in all_sprites: # Each sprite drawn between its last two steps, so it glides, nya!
+            sprite.draw(screen, alpha, camera)
+        prof.mark("draw")
+        prof.draw(screen)
+        prof.mark("overlay")
+
+        # *after* drawing everything, flip the display
+        pygame.display.flip() # Shows the new frame! 
+        prof.mark("flip")
+
+    # Keep loop running at the right speed, purrrr! Physics at FPS, drawing at RENDER_FPS
+    loop = gameloop.FixedStepLoop(FPS, RENDER_FPS, unthrottled=UNTHROTTLED, profiler=prof)
+    loop.run(handle_events, step, render)
+
+    # --- Done ---
+    pygame.quit()
+    sys.exit() # Ensures the program closes cleanly, purr!
+
+if __name__ == "__main__": # Only run the loop when started directly, purr!
+    import argparse
+    parser = argparse.ArgumentParser(description="Meow! Sonic CD Code Shapes!")
+    parser.add_argument("--level", default=LEVEL_FILE, metavar="FILE",
+                        help="tile level to play (see tileworld.py; the default one is generated on first run)")
+    parser.add_argument("--flat", action="store_true", help="play on the old flat one-screen floor instead")
+    args = parser.parse_args()
+    main(None if args.flat else args.level)
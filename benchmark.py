@@ -0,0 +1,352 @@
+# benchmark.py - Headless performance benchmark for all the games
+#
+# Runs every game's update and render steps for a fixed number of frames,
+# with fixed seeds and scripted inputs, under SDL's dummy video and audio
+# drivers. Reports frames per second, time and allocations per phase, and a
+# hash of the game state after every frame. Save a baseline once, then
+# compare later runs against it:
+#
+#   python benchmark.py --save-baseline   # writes benchmark_baseline.json
+#   python benchmark.py                   # compares; exit code 1 on regressions
+#
+# A state hash mismatch means a change altered game behavior (the report
+# names the first frame that differs), so optimizations can be checked for
+# exactness as well as speed. Allocations are Python-side only (tracemalloc):
+# SDL surfaces don't show up, the Python objects around them do.
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import hashlib
+import importlib
+import importlib.util
+import json
+import random
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+
+import pygame
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_FRAMES = 1200
+DEFAULT_ALLOC_FRAMES = 300 # Allocation tracing is slow, so it gets a shorter second pass
+DEFAULT_SEED = 1
+DEFAULT_REPEATS = 3 # Timed passes per game; each phase keeps its best, which filters out scheduler noise
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmark_baseline.json")
+TIME_TOLERANCE = 0.15 # Phases/FPS this much worse than the baseline are regressions
+TIME_NOISE_MS = 0.002 # ...unless the difference is below timer noise
+INPUT_HOLD_FRAMES = 15 # Scripted inputs change this often
+
+
+def load_script(filename, module_name):
+    """Imports a game script by path (the Pac-Man file name isn't a valid module name)."""
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT) # For the helper modules the scripts import
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(ROOT, filename))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+# --- Games ---
+# Each bench sets a game up from a seed and exposes `phases`, the (name,
+# callable) steps of one frame in order, and state(), bytes that identify the
+# game state after a frame.
+
+class PacmanBench:
+    name = "pacman"
+
+    def __init__(self, seed):
+        pac = self.pac = load_script("Gemini4kPacman1.0.py", "pacman")
+        self.game = pac.Game(seed=seed)
+        self.inputs = random.Random(seed)
+        self.action = pac.ACTION_NONE
+        self.phases = [("input", self.input), ("player", self.update_player), ("ghosts", self.game.update_ghosts),
+                       ("collide", self.collide), ("draw", self.game.render)]
+
+    def input(self):
+        game = self.game
+        if game.game_over or game.win:
+            game.start_game() # What pressing R does
+        if game.frame % INPUT_HOLD_FRAMES == 0:
+            self.action = self.inputs.randrange(5)
+        game.player.apply_action(self.action)
+
+    def update_player(self):
+        # Game.update is frame += 1, player, ghosts, collisions, win check
+        self.game.frame += 1
+        self.game.player.update()
+
+    def collide(self):
+        self.game.check_collisions()
+        self.game.check_win()
+
+    def state(self):
+        return self.game.snapshot_bytes()
+
+
+class PongBench:
+    name = "pong"
+
+    def __init__(self, seed):
+        pong = self.pong = load_script("PongNPU.py", "PongNPU")
+        pygame.init()
+        screen = pygame.display.set_mode((pong.SCREEN_WIDTH, pong.SCREEN_HEIGHT))
+        # No serve pause (it would just be sleeping) and no audio
+        self.match = self.make_match(seed, pong.PongRenderer(screen))
+        self.match.reset()
+        self.inputs = random.Random(seed)
+        self.paddle_inputs = [pong.INPUT_NONE, pong.INPUT_NONE]
+        self.frame = 0
+        self.phases = [("input", self.input), ("step", self.step), ("draw", self.draw)]
+
+    def make_match(self, seed, renderer):
+        return self.pong.PongMatch(seed=seed, renderer=renderer)
+
+    def input(self):
+        pong, match = self.pong, self.match
+        if match.game_state == pong.GAME_OVER:
+            match.reset() # What pressing Y does
+        if self.frame % INPUT_HOLD_FRAMES == 0:
+            self.paddle_inputs = [self.inputs.choice((pong.INPUT_NONE, pong.INPUT_UP, pong.INPUT_DOWN)) for _ in range(2)]
+        self.frame += 1
+
+    def step(self):
+        self.match.step(*self.paddle_inputs)
+
+    def draw(self):
+        self.match.render()
+        pygame.display.flip()
+
+    def state(self):
+        match = self.match
+        return repr((tuple(match.ball), tuple(match.player1_paddle), tuple(match.player2_paddle),
+                     match.ball_speed_x_current, match.ball_speed_y_current,
+                     match.player1_score, match.player2_score, match.game_state)).encode()
+
+
+class Pong10Bench(PongBench):
+    name = "pong10"
+
+    def make_match(self, seed, renderer):
+        return self.pong.MultiBallMatch(seed=seed, renderer=renderer)
+
+    def state(self):
+        match = self.match
+        return super().state() + b"".join(array.tobytes() for array in
+                                          (match.ball_x, match.ball_y, match.ball_vx, match.ball_vy))
+
+
+class SonicBench:
+    name = "sonic"
+    module_name = "Sonic4k"
+
+    def __init__(self, seed):
+        sonic = self.sonic = load_script(self.module_name + ".py", self.module_name)
+        pygame.init()
+        self.screen = pygame.display.set_mode((sonic.SCREEN_WIDTH, sonic.SCREEN_HEIGHT))
+        random.seed(seed) # The background stars use the global RNG
+        self.background = sonic.create_background(sonic.SCREEN_WIDTH, sonic.SCREEN_HEIGHT)
+        self.player = sonic.Player()
+        self.sprites = pygame.sprite.Group(self.player)
+        self.inputs = random.Random(seed)
+        self.keys = defaultdict(bool)
+        self.frame = 0
+        self.phases = [("input", self.input), ("player", self.update_player), ("draw", self.draw)]
+
+    def input(self):
+        if self.frame % INPUT_HOLD_FRAMES == 0:
+            held = self.inputs.choice((None, pygame.K_LEFT, pygame.K_RIGHT))
+            self.keys[pygame.K_LEFT] = held == pygame.K_LEFT
+            self.keys[pygame.K_RIGHT] = held == pygame.K_RIGHT
+            if self.inputs.random() < 0.3:
+                self.player.jump()
+        self.frame += 1
+
+    def update_player(self):
+        self.sprites.update(self.keys)
+
+    def draw(self):
+        self.screen.blit(self.background, (0, 0))
+        self.sprites.draw(self.screen)
+        pygame.display.flip()
+
+    def state(self):
+        p = self.player
+        return repr((p.pos.x, p.pos.y, p.vel.x, p.vel.y, tuple(p.rect))).encode()
+
+
+class SonicABench(SonicBench):
+    name = "sonic_a"
+    module_name = "Sonic4k_a"
+
+    def draw(self):
+        self.screen.blit(self.background, (0, 0))
+        self.player.draw(self.screen) # Blits its frame from the sprite atlas
+        pygame.display.flip()
+
+
+BENCHES = {bench.name: bench for bench in (PacmanBench, PongBench, Pong10Bench, SonicBench, SonicABench)}
+
+
+# --- Running ---
+def state_hash(data):
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+def run_timed(bench_class, seed, frames, repeats=DEFAULT_REPEATS):
+    """Times every phase over `frames` frames, keeping each phase's best of `repeats` passes.
+    Returns (result dict, per-frame state hashes, whether every pass hashed the same)."""
+    best_ns = None
+    first_hashes = None
+    same = True
+    perf_counter_ns = time.perf_counter_ns
+    for _ in range(repeats):
+        bench = bench_class(seed)
+        phase_ns = {name: 0 for name, _ in bench.phases}
+        hashes = []
+        for _ in range(frames):
+            for name, phase in bench.phases:
+                start = perf_counter_ns()
+                phase()
+                phase_ns[name] += perf_counter_ns() - start
+            hashes.append(state_hash(bench.state()))
+        if best_ns is None:
+            best_ns, first_hashes = phase_ns, hashes
+        else:
+            best_ns = {name: min(ns, phase_ns[name]) for name, ns in best_ns.items()}
+            same = same and hashes == first_hashes
+    total_ns = sum(best_ns.values())
+    return {
+        "frames": frames,
+        "fps": frames / (total_ns / 1e9),
+        "phase_ms": {name: ns / frames / 1e6 for name, ns in best_ns.items()},
+    }, first_hashes, same
+
+
+def run_allocations(bench_class, seed, frames):
+    """Per phase: peak bytes allocated while it runs and blocks still held after, per frame.
+    Also returns the state hashes, which must match the timed run."""
+    bench = bench_class(seed)
+    peak = {name: 0 for name, _ in bench.phases}
+    retained = {name: 0 for name, _ in bench.phases}
+    hashes = []
+    tracemalloc.start()
+    try:
+        for _ in range(frames):
+            for name, phase in bench.phases:
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+                blocks = sys.getallocatedblocks()
+                phase()
+                after_peak = tracemalloc.get_traced_memory()[1]
+                peak[name] += after_peak - before
+                retained[name] += sys.getallocatedblocks() - blocks
+            hashes.append(state_hash(bench.state()))
+    finally:
+        tracemalloc.stop()
+    return {name: {"peak_bytes": peak[name] / frames, "retained_blocks": retained[name] / frames}
+            for name in peak}, hashes
+
+
+def run_suite(names, seed, frames, alloc_frames, repeats=DEFAULT_REPEATS):
+    results = {}
+    for name in names:
+        result, hashes, same = run_timed(BENCHES[name], seed, frames, repeats)
+        allocations, alloc_hashes = run_allocations(BENCHES[name], seed, alloc_frames)
+        result["allocations"] = allocations
+        result["state_hashes"] = hashes
+        # Every pass starts from the same seed, so they must agree frame for frame
+        result["deterministic"] = same and alloc_hashes == hashes[:len(alloc_hashes)]
+        results[name] = result
+    return results
+
+
+# --- Reporting ---
+def first_mismatch(hashes, base_hashes):
+    for frame, (a, b) in enumerate(zip(hashes, base_hashes)):
+        if a != b:
+            return frame
+    return None if len(hashes) == len(base_hashes) else min(len(hashes), len(base_hashes))
+
+
+def report(results, baseline=None, tolerance=TIME_TOLERANCE):
+    """Prints the results (against the baseline, if given); returns the list of problems found."""
+    problems = []
+    base_games = baseline["games"] if baseline else {}
+    for name, result in results.items():
+        base = base_games.get(name)
+        line = f"{name:8} {result['frames']} frames  {result['fps']:9.1f} fps"
+        if base:
+            change = result["fps"] / base["fps"] - 1
+            line += f"  ({change:+.1%} vs baseline)"
+            if change < -tolerance:
+                problems.append(f"{name}: fps dropped {change:.1%}")
+        print(line)
+        if not result["deterministic"]:
+            problems.append(f"{name}: two runs with the same seed diverged")
+
+        print(f"  {'phase':10} {'ms/frame':>9} {'baseline':>9} {'change':>8} {'peak B':>9} {'kept blk':>9}")
+        for phase, ms in result["phase_ms"].items():
+            alloc = result["allocations"][phase]
+            base_ms = base["phase_ms"].get(phase) if base else None
+            flag = ""
+            if base_ms is not None:
+                base_text, change_text = f"{base_ms:9.4f}", f"{ms / base_ms - 1 if base_ms else 0:+8.1%}"
+                if ms > base_ms * (1 + tolerance) and ms - base_ms > TIME_NOISE_MS:
+                    flag = "  SLOWER"
+                    problems.append(f"{name}.{phase}: {base_ms:.4f} -> {ms:.4f} ms/frame")
+            else:
+                base_text, change_text = f"{'-':>9}", f"{'-':>8}"
+            print(f"  {phase:10} {ms:9.4f} {base_text} {change_text} {alloc['peak_bytes']:9.0f} "
+                  f"{alloc['retained_blocks']:9.2f}{flag}")
+
+        if base:
+            mismatch = first_mismatch(result["state_hashes"], base["state_hashes"])
+            if mismatch is None:
+                print(f"  state: all {len(result['state_hashes'])} frame hashes match the baseline")
+            else:
+                print(f"  state: DIFFERS from the baseline from frame {mismatch}")
+                problems.append(f"{name}: game state differs from frame {mismatch}")
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the games headlessly")
+    parser.add_argument("--games", nargs="+", choices=list(BENCHES), default=list(BENCHES))
+    parser.add_argument("--frames", type=int, default=DEFAULT_FRAMES)
+    parser.add_argument("--alloc-frames", type=int, default=DEFAULT_ALLOC_FRAMES)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS, help="timed passes per game (best is kept)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline file to compare with or save to")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=TIME_TOLERANCE, help="allowed slowdown before flagging")
+    args = parser.parse_args()
+
+    results = run_suite(args.games, args.seed, args.frames, min(args.alloc_frames, args.frames), args.repeats)
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if (baseline["seed"], baseline["frames"]) != (args.seed, args.frames):
+            print(f"Baseline was recorded with seed {baseline['seed']} and {baseline['frames']} frames; "
+                  "rerun with those to compare", file=sys.stderr)
+            baseline = None
+
+    problems = report(results, baseline, args.tolerance)
+    pygame.quit()
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"seed": args.seed, "frames": args.frames, "games": results}, f)
+        print(f"Saved baseline to {args.baseline}")
+    elif problems:
+        print("\nRegressions:")
+        for problem in problems:
+            print("  " + problem)
+        sys.exit(1)
@@ -0,0 +1,55 @@
+# frametimer.py - Frame-counted timers shared by the games
+#
+# Games register delayed actions ("serve in 30 frames", "stop flashing the
+# banner in 90") with a FrameScheduler and the main loop advances it once per
+# simulated frame. Nothing ever sleeps, so the window keeps pumping events
+# and rendering while a timer runs, and headless runs spend no wall time on
+# waits at all. Timing is counted in frames rather than milliseconds, so a
+# replay or a rollback re-simulation fires every action on exactly the same
+# frame.
+import heapq
+
+
+class FrameScheduler:
+    """Runs callbacks a given number of tick()s from now, in due order (ties: registration order)."""
+
+    def __init__(self):
+        self.frame = 0
+        self.tasks = [] # Heap of (due_frame, seq, name, action)
+        self.seq = 0 # Tie-breaker, so the heap never compares actions
+
+    def after(self, frames, action, name=None):
+        """Calls action() once `frames` ticks from now; with frames <= 0 it runs right away."""
+        if frames <= 0:
+            action()
+            return
+        heapq.heappush(self.tasks, (self.frame + frames, self.seq, name, action))
+        self.seq += 1
+
+    def tick(self):
+        """Advances one frame and runs everything that came due."""
+        self.frame += 1
+        tasks = self.tasks
+        while tasks and tasks[0][0] <= self.frame:
+            _, _, _, action = heapq.heappop(tasks)
+            action()
+
+    def remaining(self, name):
+        """Ticks until the soonest task called `name` fires, or None if there isn't one."""
+        due = [task[0] for task in self.tasks if task[2] == name]
+        return min(due) - self.frame if due else None
+
+    def cancel(self, name):
+        self.tasks = [task for task in self.tasks if task[2] != name]
+        heapq.heapify(self.tasks)
+
+    def clear(self):
+        self.tasks = []
+
+    def snapshot(self):
+        """State for restore(); the actions are kept as-is, so restore onto the same objects."""
+        return self.frame, self.seq, tuple(self.tasks)
+
+    def restore(self, snapshot):
+        self.frame, self.seq, tasks = snapshot
+        self.tasks = list(tasks) # Already a valid heap
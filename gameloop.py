@@ -0,0 +1,88 @@
+# gameloop.py - Fixed-timestep main loop shared by the games
+#
+# The games' physics constants (PLAYER_SPEED, BALL_SPEED_X, GRAVITY, ...) are
+# per simulation step. FixedStepLoop runs those steps at a fixed rate from an
+# accumulator of real elapsed time, independent of how often frames are drawn:
+# a 30 Hz box runs two steps per frame, a 144 Hz one draws most frames between
+# steps, and gameplay speed is the same on both. render() gets the fraction of
+# a step the accumulator holds (alpha), so it can draw positions interpolated
+# between the last two steps instead of stuttering.
+#
+# Under load at most max_steps_per_frame steps run before a frame is drawn;
+# time beyond that is dropped (the game slows down) rather than piling up
+# into a spiral of ever longer catch-up frames. unthrottled=True runs one
+# step per frame with no frame cap, as fast as the machine goes.
+import time
+
+import pygame
+
+DEFAULT_SIM_HZ = 60
+DEFAULT_MAX_STEPS_PER_FRAME = 5
+
+
+def lerp(a, b, alpha):
+    return a + (b - a) * alpha
+
+
+class FixedStepLoop:
+    """Drives handle_events() / step() / render(alpha) callbacks; see the module comment.
+
+    render_fps caps the frame rate through pygame's Clock (0 = no cap). A
+    profiler (profiler.FrameProfiler) gets the time spent in the frame cap
+    marked as "wait" and the frame period at the end of each frame.
+    """
+
+    def __init__(self, sim_hz=DEFAULT_SIM_HZ, render_fps=DEFAULT_SIM_HZ, max_steps_per_frame=DEFAULT_MAX_STEPS_PER_FRAME,
+                 unthrottled=False, profiler=None):
+        self.step_seconds = 1.0 / sim_hz
+        self.render_fps = render_fps
+        self.max_steps_per_frame = max_steps_per_frame
+        self.unthrottled = unthrottled
+        self.profiler = profiler
+        self.clock = pygame.time.Clock()
+        self.running = False
+        self.steps = 0 # Simulation steps run
+        self.frames = 0 # Frames drawn
+        self.dropped_steps = 0 # Steps skipped because the machine couldn't keep up
+
+    def stop(self):
+        self.running = False
+
+    def run(self, handle_events, step, render):
+        """Loops until stop() is called or handle_events() returns False."""
+        dt = self.step_seconds
+        perf_counter = time.perf_counter
+        prof = self.profiler
+        accumulator = 0.0
+        previous = perf_counter()
+        self.running = True
+        while self.running:
+            if handle_events() is False:
+                break
+
+            if self.unthrottled:
+                step()
+                self.steps += 1
+                alpha = 1.0 # Draw the latest step as-is
+            else:
+                now = perf_counter()
+                accumulator += now - previous
+                previous = now
+                steps = 0
+                while accumulator >= dt and steps < self.max_steps_per_frame:
+                    step()
+                    accumulator -= dt
+                    steps += 1
+                if accumulator >= dt: # Still behind: drop the backlog, keep the fraction
+                    behind = int(accumulator / dt)
+                    self.dropped_steps += behind
+                    accumulator -= behind * dt
+                self.steps += steps
+                alpha = accumulator / dt
+
+            render(alpha)
+            self.frames += 1
+            period_ms = self.clock.tick(0 if self.unthrottled else self.render_fps)
+            if prof:
+                prof.mark("wait")
+                prof.end_frame(period_ms)
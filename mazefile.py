@@ -0,0 +1,360 @@
+# mazefile.py - Maze level files for Pac-Man
+#
+# Levels are edited as text, one character per tile:
+#   '#' wall   '.' pellet   ' ' empty path   '=' tunnel
+# Lines starting with ';' are comments and trailing blank lines are ignored.
+# Short rows are padded with empty path, so editors that strip trailing
+# spaces don't change the level. Tunnels sit on the left and right edges in
+# pairs (same row), like the tunnel row of the built-in maze.
+#
+# The first load validates the text and compiles it next to the source
+# (level.maze -> level.mazec); later loads memory-map the compiled file, so
+# even 1000x1000 levels skip parsing and the graph precomputation.
+# Compiled layout (all integers little-endian):
+#   header      : b"MAZC" | version u8 | 3 pad | width u32 | height u32 | pellet_count u32
+#                 | source_size u64 | source_mtime_ns u64
+#   nearest_open: i32 per cell (see MazeGraph)
+#   cells       : u8 per cell, same codes as MAZE_LAYOUT
+#   masks       : u8 per cell, neighbor bitmask (see MazeGraph)
+#   pellets     : start pellet bitset, (width * height + 7) // 8 bytes
+import mmap
+import os
+import random
+import struct
+import sys
+from array import array
+from collections import deque
+
+MAGIC = b"MAZC"
+VERSION = 1
+HEADER = struct.Struct("<4sB3xIIIQQ")
+COMPILED_SUFFIX = "c" # Appended to the source file name
+
+# Same cell codes as MAZE_LAYOUT in the game
+CELL_EMPTY, CELL_WALL, CELL_PELLET, CELL_TUNNEL = 0, 1, 2, 5
+TILE_CHARS = {" ": CELL_EMPTY, "#": CELL_WALL, ".": CELL_PELLET, "=": CELL_TUNNEL}
+CELL_CHARS = {cell: char for char, cell in TILE_CHARS.items()}
+INVALID = 0xFF
+PARSE_TABLE = bytes(TILE_CHARS.get(chr(i), INVALID) for i in range(256))
+OPEN_TABLE = bytes(int(i != CELL_WALL) for i in range(256))
+JUNCTION_TABLE = bytes(int(bin(i).count("1") >= 3) for i in range(256)) # Three or more exits
+
+MOVE_DIRECTIONS = [(0, -1), (0, 1), (-1, 0), (1, 0)] # Up, Down, Left, Right (mask bits 1, 2, 4, 8)
+
+
+class MazeFileError(Exception):
+    """Raised for level files that don't parse or fail validation."""
+
+
+# --- Compiling ---
+def parse_text(data):
+    """(width, height, cells) from level text (bytes)."""
+    rows = [line.rstrip(b"\r") for line in data.split(b"\n")]
+    line_numbers = [n for n, row in enumerate(rows, 1) if not row.startswith(b";")]
+    rows = [row for row in rows if not row.startswith(b";")]
+    while rows and not rows[-1].strip():
+        rows.pop()
+        line_numbers.pop()
+    if not rows:
+        raise MazeFileError("level has no rows")
+    width = max(len(row) for row in rows)
+    cells = b"".join(row.ljust(width) for row in rows).translate(PARSE_TABLE)
+    bad = cells.find(INVALID)
+    if bad >= 0:
+        row, column = divmod(bad, width)
+        char = rows[row][column:column + 1].decode("latin-1")
+        raise MazeFileError("line %d, column %d: unknown tile %r" % (line_numbers[row], column + 1, char))
+    return width, len(rows), cells
+
+
+def _shifted(data, shift, size):
+    """data viewed as one big integer, moved `shift` bytes toward higher indices (negative: lower)."""
+    value = int.from_bytes(data, "little")
+    value = value << (8 * shift) if shift > 0 else value >> (-8 * shift)
+    return value & ((1 << (8 * size)) - 1)
+
+
+def neighbor_masks(cells, width, height):
+    """Per-cell bitmask of open neighbors (bounds-limited, no tunnel wrap).
+
+    Works on whole rows of bytes as big integers, so it's fast even for
+    million-cell levels: each direction is the open map shifted by one cell
+    and ANDed with a column mask that drops neighbors across the edges.
+    """
+    size = width * height
+    open_cells = cells.translate(OPEN_TABLE)
+    not_first_column = int.from_bytes((b"\0" + b"\1" * (width - 1)) * height, "little")
+    not_last_column = int.from_bytes((b"\1" * (width - 1) + b"\0") * height, "little")
+    up = _shifted(open_cells, width, size) # Cell above, moved onto this one
+    down = _shifted(open_cells, -width, size)
+    left = _shifted(open_cells, 1, size) & not_first_column
+    right = _shifted(open_cells, -1, size) & not_last_column
+    return (up | down << 1 | left << 2 | right << 3).to_bytes(size, "little")
+
+
+def junction_cells(cells, masks):
+    """1 for open cells with three or more exits."""
+    junctions = int.from_bytes(masks.translate(JUNCTION_TABLE), "little")
+    return (junctions & int.from_bytes(cells.translate(OPEN_TABLE), "little")).to_bytes(len(cells), "little")
+
+
+def nearest_open_cells(cells, width, height):
+    """For every cell, the index of the closest open cell (itself when open), or -1."""
+    size = width * height
+    nearest = array("i", [-1]) * size
+    queue = deque()
+    for i in range(size):
+        if cells[i] != CELL_WALL:
+            nearest[i] = i
+            queue.append(i)
+    while queue:
+        i = queue.popleft()
+        mx, my = i % width, i // width
+        for dx, dy in MOVE_DIRECTIONS:
+            next_mx, next_my = mx + dx, my + dy
+            if 0 <= next_mx < width and 0 <= next_my < height and nearest[next_my * width + next_mx] < 0:
+                nearest[next_my * width + next_mx] = nearest[i]
+                queue.append(next_my * width + next_mx)
+    return nearest
+
+
+def pellet_bitset(cells):
+    """(bitset, count) of the pellet cells."""
+    bits = bytearray((len(cells) + 7) // 8)
+    count = 0
+    i = cells.find(CELL_PELLET)
+    while i >= 0:
+        bits[i >> 3] |= 1 << (i & 7)
+        count += 1
+        i = cells.find(CELL_PELLET, i + 1)
+    return bytes(bits), count
+
+
+# --- Validation ---
+def validate(cells, width, height, masks):
+    """Raises MazeFileError unless tunnels pair up and every pellet is reachable from the player start."""
+    start = next((i for i, cell in enumerate(cells) if cell != CELL_WALL), None)
+    if start is None:
+        raise MazeFileError("level has no open tiles")
+
+    i = cells.find(CELL_TUNNEL)
+    while i >= 0:
+        mx, my = i % width, i // width
+        if mx not in (0, width - 1):
+            raise MazeFileError("tunnel at (%d, %d) is not on the left or right edge" % (mx, my))
+        partner = my * width + (width - 1 - mx)
+        if cells[partner] != CELL_TUNNEL:
+            raise MazeFileError("tunnel at (%d, %d) has no partner at (%d, %d)" % (mx, my, width - 1 - mx, my))
+        i = cells.find(CELL_TUNNEL, i + 1)
+
+    # Flood fill from the player start (first open tile, as in find_start_positions), through tunnels
+    offsets = [dx + dy * width for dx, dy in MOVE_DIRECTIONS]
+    reached = bytearray(width * height)
+    reached[start] = 1
+    queue = deque([start])
+    while queue:
+        i = queue.popleft()
+        mask = masks[i]
+        for d in range(4):
+            if mask & (1 << d) and not reached[i + offsets[d]]:
+                reached[i + offsets[d]] = 1
+                queue.append(i + offsets[d])
+        if cells[i] == CELL_TUNNEL:
+            partner = i - i % width + (width - 1 - i % width)
+            if not reached[partner]:
+                reached[partner] = 1
+                queue.append(partner)
+
+    unreached = [i for i, cell in enumerate(cells) if cell == CELL_PELLET and not reached[i]]
+    if unreached:
+        mx, my = unreached[0] % width, unreached[0] // width
+        raise MazeFileError("%d pellets can't be reached from the player start, first at (%d, %d)"
+                            % (len(unreached), mx, my))
+
+
+# --- Loading ---
+class CompiledMaze:
+    """A validated level with its precomputed tables.
+
+    Loaded from a compiled file, the tables are memoryviews straight into
+    the mapped file; nothing is parsed or copied.
+    """
+    def __init__(self, width, height, cells, masks, nearest_open, pellet_bits, pellet_count, source_path=None):
+        self.width = width
+        self.height = height
+        self.cells = cells
+        self.neighbor_masks = masks
+        self.nearest_open = nearest_open
+        self.pellet_bits = pellet_bits
+        self.pellet_count = pellet_count
+        self.source_path = source_path
+
+    @property
+    def name(self):
+        return os.path.splitext(os.path.basename(self.source_path))[0] if self.source_path else "layout"
+
+
+def compile_cells(width, height, cells, source_path=None, check=True):
+    """Builds every table a CompiledMaze carries, validating the level first unless check=False."""
+    cells = bytes(cells)
+    masks = neighbor_masks(cells, width, height)
+    if check:
+        validate(cells, width, height, masks)
+    pellet_bits, pellet_count = pellet_bitset(cells)
+    return CompiledMaze(width, height, cells, masks, nearest_open_cells(cells, width, height),
+                        pellet_bits, pellet_count, source_path)
+
+
+def compile_layout(layout, check=False):
+    """CompiledMaze for a list-of-rows layout like MAZE_LAYOUT (trusted, so unchecked by default)."""
+    return compile_cells(len(layout[0]), len(layout), bytes(cell for row in layout for cell in row), check=check)
+
+
+def write_compiled(maze, path, source_stat):
+    """Writes maze to path atomically (temp file + rename), tagged with the source's size and mtime."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, maze.width, maze.height, maze.pellet_count,
+                            source_stat.st_size, source_stat.st_mtime_ns))
+        f.write(maze.nearest_open.tobytes() if isinstance(maze.nearest_open, array) else bytes(maze.nearest_open))
+        f.write(maze.cells)
+        f.write(maze.neighbor_masks)
+        f.write(maze.pellet_bits)
+    os.replace(tmp_path, path)
+
+
+def read_compiled(path, source_stat=None, source_path=None):
+    """Maps a compiled level; returns None when it's stale (source changed) or from another version."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < HEADER.size:
+            return None
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) # Stays valid after the file is closed
+    magic, version, width, height, pellet_count, source_size, source_mtime = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        return None
+    if source_stat and (source_stat.st_size, source_stat.st_mtime_ns) != (source_size, source_mtime):
+        return None
+    size = width * height
+    if len(data) < HEADER.size + 6 * size + (size + 7) // 8: # Check before casting, a cut int won't cast
+        raise MazeFileError("%s is truncated" % path)
+    view = memoryview(data)
+    pos = HEADER.size
+    nearest_open = view[pos:pos + 4 * size].cast("i")
+    pos += 4 * size
+    cells = view[pos:pos + size]
+    masks = view[pos + size:pos + 2 * size]
+    pellet_bits = view[pos + 2 * size:pos + 2 * size + (size + 7) // 8]
+    return CompiledMaze(width, height, cells, masks, nearest_open, pellet_bits, pellet_count, source_path)
+
+
+def compiled_path(path):
+    return path + COMPILED_SUFFIX
+
+
+def load(path):
+    """Loads a level from its text source, compiling and caching it next to the source when needed.
+
+    A compiled file can also be loaded directly (without its source).
+    """
+    if path.endswith(".maze" + COMPILED_SUFFIX):
+        maze = read_compiled(path, source_path=path)
+        if maze is None:
+            raise MazeFileError("%s is not a version %d compiled level" % (path, VERSION))
+        return maze
+    source_stat = os.stat(path)
+    cache_path = compiled_path(path)
+    if os.path.exists(cache_path):
+        maze = read_compiled(cache_path, source_stat, path)
+        if maze is not None:
+            return maze
+    with open(path, "rb") as f:
+        width, height, cells = parse_text(f.read())
+    maze = compile_cells(width, height, cells, path)
+    try:
+        write_compiled(maze, cache_path, source_stat)
+    except OSError:
+        return maze # Read-only level directory: use the in-memory tables this time
+    return read_compiled(cache_path, source_stat, path)
+
+
+# --- Writing and Generating ---
+def layout_text(cells, width, height):
+    """Level text for raw cell codes."""
+    rows = []
+    for my in range(height):
+        row = cells[my * width:(my + 1) * width]
+        rows.append("".join(CELL_CHARS[cell] for cell in row).rstrip())
+    return "\n".join(rows) + "\n"
+
+
+def generate(width, height, seed=None, loop_chance=0.1):
+    """Random level text: a carved maze (corridors one tile wide) with extra loops,
+    pellets on every path tile and a tunnel pair on the middle row."""
+    rng = random.Random(seed)
+    cells = bytearray([CELL_WALL]) * (width * height)
+    # Carve a spanning tree over the odd tiles with an iterative backtracker
+    start = 1 * width + 1
+    cells[start] = CELL_PELLET
+    stack = [start]
+    steps = [(0, -2), (0, 2), (-2, 0), (2, 0)]
+    while stack:
+        i = stack[-1]
+        mx, my = i % width, i // width
+        options = [(dx, dy) for dx, dy in steps
+                   if 0 < mx + dx < width - 1 and 0 < my + dy < height - 1 and cells[i + dx + dy * width] == CELL_WALL]
+        if not options:
+            stack.pop()
+            continue
+        dx, dy = rng.choice(options)
+        cells[i + dx // 2 + dy // 2 * width] = CELL_PELLET
+        cells[i + dx + dy * width] = CELL_PELLET
+        stack.append(i + dx + dy * width)
+    # Knock out some walls between corridors so ghosts can be dodged
+    for my in range(1, height - 1):
+        for mx in range(1, width - 1):
+            i = my * width + mx
+            if cells[i] == CELL_WALL and rng.random() < loop_chance:
+                if (cells[i - 1] != CELL_WALL and cells[i + 1] != CELL_WALL and mx % 2 == 0) or \
+                   (cells[i - width] != CELL_WALL and cells[i + width] != CELL_WALL and my % 2 == 0):
+                    cells[i] = CELL_PELLET
+    # Tunnel pair on the middle (odd) row, opened up to the nearest corridor
+    row = height // 2 | 1
+    if row >= height - 1:
+        row = 1
+    for mx in (0, width - 1):
+        cells[row * width + mx] = CELL_TUNNEL
+        step = 1 if mx == 0 else -1
+        inner = mx + step
+        while 0 < inner < width - 1 and cells[row * width + inner] == CELL_WALL:
+            cells[row * width + inner] = CELL_EMPTY
+            inner += step
+    return layout_text(cells, width, height)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Compile, check or generate Pac-Man level files")
+    commands = parser.add_subparsers(dest="command", required=True)
+    compile_parser = commands.add_parser("compile", help="validate levels and (re)build their compiled files")
+    compile_parser.add_argument("files", nargs="+")
+    generate_parser = commands.add_parser("generate", help="write a random level")
+    generate_parser.add_argument("width", type=int)
+    generate_parser.add_argument("height", type=int)
+    generate_parser.add_argument("output")
+    generate_parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    if args.command == "compile":
+        failed = False
+        for path in args.files:
+            try:
+                maze = load(path)
+            except MazeFileError as e:
+                print(f"{path}: {e}", file=sys.stderr)
+                failed = True
+                continue
+            print(f"{path}: {maze.width}x{maze.height}, {maze.pellet_count} pellets")
+        sys.exit(1 if failed else 0)
+    else:
+        with open(args.output, "w") as f:
+            f.write(generate(args.width, args.height, args.seed))
@@ -0,0 +1,402 @@
+# netplay.py - Rollback netcode for two-player games over UDP
+#
+# Only inputs cross the wire: each peer sends its one-byte input code per
+# frame and both run the same deterministic simulation. A frame never waits
+# for the remote input. The local player's input applies right away and the
+# remote one is predicted (the last input received, since players mostly
+# keep holding a key). The state before every unconfirmed frame is saved;
+# when the real remote input turns out different from the prediction, the
+# game is restored to the first wrong frame and re-simulated up to now in
+# the same step. So the local paddle always answers in one frame and the
+# remote one snaps to where it really is after about half a round trip.
+#
+# Every packet repeats all inputs the peer hasn't acknowledged yet, so a lost
+# or reordered packet is covered by the next one without any resends.
+#
+# Packets (all integers little-endian):
+#   hello : 0x01 | seed u64                               -> player 1 asks, player 2 answers; the seed is player 1's
+#   input : 0x02 | frame u32 | ack u32 | advantage i8 | first u32 | count u8 | count input bytes
+#           (sender's current frame, last remote frame it has without gaps + 1, how many
+#            frames it's ahead of us, then its inputs for frames first .. first + count - 1)
+#   bye   : 0x03                                          -> the peer quit
+import random
+import socket
+import struct
+import time
+
+PACKET_HELLO, PACKET_INPUT, PACKET_BYE = 0x01, 0x02, 0x03
+HELLO = struct.Struct("<BQ")
+INPUT_HEADER = struct.Struct("<BIIbIB")
+DEFAULT_PORT = 50601 # Player 1 listens here, player 2 on the next port
+MAX_ROLLBACK_FRAMES = 12 # Frames the game may run ahead of the last confirmed remote input
+MAX_INPUTS_PER_PACKET = 64
+HELLO_INTERVAL = 0.25 # Seconds between hellos while waiting for the peer
+SYNC_INTERVAL_FRAMES = 10 # At most one time-sync pause per this many frames
+
+
+class NetplayError(Exception):
+    """Raised for packets that can't be parsed."""
+
+
+class UdpLink:
+    """A non-blocking UDP socket talking to one peer address."""
+
+    def __init__(self, local_port, peer_address):
+        self.peer_address = peer_address
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("", local_port))
+        self.sock.setblocking(False)
+
+    def send(self, data):
+        try:
+            self.sock.sendto(data, self.peer_address)
+        except OSError:
+            pass # Peer not up yet (ICMP refused) or a full buffer: it's UDP, later packets repeat everything
+
+    def receive(self):
+        """Every datagram waiting from the peer, oldest first."""
+        packets = []
+        while True:
+            try:
+                data, address = self.sock.recvfrom(2048)
+            except OSError: # Nothing left (BlockingIOError), or Windows reporting an earlier send refused
+                return packets
+            if address[1] == self.peer_address[1]: # By port: "localhost" and 127.0.0.1 are the same peer
+                packets.append(data)
+
+    def close(self):
+        self.sock.close()
+
+
+class FlakyLink:
+    """Wraps a link to add artificial delay, jitter and loss to what it receives.
+
+    Applied on both peers, the round trip gets twice the delay. Jitter
+    reorders packets; nothing is ever duplicated.
+    """
+
+    def __init__(self, link, delay_ms=0.0, jitter_ms=0.0, loss=0.0, seed=None):
+        self.link = link
+        self.delay = delay_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.loss = loss
+        self.rng = random.Random(seed)
+        self.pending = [] # (due time, arrival order, data)
+        self.arrivals = 0
+        self.dropped = 0
+
+    def send(self, data):
+        self.link.send(data)
+
+    def receive(self):
+        now = time.perf_counter()
+        for data in self.link.receive():
+            if self.rng.random() < self.loss:
+                self.dropped += 1
+                continue
+            due = now + self.delay + self.rng.uniform(0.0, self.jitter)
+            self.pending.append((due, self.arrivals, data))
+            self.arrivals += 1
+        self.pending.sort()
+        count = 0
+        while count < len(self.pending) and self.pending[count][0] <= now:
+            count += 1
+        ready = [data for _, _, data in self.pending[:count]]
+        del self.pending[:count]
+        return ready
+
+    def close(self):
+        self.link.close()
+
+
+class RollbackSession:
+    """Runs a two-player game over a link, predicting and rolling back the remote input.
+
+    The game is driven through three callbacks: save() returns a snapshot of
+    the whole simulation, load(snapshot) puts one back, and
+    step(p1_input, p2_input) advances one frame. While `resimulating` is True
+    the step is a replay of frames already shown, so sounds should stay quiet.
+    `seed` is player 1's; player 2 learns it from the hello.
+    """
+
+    def __init__(self, link, local_player, save, load, step, seed=0, max_rollback=MAX_ROLLBACK_FRAMES,
+                 input_delay=0, neutral_input=0):
+        if local_player not in (1, 2):
+            raise ValueError("local_player must be 1 or 2, not %r" % (local_player,))
+        self.link = link
+        self.local_player = local_player
+        self.save, self.load, self.step_game = save, load, step
+        self.seed = seed
+        self.max_rollback = max_rollback
+        self.input_delay = input_delay # Frames before a local input takes effect (0 = the very next frame)
+        self.neutral_input = neutral_input
+        self.connected = False
+        self.peer_quit = False
+        self.resimulating = False
+        self.last_hello = None
+        self.frame = 0 # Next frame to simulate
+        self.local_inputs = {} # Frame -> our input, kept until the peer acknowledges it and we can't roll back to it
+        self.peer_ack = 0 # The peer has all our inputs before this frame
+        self.remote_inputs = {} # Frame -> confirmed remote input
+        self.remote_confirmed = 0 # We have every remote input before this frame
+        self.predicted = {} # Frame -> remote input the simulation used, while unconfirmed
+        self.snapshots = {} # Frame -> state before simulating it, while unconfirmed
+        self.rollback_to = None # Earliest frame simulated with a wrong prediction
+        self.remote_frame = 0 # Peer's frame as of its latest packet
+        self.remote_advantage = 0
+        self.last_sync_pause = 0
+        # Stats
+        self.rollbacks = 0
+        self.resimulated_frames = 0
+        self.stalls = 0 # Steps skipped waiting for remote input or to let the peer catch up
+        self.packets_sent = 0
+        self.bytes_sent = 0
+
+    # --- Network ---
+    def poll(self):
+        for data in self.link.receive():
+            try:
+                self.handle_packet(data)
+            except NetplayError:
+                pass # Garbage on the port: not our peer's
+        if not self.connected and self.local_player == 1: # Player 1 calls until player 2 answers
+            now = time.perf_counter()
+            if self.last_hello is None or now - self.last_hello >= HELLO_INTERVAL:
+                self.send_hello()
+                self.last_hello = now
+
+    def send_hello(self):
+        self.send(HELLO.pack(PACKET_HELLO, self.seed))
+
+    def send(self, data):
+        self.link.send(data)
+        self.packets_sent += 1
+        self.bytes_sent += len(data)
+
+    def handle_packet(self, data):
+        if not data:
+            raise NetplayError("empty packet")
+        kind = data[0]
+        if kind == PACKET_HELLO:
+            if len(data) != HELLO.size:
+                raise NetplayError("bad hello size %d" % len(data))
+            if self.local_player == 2:
+                if not self.connected:
+                    self.seed = HELLO.unpack(data)[1]
+                    self.connected = True
+                self.send_hello() # Answer every one: player 1 keeps asking until an answer gets through
+            else:
+                self.connected = True
+        elif kind == PACKET_INPUT:
+            if len(data) < INPUT_HEADER.size:
+                raise NetplayError("truncated input packet")
+            _, frame, ack, advantage, first, count = INPUT_HEADER.unpack_from(data)
+            inputs = data[INPUT_HEADER.size:]
+            if len(inputs) != count:
+                raise NetplayError("input packet holds %d inputs, header says %d" % (len(inputs), count))
+            if not self.connected:
+                if self.local_player == 2:
+                    return # Need the hello (and its seed) first
+                self.connected = True # Our hello got through, only the answer was lost
+            if frame >= self.remote_frame:
+                self.remote_frame = frame
+                self.remote_advantage = advantage
+            self.peer_ack = max(self.peer_ack, ack)
+            for offset, code in enumerate(inputs):
+                self.add_remote_input(first + offset, code)
+        elif kind == PACKET_BYE:
+            self.peer_quit = True
+        else:
+            raise NetplayError("unknown packet type %#x" % kind)
+
+    def add_remote_input(self, frame, code):
+        if frame < self.remote_confirmed or frame in self.remote_inputs:
+            return # Old news (packets repeat unacknowledged inputs)
+        self.remote_inputs[frame] = code
+        used = self.predicted.pop(frame, None)
+        if used is not None and used != code and (self.rollback_to is None or frame < self.rollback_to):
+            self.rollback_to = frame
+        while self.remote_confirmed in self.remote_inputs:
+            self.remote_confirmed += 1
+
+    def send_inputs(self):
+        first = self.peer_ack
+        last = max(self.local_inputs) + 1 if self.local_inputs else first
+        first = max(first, last - MAX_INPUTS_PER_PACKET)
+        inputs = bytes(self.local_inputs[frame] for frame in range(first, last))
+        advantage = max(-128, min(127, self.frame - self.remote_frame))
+        self.send(INPUT_HEADER.pack(PACKET_INPUT, self.frame, self.remote_confirmed, advantage, first, len(inputs)) + inputs)
+
+    def close(self):
+        if self.connected:
+            for _ in range(3): # It's UDP: say it a few times
+                self.send(bytes([PACKET_BYE]))
+        self.link.close()
+
+    # --- Simulation ---
+    def advance(self, local_input):
+        """One tick of the game loop: reads the network, rolls back if needed and
+        simulates the next frame with `local_input`. Returns False when the frame
+        had to wait (not connected yet, too far ahead of the peer)."""
+        self.poll()
+        if not self.connected or self.peer_quit:
+            return False
+        if self.rollback_to is not None:
+            self.roll_back()
+        if self.frame - self.remote_confirmed >= self.max_rollback or self.should_pause():
+            self.stalls += 1
+            self.send_inputs() # Keeps acks flowing while we wait
+            return False
+
+        for frame in range(self.frame, self.frame + self.input_delay + 1):
+            self.local_inputs.setdefault(frame, self.neutral_input) # Frames before the delay runs out stay neutral
+        self.local_inputs[self.frame + self.input_delay] = local_input
+        self.simulate(self.frame)
+        self.frame += 1
+        self.send_inputs()
+        self.discard_confirmed()
+        return True
+
+    def should_pause(self):
+        """Time sync: skips a frame now and then while we run ahead of the peer,
+        so one fast clock doesn't leave the other side rolling back forever."""
+        if self.frame - self.last_sync_pause < SYNC_INTERVAL_FRAMES:
+            return False
+        ahead = (self.frame - self.remote_frame) - self.remote_advantage # Twice our lead, roughly
+        if ahead >= 2:
+            self.last_sync_pause = self.frame
+            return True
+        return False
+
+    def remote_input(self, frame):
+        """The confirmed remote input for `frame`, or the prediction: the last one we know."""
+        code = self.remote_inputs.get(frame)
+        if code is not None:
+            return code, False
+        latest = self.remote_confirmed - 1
+        return self.remote_inputs.get(latest, self.neutral_input), True
+
+    def simulate(self, frame):
+        if frame >= self.remote_confirmed:
+            self.snapshots[frame] = self.save() # Might have to come back here
+        remote, guessed = self.remote_input(frame)
+        if guessed:
+            self.predicted[frame] = remote
+        else:
+            self.predicted.pop(frame, None)
+        local = self.local_inputs[frame]
+        if self.local_player == 1:
+            self.step_game(local, remote)
+        else:
+            self.step_game(remote, local)
+
+    def roll_back(self):
+        start = self.rollback_to
+        self.rollback_to = None
+        self.load(self.snapshots[start])
+        self.rollbacks += 1
+        self.resimulating = True
+        for frame in range(start, self.frame):
+            self.simulate(frame)
+        self.resimulating = False
+        self.resimulated_frames += self.frame - start
+
+    def discard_confirmed(self):
+        for frame in [frame for frame in self.snapshots if frame < self.remote_confirmed]:
+            del self.snapshots[frame]
+        simulated = min(self.frame, self.remote_confirmed - 1) # Keep the last one for predictions, and any still to play
+        for frame in [frame for frame in self.remote_inputs if frame < simulated]:
+            del self.remote_inputs[frame]
+        done = min(self.peer_ack, self.remote_confirmed) # Acked by the peer, and never rolled back to again
+        for frame in [frame for frame in self.local_inputs if frame < done]:
+            del self.local_inputs[frame]
+
+    def stats(self):
+        return {
+            "frame": self.frame,
+            "rollbacks": self.rollbacks,
+            "resimulated_frames": self.resimulated_frames,
+            "stalls": self.stalls,
+            "packets_sent": self.packets_sent,
+            "bytes_sent": self.bytes_sent,
+            "ahead": self.frame - self.remote_confirmed,
+        }
+
+
+class _CheckGame:
+    """A tiny deterministic "game" for the self-check: its state is a hash of every input so far."""
+
+    def __init__(self):
+        self.state = 0
+
+    def save(self):
+        return self.state
+
+    def load(self, state):
+        self.state = state
+
+    def step(self, p1_input, p2_input):
+        self.state = (self.state * 31 + p1_input * 7 + p2_input * 3 + 1) % 1000003
+
+
+def self_check(frames=2000, port=DEFAULT_PORT, delay_ms=0.0, jitter_ms=0.0, loss=0.0, seed=1):
+    """Runs two sessions against each other over localhost with an uneven step
+    cadence: every so often one side hitches for a few ticks and then catches
+    up in a burst, so each side runs ahead of the other in turn. Then both
+    finish on the same frame and the game states are compared. Returns the
+    two sessions' stats; raises AssertionError if the states differ."""
+    rng = random.Random(seed)
+    games = [_CheckGame(), _CheckGame()]
+    sessions = []
+    for player, game in zip((1, 2), games):
+        link = UdpLink(port + player - 1, ("127.0.0.1", port + 2 - player))
+        if delay_ms or jitter_ms or loss:
+            link = FlakyLink(link, delay_ms, jitter_ms, loss, seed=seed + player)
+        sessions.append(RollbackSession(link, player, game.save, game.load, game.step, seed=seed))
+    try:
+        for tick in range(frames):
+            for index, session in enumerate(sessions):
+                phase = (tick + 17 * index) % 37 # The two sides hitch at different times
+                steps = 0 if phase < 4 else 5 if phase == 4 else 1
+                for _ in range(steps):
+                    session.advance(rng.randrange(3))
+            time.sleep(0.0005)
+        # Both play neutral inputs up to the same frame, then wait for everything to be confirmed
+        target = max(session.frame for session in sessions) + 2 * MAX_ROLLBACK_FRAMES
+        deadline = time.perf_counter() + 10.0
+        while time.perf_counter() < deadline:
+            for session in sessions:
+                if session.frame < target:
+                    session.advance(0)
+                else:
+                    session.poll()
+                    if session.rollback_to is not None:
+                        session.roll_back()
+                    session.send_inputs()
+            if all(session.frame == session.remote_confirmed == target and session.rollback_to is None
+                   for session in sessions):
+                break
+            time.sleep(0.0005)
+        else:
+            raise AssertionError("sessions never both confirmed frame %d: %r" % (target, [s.stats() for s in sessions]))
+        assert games[0].state == games[1].state, "states differ at frame %d" % target
+        return [session.stats() for session in sessions]
+    finally:
+        for session in sessions:
+            session.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Check two rollback sessions stay in sync over localhost")
+    parser.add_argument("--frames", type=int, default=2000, help="ticks to run")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="first of the two local ports to use")
+    parser.add_argument("--fake-delay", type=float, default=0.0, help="added receive delay in ms")
+    parser.add_argument("--fake-jitter", type=float, default=0.0, help="added random receive delay in ms")
+    parser.add_argument("--fake-loss", type=float, default=0.0, help="fraction of packets dropped")
+    parser.add_argument("--seed", type=int, default=1, help="random seed")
+    args = parser.parse_args()
+    for player, stats in enumerate(self_check(args.frames, args.port, args.fake_delay, args.fake_jitter,
+                                              args.fake_loss, args.seed), 1):
+        print("player %d: %s" % (player, stats))
+    print("in sync")
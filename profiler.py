@@ -0,0 +1,212 @@
+# profiler.py - Per-phase frame timing shared by the games
+#
+# A FrameProfiler splits every loop iteration into named phases with lap-style
+# marks: mark("update") charges the time since the previous mark to "update".
+# Each finished frame becomes one row of a fixed-size ring buffer holding the
+# phase times, their total and the frame period clock.tick() reported (all in
+# ms). The ring can be drawn as an overlay (p50/p99 per phase plus a frame-time
+# graph) and exported to CSV or JSON, on demand or automatically when a frame
+# runs over budget.
+#
+# While disabled, mark() and end_frame() are a do-nothing function, so leaving
+# the calls in a loop costs one call each.
+import csv
+import json
+import time
+from array import array
+
+import pygame
+
+from textcache import TextCache
+
+DEFAULT_CAPACITY = 600 # Frames kept: ten seconds at 60 FPS
+EXPORT_WARMUP_FRAMES = 60 # No automatic exports this soon after enabling; startup frames are always slow
+OVERLAY_REFRESH_FRAMES = 15 # Percentiles are re-sorted and re-rendered this often
+OVERLAY_FONT_SIZE = 18
+GRAPH_HEIGHT = 48
+GRAPH_WIDTH = 240 # Also the number of frames the graph shows
+OVERLAY_COLUMNS = (0, 120, 180) # Right edges of the p50/p99 columns (0 = left-aligned)
+OVERLAY_BG = (0, 0, 0, 170)
+OVERLAY_TEXT = (230, 230, 230)
+GRAPH_TOTAL = (80, 220, 80) # Time spent in the phases
+GRAPH_PERIOD = (90, 140, 255) # Frame period from clock.tick
+GRAPH_BUDGET = (230, 60, 60)
+
+
+def _skip(*args):
+    pass
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class FrameProfiler:
+    """Times loop phases into a ring buffer; see the module comment for the model.
+
+    budget_ms: frames whose period (or phase total, without a period) exceeds
+    it are counted, and exported to export_path if one is set. export_path is
+    a file name pattern with a {frame} field; the extension picks CSV or JSON.
+    Automatic exports happen at most once per ring's worth of frames, so each
+    file holds the history leading up to a different spike.
+    """
+
+    def __init__(self, phases, capacity=DEFAULT_CAPACITY, budget_ms=None, export_path=None, enabled=False):
+        self.phases = list(phases)
+        self.columns = self.phases + ["total", "period"]
+        self.phase_index = {name: i for i, name in enumerate(self.phases)}
+        self.capacity = capacity
+        self.row_size = len(self.columns)
+        self.samples = array("d", bytes(8 * capacity * self.row_size)) # Row-major, oldest row overwritten first
+        self.frame_numbers = array("q", bytes(8 * capacity))
+        self.frames = 0 # Frames recorded so far; the next row goes to frames % capacity
+        self.lap_ns = [0] * len(self.phases) # The current frame's phase times
+        self.last_ns = 0
+        self.budget_ms = budget_ms
+        self.export_path = export_path
+        self.over_budget = 0 # Frames that blew the budget
+        self.next_export_frame = 0
+        self.exported = [] # Paths written so far
+        self.overlay_visible = False
+        self.overlay_surface = None
+        self.overlay_font = None
+        self.overlay_text = TextCache(128) # Labels never change and most readings repeat
+        self.overlay_drawn_frame = None
+        self.set_enabled(enabled)
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        if enabled:
+            self.mark = self._mark
+            self.end_frame = self._end_frame
+            self.last_ns = time.perf_counter_ns()
+            self.lap_ns = [0] * len(self.phases)
+            self.next_export_frame = self.frames + EXPORT_WARMUP_FRAMES
+        else:
+            self.mark = _skip
+            self.end_frame = _skip
+            self.overlay_visible = False
+
+    def toggle_overlay(self):
+        """Shows or hides the overlay; showing it switches profiling on."""
+        if not self.enabled:
+            self.set_enabled(True)
+        self.overlay_visible = not self.overlay_visible
+
+    # --- Recording ---
+    def _mark(self, phase):
+        now = time.perf_counter_ns()
+        self.lap_ns[self.phase_index[phase]] += now - self.last_ns
+        self.last_ns = now
+
+    def _end_frame(self, period_ms=None):
+        """Stores the frame's row; period_ms is clock.tick()'s return value."""
+        lap_ns = self.lap_ns
+        row = (self.frames % self.capacity) * self.row_size
+        samples = self.samples
+        total = 0
+        for i, ns in enumerate(lap_ns):
+            samples[row + i] = ns / 1e6
+            total += ns
+            lap_ns[i] = 0
+        total_ms = total / 1e6
+        samples[row + self.row_size - 2] = total_ms
+        samples[row + self.row_size - 1] = period_ms if period_ms is not None else 0.0
+        self.frame_numbers[self.frames % self.capacity] = self.frames
+        self.frames += 1
+        self.last_ns = time.perf_counter_ns() # Time spent in here isn't charged to any phase
+
+        if self.budget_ms is not None and (period_ms if period_ms is not None else total_ms) > self.budget_ms:
+            self.over_budget += 1
+            if self.export_path and self.frames >= self.next_export_frame:
+                self.export(self.export_path.format(frame=self.frames - 1))
+                self.next_export_frame = self.frames + self.capacity
+
+    # --- Reading ---
+    def rows(self):
+        """(frame number, [column values]) for the frames in the ring, oldest first."""
+        count = min(self.frames, self.capacity)
+        first = self.frames - count
+        for frame in range(first, self.frames):
+            slot = frame % self.capacity
+            yield self.frame_numbers[slot], self.samples[slot * self.row_size:(slot + 1) * self.row_size].tolist()
+
+    def column(self, name, last=None):
+        """One column's values, oldest first, optionally only the last `last` frames."""
+        i = self.columns.index(name)
+        count = min(self.frames, self.capacity, last or self.capacity)
+        size, capacity = self.row_size, self.capacity
+        return [self.samples[(frame % capacity) * size + i] for frame in range(self.frames - count, self.frames)]
+
+    def stats(self):
+        """{column: (p50, p99)} over the frames in the ring."""
+        result = {}
+        for name in self.columns:
+            values = sorted(self.column(name))
+            result[name] = (percentile(values, 0.50), percentile(values, 0.99))
+        return result
+
+    def export(self, path):
+        """Writes the ring to path as JSON (.json) or CSV (anything else); returns path."""
+        if path.endswith(".json"):
+            data = {"columns": ["frame"] + self.columns, "budget_ms": self.budget_ms,
+                    "rows": [[frame] + values for frame, values in self.rows()]}
+            with open(path, "w") as f:
+                json.dump(data, f)
+        else:
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["frame"] + self.columns)
+                for frame, values in self.rows():
+                    writer.writerow([frame] + ["%.4f" % v for v in values])
+        self.exported.append(path)
+        return path
+
+    # --- Overlay ---
+    def draw(self, surface, pos=(4, 4)):
+        """Blits the overlay (when visible) and returns the rect it covers, or None."""
+        if not self.overlay_visible:
+            return None
+        if self.overlay_surface is None or (self.frames - self.overlay_drawn_frame) >= OVERLAY_REFRESH_FRAMES:
+            self.build_overlay()
+        return surface.blit(self.overlay_surface, pos)
+
+    def build_overlay(self):
+        if self.overlay_font is None:
+            self.overlay_font = pygame.font.SysFont(None, OVERLAY_FONT_SIZE)
+        font = self.overlay_font
+        stats = self.stats()
+        lines = [("ms", "p50", "p99")]
+        for name in self.columns:
+            p50, p99 = stats[name]
+            lines.append((name, "%.2f" % p50, "%.2f" % p99))
+        if self.budget_ms is not None:
+            lines.append(("> %.1f" % self.budget_ms, "", "%d" % self.over_budget))
+        line_h = font.get_linesize()
+        width = GRAPH_WIDTH + 8
+        height = line_h * len(lines) + GRAPH_HEIGHT + 12
+        if self.overlay_surface is None or self.overlay_surface.get_size() != (width, height):
+            self.overlay_surface = pygame.Surface((width, height), pygame.SRCALPHA) # Built once, redrawn in place
+        overlay = self.overlay_surface
+        overlay.fill(OVERLAY_BG)
+        for i, cells in enumerate(lines):
+            y = 4 + i * line_h
+            for cell, right in zip(cells, OVERLAY_COLUMNS):
+                text = self.overlay_text.render(font, cell, OVERLAY_TEXT)
+                overlay.blit(text, (right - text.get_width() if right else 4, y)) # Numbers right-aligned
+
+        # Frame-time graph: phase total and frame period, scaled so twice the budget fills it
+        top = 8 + line_h * len(lines)
+        bottom = top + GRAPH_HEIGHT
+        scale_ms = 2 * self.budget_ms if self.budget_ms else max(self.column("total", GRAPH_WIDTH) + [1.0])
+        for name, color in (("period", GRAPH_PERIOD), ("total", GRAPH_TOTAL)):
+            values = self.column(name, GRAPH_WIDTH)
+            if len(values) >= 2:
+                points = [(4 + x, bottom - min(GRAPH_HEIGHT, int(v / scale_ms * GRAPH_HEIGHT))) for x, v in enumerate(values)]
+                pygame.draw.lines(overlay, color, False, points)
+        if self.budget_ms:
+            budget_y = bottom - GRAPH_HEIGHT // 2
+            pygame.draw.line(overlay, GRAPH_BUDGET, (4, budget_y), (4 + GRAPH_WIDTH, budget_y))
+        self.overlay_drawn_frame = self.frames
@@ -0,0 +1,159 @@
+# replay.py - Compact input replays shared by the games
+#
+# A replay is the RNG seed plus one small input code per frame, stored as
+# run-length encoded runs, with occasional state checkpoints so playback can
+# seek without simulating from frame 0.
+#
+# File layout (all integers little-endian, "varint" = LEB128):
+#   header : b"RPLY" | version u8 | seed u64 | checkpoint_interval u32 | tag_len u8 | tag
+#   records: 0x01 code u8, count varint          -> `count` frames of input `code`
+#            0x02 frame varint, size varint, data -> zlib'd checkpoint taken before `frame`
+#            0x00 frame_count varint              -> end of replay
+import bisect
+import struct
+import zlib
+
+MAGIC = b"RPLY"
+VERSION = 1
+HEADER = struct.Struct("<4sBQIB")
+RECORD_END, RECORD_INPUT, RECORD_CHECKPOINT = 0x00, 0x01, 0x02
+
+
+class ReplayError(Exception):
+    """Raised for truncated or otherwise unreadable replay files."""
+
+
+def write_varint(out, value):
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+
+def read_varint(data, pos):
+    """Returns (value, new_pos)."""
+    value = shift = 0
+    while True:
+        if pos >= len(data):
+            raise ReplayError("truncated varint")
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+class ReplayWriter:
+    """Streams a replay to disk: feed it one input code per frame and the odd checkpoint."""
+
+    def __init__(self, path, seed, checkpoint_interval, tag=b""):
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, seed, checkpoint_interval, len(tag)) + tag)
+        self.frame_count = 0
+        self.run_code = None # Input code of the run being built
+        self.run_length = 0
+
+    def add_input(self, code):
+        if code == self.run_code:
+            self.run_length += 1
+            return
+        self._flush_run()
+        self.run_code = code
+        self.run_length = 1
+
+    def add_checkpoint(self, payload):
+        """Stores a state blob taken before the next frame's input."""
+        self._flush_run()
+        data = zlib.compress(payload)
+        out = bytearray([RECORD_CHECKPOINT])
+        write_varint(out, self.frame_count)
+        write_varint(out, len(data))
+        self.file.write(bytes(out) + data)
+
+    def _flush_run(self):
+        if self.run_length:
+            out = bytearray([RECORD_INPUT, self.run_code])
+            write_varint(out, self.run_length)
+            self.file.write(out)
+            self.frame_count += self.run_length
+        self.run_code = None
+        self.run_length = 0
+
+    def close(self):
+        if self.file.closed:
+            return
+        self._flush_run()
+        out = bytearray([RECORD_END])
+        write_varint(out, self.frame_count)
+        self.file.write(out)
+        self.file.close()
+
+
+class ReplayReader:
+    """Loads a whole replay (they are small) and indexes runs and checkpoints for seeking."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) < HEADER.size:
+            raise ReplayError("file too short for a replay header")
+        magic, version, self.seed, self.checkpoint_interval, tag_len = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ReplayError("not a version %d replay file" % VERSION)
+        pos = HEADER.size
+        self.tag = data[pos:pos + tag_len]
+        pos += tag_len
+
+        self.run_starts = [] # First frame of each run, for bisecting
+        self.run_codes = []
+        self.checkpoint_frames = []
+        self.checkpoint_data = []
+        frame = 0
+        while True:
+            if pos >= len(data):
+                raise ReplayError("replay ends without an end record")
+            record = data[pos]
+            pos += 1
+            if record == RECORD_INPUT:
+                code = data[pos]
+                count, pos = read_varint(data, pos + 1)
+                self.run_starts.append(frame)
+                self.run_codes.append(code)
+                frame += count
+            elif record == RECORD_CHECKPOINT:
+                checkpoint_frame, pos = read_varint(data, pos)
+                size, pos = read_varint(data, pos)
+                self.checkpoint_frames.append(checkpoint_frame)
+                self.checkpoint_data.append(data[pos:pos + size])
+                pos += size
+            elif record == RECORD_END:
+                self.frame_count, pos = read_varint(data, pos)
+                if self.frame_count != frame:
+                    raise ReplayError("frame count mismatch (%d recorded, %d in runs)" % (self.frame_count, frame))
+                break
+            else:
+                raise ReplayError("unknown record type %#x" % record)
+
+    def inputs(self, start_frame=0):
+        """Yields the input code of every frame from start_frame to the end."""
+        run = max(0, bisect.bisect_right(self.run_starts, start_frame) - 1)
+        frame = start_frame
+        while run < len(self.run_starts):
+            run_end = self.run_starts[run + 1] if run + 1 < len(self.run_starts) else self.frame_count
+            code = self.run_codes[run]
+            while frame < run_end:
+                yield code
+                frame += 1
+            run += 1
+
+    def checkpoint_before(self, frame):
+        """(checkpoint_frame, payload) of the latest checkpoint at or before frame, or None."""
+        i = bisect.bisect_right(self.checkpoint_frames, frame) - 1
+        if i < 0:
+            return None
+        return self.checkpoint_frames[i], zlib.decompress(self.checkpoint_data[i])
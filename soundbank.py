@@ -0,0 +1,131 @@
+# soundbank.py - Procedural sound effects shared by the games
+#
+# synthesize() builds a mono 16-bit PCM buffer from a small parameter set:
+# waveform (sine, square or noise), a linear pitch sweep, an ADSR envelope and
+# an amplitude. Every sample is computed with whole-array NumPy operations.
+#
+# SoundBank caches the buffers: in memory for the session and on disk as .npy
+# files named after a hash of the parameters, so a later launch just loads
+# them. Change the synthesis code -> bump SYNTH_VERSION and stale files are
+# simply never looked up again.
+import hashlib
+import inspect
+import os
+
+import numpy as np
+import pygame
+
+SAMPLE_RATE = 44100
+MAX_SAMPLE = 2**(16 - 1) - 1 # Max value for 16-bit audio
+SYNTH_VERSION = 1 # Part of every cache key
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sound_cache")
+WAVEFORMS = ("sine", "square", "noise")
+
+
+def envelope(num_samples, sample_rate, attack=0.0, decay=0.0, sustain=1.0, release=0.0):
+    """ADSR gain per sample: ramps up over attack, down to sustain over decay, to 0 over release (seconds)."""
+    if not (attack or decay or release) and sustain == 1.0:
+        return None # Flat, nothing to multiply
+    duration = num_samples / sample_rate
+    # Segments that don't fit are squeezed: release wins, then attack, then decay
+    release = min(release, duration)
+    attack = min(attack, duration - release)
+    decay = min(decay, duration - release - attack)
+    times = [0.0, attack, attack + decay, duration - release, duration]
+    gains = [0.0 if attack else 1.0, 1.0, sustain, sustain, 0.0 if release else sustain]
+    t = np.arange(num_samples) / sample_rate
+    return np.interp(t, times, gains)
+
+
+def synthesize(frequency, duration, amplitude=4096, wave="sine", end_frequency=None,
+               attack=0.0, decay=0.0, sustain=1.0, release=0.0, seed=0, sample_rate=SAMPLE_RATE):
+    """Returns a mono int16 buffer. end_frequency sweeps the pitch linearly over
+    the sound; seed picks the noise pattern. A plain sine matches the old
+    per-sample Pong generator bit for bit."""
+    if wave not in WAVEFORMS:
+        raise ValueError("unknown waveform %r (expected one of %s)" % (wave, ", ".join(WAVEFORMS)))
+    num_samples = int(sample_rate * duration)
+    t = np.arange(num_samples) / sample_rate # Time in seconds
+
+    if wave == "noise":
+        signal = np.random.default_rng(seed).uniform(-1.0, 1.0, num_samples)
+    else:
+        if end_frequency is None or end_frequency == frequency:
+            phase = 2 * np.pi * frequency * t
+        else:
+            # Integral of a frequency going linearly from frequency to end_frequency
+            rate = (end_frequency - frequency) / duration
+            phase = 2 * np.pi * (frequency * t + 0.5 * rate * t * t)
+        signal = np.sin(phase)
+        if wave == "square":
+            signal = np.where(signal >= 0.0, 1.0, -1.0)
+
+    samples = amplitude * signal
+    gain = envelope(num_samples, sample_rate, attack, decay, sustain, release)
+    if gain is not None:
+        samples *= gain
+    return np.clip(samples, -MAX_SAMPLE, MAX_SAMPLE).astype(np.int16) # astype truncates like int()
+
+
+# synthesize()'s defaults, so leaving a parameter out and passing its default share a cache entry
+SYNTH_DEFAULTS = {name: param.default for name, param in inspect.signature(synthesize).parameters.items()
+                  if param.default is not param.empty and name != "sample_rate"}
+
+
+class SoundBank:
+    """synthesize() with a memory and disk cache; sound() wraps the PCM in a pygame Sound.
+
+    cache_dir=None keeps the cache in memory only. An unwritable cache
+    directory just means sounds get synthesized every launch.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, sample_rate=SAMPLE_RATE):
+        self.cache_dir = cache_dir
+        self.sample_rate = sample_rate
+        self.buffers = {} # Cache key -> int16 array
+        self.loaded = 0 # Buffers read from disk this session
+        self.synthesized = 0
+
+    def cache_key(self, params):
+        text = repr((SYNTH_VERSION, self.sample_rate, sorted(params.items())))
+        return hashlib.blake2b(text.encode(), digest_size=10).hexdigest()
+
+    def pcm(self, frequency, duration, **params):
+        """The int16 buffer for synthesize(frequency, duration, **params), cached."""
+        params = dict(SYNTH_DEFAULTS, frequency=float(frequency), duration=float(duration), **params)
+        key = self.cache_key(params)
+        buf = self.buffers.get(key)
+        if buf is not None:
+            return buf
+        path = os.path.join(self.cache_dir, key + ".npy") if self.cache_dir else None
+        if path and os.path.exists(path):
+            try:
+                buf = np.load(path)
+                self.loaded += 1
+            except (OSError, ValueError):
+                buf = None # Damaged file: regenerate it below
+        if buf is None:
+            buf = synthesize(sample_rate=self.sample_rate, **params)
+            self.synthesized += 1
+            if path:
+                self.save(path, buf)
+        self.buffers[key] = buf
+        return buf
+
+    def save(self, path, buf):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temp_path = path + ".tmp"
+            with open(temp_path, "wb") as f:
+                np.save(f, buf)
+            os.replace(temp_path, path) # Readers never see half a file
+        except OSError:
+            pass
+
+    def sound(self, frequency, duration, **params):
+        """A pygame.mixer.Sound for the parameters (the mixer must be initialized)."""
+        return pygame.mixer.Sound(buffer=self.pcm(frequency, duration, **params))
+
+
+# Shared bank, so every script loads from the same cache
+default_bank = SoundBank()
@@ -0,0 +1,153 @@
+# spriteatlas.py - Pre-rendered sprite frames shared by the games
+#
+# Code-drawn sprites cost a few dozen pygame.draw calls per picture. An atlas
+# runs the drawing code once per pose, then adds a left/right mirror of each
+# and rotations at `angles` evenly spaced steps (for slopes and spins), and
+# packs every frame into one converted, colorkeyed surface. Drawing a frame
+# is then a single blit of a sub-rect, however fancy the pose was to draw.
+#
+# Built atlases are cached on disk as a PNG plus a JSON frame index, named
+# after a hash of the parameters and of the source files the pose functions
+# live in: edit the drawing code (or its colors) and the next launch simply
+# builds a fresh atlas.
+#
+# Frames rotate about their center, so rotated frames are larger than the
+# pose canvas. Place them by center (SpriteAtlas.blit does).
+import hashlib
+import json
+import os
+
+import pygame
+
+ATLAS_VERSION = 1 # Part of every cache key
+DEFAULT_ANGLES = 16
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sprite_cache")
+FRAME_PADDING = 1 # Pixels between frames
+SHELF_WIDTH_SLACK = 1.25 # Atlas width is about sqrt(total frame area) times this
+
+
+class SpriteAtlas:
+    """Frame rects for (pose, flipped, angle step), all in one surface."""
+
+    def __init__(self, surface, frames, angles):
+        self.surface = surface
+        self.frames = frames # (pose, flipped, angle step) -> Rect in surface
+        self.angles = angles
+        self.step_degrees = 360.0 / angles
+        self.from_cache = False
+
+    def frame(self, pose, flipped=False, angle=0.0):
+        """The rect of `pose` (mirrored if flipped) turned the nearest step to `angle` degrees counterclockwise."""
+        return self.frames[pose, flipped, round(angle / self.step_degrees) % self.angles]
+
+    def blit(self, target, pose, center, flipped=False, angle=0.0):
+        area = self.frame(pose, flipped, angle)
+        return target.blit(self.surface, placed(area, center), area)
+
+
+def placed(area, center):
+    """Where a frame of rect `area` goes to be centered on `center`."""
+    rect = pygame.Rect((0, 0), area.size)
+    rect.center = center
+    return rect
+
+
+def render_frames(poses, size, angles, colorkey):
+    """Every frame as ((pose, flipped, angle step), Surface), in a fixed order."""
+    frames = []
+    for pose, draw in poses.items():
+        canvas = pygame.Surface(size)
+        canvas.fill(colorkey)
+        draw(canvas)
+        canvas.set_colorkey(colorkey) # rotate() fills the new corners with it
+        for flipped, base in ((False, canvas), (True, pygame.transform.flip(canvas, True, False))):
+            base.set_colorkey(colorkey)
+            for step in range(angles):
+                degrees = step * 360.0 / angles
+                frames.append(((pose, flipped, step), pygame.transform.rotate(base, degrees) if step else base))
+    return frames
+
+
+def pack(frames, colorkey):
+    """Shelf-packs the frames (tallest first) into one surface. Returns (surface, {key: Rect})."""
+    area = sum((w + FRAME_PADDING) * (h + FRAME_PADDING) for _, image in frames for w, h in [image.get_size()])
+    widest = max(image.get_width() for _, image in frames)
+    atlas_width = max(widest, int(area ** 0.5 * SHELF_WIDTH_SLACK))
+    order = sorted(range(len(frames)), key=lambda i: -frames[i][1].get_height())
+    rects = {}
+    x = y = shelf_height = 0
+    for i in order:
+        key, image = frames[i]
+        w, h = image.get_size()
+        if x + w > atlas_width: # Next shelf
+            x = 0
+            y += shelf_height + FRAME_PADDING
+            shelf_height = 0
+        rects[key] = pygame.Rect(x, y, w, h)
+        x += w + FRAME_PADDING
+        shelf_height = max(shelf_height, h)
+    surface = pygame.Surface((atlas_width, y + shelf_height))
+    surface.fill(colorkey)
+    surface.blits([(image, rects[key]) for key, image in frames], doreturn=False)
+    return surface, rects
+
+
+def cache_key(name, poses, size, angles, colorkey):
+    sources = hashlib.blake2b(digest_size=10)
+    for filename in sorted({draw.__code__.co_filename for draw in poses.values()}):
+        try:
+            with open(filename, "rb") as f:
+                sources.update(f.read())
+        except OSError:
+            sources.update(filename.encode()) # No source to read: at least tell the files apart
+    text = repr((ATLAS_VERSION, name, list(poses), tuple(size), angles, tuple(colorkey), sources.hexdigest()))
+    return name + "-" + hashlib.blake2b(text.encode(), digest_size=10).hexdigest()
+
+
+def finish(surface, colorkey):
+    """Converted to the display format (when there is a display yet) and colorkeyed for fast blits."""
+    if pygame.display.get_surface() is not None:
+        surface = surface.convert()
+    # No RLEACCEL: an RLE surface walks every row above a sub-rect to blit it (~30x slower here)
+    surface.set_colorkey(colorkey)
+    return surface
+
+
+def load_atlas(name, poses, size, angles=DEFAULT_ANGLES, colorkey=(1, 1, 1), cache_dir=DEFAULT_CACHE_DIR):
+    """The atlas for `poses` ({pose name: draw(surface)} drawing on a `size` canvas
+    filled with colorkey), from the disk cache when it's there. cache_dir=None
+    always builds; an unwritable cache directory just means building every launch."""
+    key = cache_key(name, poses, size, angles, colorkey)
+    if cache_dir:
+        image_path = os.path.join(cache_dir, key + ".png")
+        index_path = os.path.join(cache_dir, key + ".json")
+        try:
+            with open(index_path) as f:
+                index = json.load(f)
+            surface = pygame.image.load(image_path)
+            frames = {(pose, flipped, step): pygame.Rect(rect) for pose, flipped, step, rect in index["frames"]}
+            atlas = SpriteAtlas(finish(surface, colorkey), frames, angles)
+            atlas.from_cache = True
+            return atlas
+        except (OSError, ValueError, KeyError, TypeError, pygame.error):
+            pass # Not cached yet (or damaged): build it below
+
+    surface, frames = pack(render_frames(poses, size, angles, colorkey), colorkey)
+    if cache_dir:
+        save(cache_dir, image_path, index_path, surface, frames)
+    return SpriteAtlas(finish(surface, colorkey), frames, angles)
+
+
+def save(cache_dir, image_path, index_path, surface, frames):
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_path = image_path + ".tmp.png" # pygame picks the format from the extension
+        pygame.image.save(surface, temp_path)
+        os.replace(temp_path, image_path)
+        index = {"frames": [[pose, flipped, step, list(rect)] for (pose, flipped, step), rect in frames.items()]}
+        temp_path = index_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(temp_path, index_path) # Written last: an index means the image is complete
+    except (OSError, pygame.error):
+        pass
@@ -0,0 +1,76 @@
+# textcache.py - Cached text and overlay surfaces shared by the games
+#
+# Font rasterization is one of the slowest calls in a frame, and the score,
+# title and banner strings come out pixel-identical frame after frame. A
+# TextCache keeps rendered surfaces keyed by (font, text, color, antialias)
+# and evicts the least recently used one past a size limit, so a score that
+# keeps changing can't grow it without bound. Overlay backdrops (filled
+# SRCALPHA boxes) are cached the same way by (size, color).
+#
+# Cached surfaces are shared: blit them, don't draw on them.
+from collections import OrderedDict
+
+import pygame
+
+DEFAULT_TEXT_CACHE_SIZE = 256
+DEFAULT_OVERLAY_CACHE_SIZE = 16
+
+
+class TextCache:
+    """LRU cache of font.render() results."""
+
+    def __init__(self, max_size=DEFAULT_TEXT_CACHE_SIZE):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color, antialias=True):
+        """Same as font.render(text, antialias, color), rasterized only on a cache miss."""
+        key = (font, text, tuple(color), antialias)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+
+
+class OverlayCache:
+    """Pre-filled translucent backdrops, built once per (size, color)."""
+
+    def __init__(self, max_size=DEFAULT_OVERLAY_CACHE_SIZE):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+
+    def get(self, size, color):
+        """A SRCALPHA surface of `size` filled with the RGBA `color`."""
+        key = (tuple(size), tuple(color))
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            return surface
+        surface = pygame.Surface(size, pygame.SRCALPHA)
+        surface.fill(color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+
+
+# Shared instances, for scripts that just want cached drawing
+text_cache = TextCache()
+overlay_cache = OverlayCache()
+render_text = text_cache.render
+overlay_surface = overlay_cache.get
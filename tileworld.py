@@ -0,0 +1,345 @@
+# tileworld.py - Chunked tile levels for the Sonic prototypes
+#
+# A level is a grid of 128x128 px chunks, each an 8x8 block of 16x16 px
+# tiles, like the Mega Drive Sonic games. Chunks are stored once and shared:
+# the level layout is just one chunk id per 128 px square, so long flat runs
+# and repeated hills cost two bytes per chunk of level.
+#
+# The level file is memory-mapped, never parsed. Tile lookups for collision
+# read straight out of the mapping, so only the pages near the player are
+# ever touched. Drawing needs each visible chunk rendered to a surface; those
+# are made on demand (plus one chunk of margin around the camera, so they're
+# ready before they scroll in) and kept in a small LRU cache that drops the
+# chunks left far behind. Load time and memory stay the same whether the
+# level is one screen or 40,000 px long.
+#
+# File layout (all integers little-endian):
+#   header : b"TLVL" | version u8 | tile_size u8 | chunk_tiles u8 | pad
+#            | chunks_wide u32 | chunks_high u32 | chunk_count u32 | spawn_x u32 | spawn_y u32
+#   layout : chunk id u16 per chunk of level, row by row (chunk 0 is always all empty)
+#   chunks : chunk_tiles * chunk_tiles tile codes (u8), row by row, per chunk id
+import math
+import mmap
+import os
+import random
+import struct
+from collections import OrderedDict
+
+import pygame
+
+MAGIC = b"TLVL"
+VERSION = 1
+HEADER = struct.Struct("<4sBBBxIIIII")
+TILE_SIZE = 16
+CHUNK_TILES = 8
+CHUNK_SIZE = TILE_SIZE * CHUNK_TILES
+DEFAULT_RESIDENT_CHUNKS = 64 # Rendered chunk surfaces kept around (a screen needs about 24)
+PREFETCH_MARGIN = 1 # Chunks around the view rendered ahead of time
+
+# Tile codes; everything but TILE_EMPTY is solid, and platforms only to things landing on them
+TILE_EMPTY, TILE_DIRT, TILE_GRASS, TILE_STONE, TILE_PLATFORM = 0, 1, 2, 3, 4
+TILE_COLORS = {
+    TILE_DIRT: ((168, 96, 40), (136, 72, 24)), # Checkerboard dirt, like Green Hill!
+    TILE_GRASS: ((0, 180, 0), (0, 140, 0)),
+    TILE_STONE: ((150, 150, 160), (110, 110, 120)),
+    TILE_PLATFORM: ((200, 160, 90), (170, 130, 60)),
+}
+COLORKEY = (1, 1, 1) # Empty tiles, so the sky shows through
+
+
+class TileWorldError(Exception):
+    """Raised for level files that are truncated or don't hold a tile level."""
+
+
+class TileWorld:
+    """A mapped level file: tile lookups, box collision and chunk drawing."""
+
+    def __init__(self, path, resident_chunks=DEFAULT_RESIDENT_CHUNKS):
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < HEADER.size:
+                raise TileWorldError("%s is too short to be a tile level" % path)
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) # Stays valid after the file is closed
+        magic, version, tile_size, chunk_tiles, wide, high, chunk_count, spawn_x, spawn_y = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise TileWorldError("%s is not a version %d tile level" % (path, VERSION))
+        if (tile_size, chunk_tiles) != (TILE_SIZE, CHUNK_TILES):
+            raise TileWorldError("%s uses %d px tiles in %dx%d chunks; only %d px in %dx%d are supported"
+                                 % (path, tile_size, chunk_tiles, chunk_tiles, TILE_SIZE, CHUNK_TILES, CHUNK_TILES))
+        chunk_bytes = CHUNK_TILES * CHUNK_TILES
+        view = memoryview(data)
+        pos = HEADER.size
+        self.layout = view[pos:pos + 2 * wide * high].cast("H")
+        pos += 2 * wide * high
+        self.tiles = view[pos:pos + chunk_bytes * chunk_count]
+        if len(self.layout) != wide * high or len(self.tiles) != chunk_bytes * chunk_count:
+            raise TileWorldError("%s is truncated" % path)
+        if chunk_count == 0 or max(self.layout) >= chunk_count:
+            raise TileWorldError("%s refers to chunks it doesn't have" % path)
+        self.path = path
+        self.chunks_wide = wide
+        self.chunks_high = high
+        self.chunk_count = chunk_count
+        self.tiles_wide = wide * CHUNK_TILES
+        self.tiles_high = high * CHUNK_TILES
+        self.pixel_width = wide * CHUNK_SIZE
+        self.pixel_height = high * CHUNK_SIZE
+        self.spawn = (spawn_x, spawn_y) # Midbottom of the player at the start
+        self.resident_chunks = resident_chunks
+        self.surfaces = OrderedDict() # Chunk id -> rendered Surface, least recently drawn first
+        self.tile_images = None # Made with the first chunk (after the display is up)
+        # Stats
+        self.chunks_rendered = 0
+        self.chunks_evicted = 0
+
+    # --- Tiles and Collision ---
+    def tile_at(self, tx, ty):
+        """Tile code at tile coordinates. Past the left/right ends is solid wall; above
+        and below the level is empty (falling out the bottom is a pit)."""
+        if not 0 <= ty < self.tiles_high:
+            return TILE_EMPTY
+        if not 0 <= tx < self.tiles_wide:
+            return TILE_STONE
+        cx, lx = divmod(tx, CHUNK_TILES)
+        cy, ly = divmod(ty, CHUNK_TILES)
+        chunk = self.layout[cy * self.chunks_wide + cx]
+        return self.tiles[(chunk * CHUNK_TILES + ly) * CHUNK_TILES + lx]
+
+    def solid_in(self, tx0, tx1, ty0, ty1, landing=False):
+        """True if any tile in the inclusive tile ranges is solid (platforms count only when landing)."""
+        tile_at = self.tile_at
+        for ty in range(ty0, ty1 + 1):
+            for tx in range(tx0, tx1 + 1):
+                code = tile_at(tx, ty)
+                if code and (landing or code != TILE_PLATFORM):
+                    return True
+        return False
+
+    def move_box(self, x, y, width, height, dx, dy, step_up=0):
+        """Moves a box (top-left x, y) by dx then dy, stopping flush against solid
+        tiles. Returns (x, y, hit_x, hit_y). Sweeps every tile row/column crossed,
+        so no speed tunnels through a wall. Platforms stop the box only when it
+        comes down onto them from above. With step_up, a box blocked sideways
+        climbs onto a ledge up to that many pixels high instead (for walking
+        up steps; it lands on them with the next fall)."""
+        hit_x = hit_y = False
+        if dx and step_up:
+            stepped_x, _, hit_x, _ = self.move_box(x, y, width, height, dx, 0)
+            if hit_x:
+                raised = y - step_up
+                top_row = math.floor(raised / TILE_SIZE)
+                headroom = not self.solid_in(math.floor(x / TILE_SIZE), math.ceil((x + width) / TILE_SIZE) - 1,
+                                             top_row, math.floor(y / TILE_SIZE) - 1)
+                if headroom:
+                    climbed_x, _, climbed_hit, _ = self.move_box(x, raised, width, height, dx, 0)
+                    if abs(climbed_x - x) > abs(stepped_x - x):
+                        stepped_x, y, hit_x = climbed_x, raised, climbed_hit
+            x, dx = stepped_x, 0
+        if dx:
+            ty0, ty1 = math.floor(y / TILE_SIZE), math.ceil((y + height) / TILE_SIZE) - 1
+            if dx > 0:
+                start = math.ceil((x + width) / TILE_SIZE)
+                end = math.ceil((x + width + dx) / TILE_SIZE) - 1
+                for tx in range(start, end + 1):
+                    if self.solid_in(tx, tx, ty0, ty1):
+                        x, hit_x = tx * TILE_SIZE - width, True
+                        break
+            else:
+                start = math.floor(x / TILE_SIZE) - 1
+                end = math.floor((x + dx) / TILE_SIZE)
+                for tx in range(start, end - 1, -1):
+                    if self.solid_in(tx, tx, ty0, ty1):
+                        x, hit_x = (tx + 1) * TILE_SIZE, True
+                        break
+            if not hit_x:
+                x += dx
+        if dy:
+            tx0, tx1 = math.floor(x / TILE_SIZE), math.ceil((x + width) / TILE_SIZE) - 1
+            if dy > 0:
+                start = math.ceil((y + height) / TILE_SIZE)
+                end = math.ceil((y + height + dy) / TILE_SIZE) - 1
+                for ty in range(start, end + 1):
+                    if self.solid_in(tx0, tx1, ty, ty, landing=True):
+                        y, hit_y = ty * TILE_SIZE - height, True
+                        break
+            else:
+                start = math.floor(y / TILE_SIZE) - 1
+                end = math.floor((y + dy) / TILE_SIZE)
+                for ty in range(start, end - 1, -1):
+                    if self.solid_in(tx0, tx1, ty, ty):
+                        y, hit_y = (ty + 1) * TILE_SIZE, True
+                        break
+            if not hit_y:
+                y += dy
+        return x, y, hit_x, hit_y
+
+    # --- Drawing ---
+    def camera(self, center, view_size):
+        """Top-left of a view_size view centered on `center`, kept inside the level."""
+        x = min(max(center[0] - view_size[0] // 2, 0), self.pixel_width - view_size[0])
+        y = min(max(center[1] - view_size[1] // 2, 0), self.pixel_height - view_size[1])
+        return max(x, 0), max(y, 0)
+
+    def chunk_surface(self, chunk):
+        """The rendered surface of chunk id `chunk` (None for the empty chunk), from the LRU cache."""
+        if chunk == 0:
+            return None
+        surface = self.surfaces.get(chunk)
+        if surface is not None:
+            self.surfaces.move_to_end(chunk)
+            return surface
+        surface = self.render_chunk(chunk)
+        self.surfaces[chunk] = surface
+        if len(self.surfaces) > self.resident_chunks:
+            self.surfaces.popitem(last=False) # The one drawn longest ago: far behind us
+            self.chunks_evicted += 1
+        return surface
+
+    def render_chunk(self, chunk):
+        if self.tile_images is None:
+            self.tile_images = make_tile_images()
+        surface = pygame.Surface((CHUNK_SIZE, CHUNK_SIZE))
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+        surface.fill(COLORKEY)
+        base = chunk * CHUNK_TILES * CHUNK_TILES
+        codes = self.tiles[base:base + CHUNK_TILES * CHUNK_TILES]
+        surface.blits([(self.tile_images[code], ((i % CHUNK_TILES) * TILE_SIZE, (i // CHUNK_TILES) * TILE_SIZE))
+                       for i, code in enumerate(codes) if code], doreturn=False)
+        surface.set_colorkey(COLORKEY)
+        self.chunks_rendered += 1
+        return surface
+
+    def chunk_range(self, camera, view_size, margin=0):
+        """Chunk columns and rows (ranges) covering the view, plus `margin` chunks all round."""
+        cx0 = max(int(camera[0]) // CHUNK_SIZE - margin, 0)
+        cy0 = max(int(camera[1]) // CHUNK_SIZE - margin, 0)
+        cx1 = min((int(camera[0]) + view_size[0] - 1) // CHUNK_SIZE + margin, self.chunks_wide - 1)
+        cy1 = min((int(camera[1]) + view_size[1] - 1) // CHUNK_SIZE + margin, self.chunks_high - 1)
+        return range(cx0, cx1 + 1), range(cy0, cy1 + 1)
+
+    def draw(self, target, camera):
+        """Blits the chunks in view (camera = top-left of the view in level pixels)."""
+        view_size = target.get_size()
+        cam_x, cam_y = int(camera[0]), int(camera[1])
+        layout, wide = self.layout, self.chunks_wide
+        columns, rows = self.chunk_range(camera, view_size)
+        blits = []
+        for cy in rows:
+            for cx in columns:
+                surface = self.chunk_surface(layout[cy * wide + cx])
+                if surface is not None:
+                    blits.append((surface, (cx * CHUNK_SIZE - cam_x, cy * CHUNK_SIZE - cam_y)))
+        target.blits(blits, doreturn=False)
+        self.prefetch(camera, view_size)
+
+    def prefetch(self, camera, view_size):
+        """Renders the ring of chunks just outside the view, so scrolling never waits on one."""
+        layout, wide = self.layout, self.chunks_wide
+        columns, rows = self.chunk_range(camera, view_size, PREFETCH_MARGIN)
+        for cy in (rows[0], rows[-1]):
+            for cx in columns:
+                self.chunk_surface(layout[cy * wide + cx])
+        for cx in (columns[0], columns[-1]):
+            for cy in rows:
+                self.chunk_surface(layout[cy * wide + cx])
+
+    def stats(self):
+        return {"resident": len(self.surfaces), "rendered": self.chunks_rendered, "evicted": self.chunks_evicted}
+
+
+def make_tile_images():
+    """One 16x16 surface per solid tile code: a two-tone checker (with a grass fringe)."""
+    images = {}
+    half = TILE_SIZE // 2
+    for code, (light, dark) in TILE_COLORS.items():
+        image = pygame.Surface((TILE_SIZE, TILE_SIZE))
+        image.fill(light)
+        image.fill(dark, (half, 0, half, half))
+        image.fill(dark, (0, half, half, half))
+        if code == TILE_GRASS:
+            image.fill(TILE_COLORS[TILE_GRASS][0], (0, 0, TILE_SIZE, 4)) # Bright top edge
+        images[code] = image
+    return images
+
+
+# --- Writing and Generating ---
+def write_level(path, columns, spawn):
+    """Writes a level from full-height tile columns (bytes of tile codes, top to bottom),
+    sharing identical chunks. The column count is padded to whole chunks with wall."""
+    tiles_high = len(columns[0])
+    if tiles_high % CHUNK_TILES:
+        raise TileWorldError("level height must be a multiple of %d tiles" % CHUNK_TILES)
+    columns = list(columns)
+    while len(columns) % CHUNK_TILES:
+        columns.append(bytes([TILE_STONE]) * tiles_high)
+    wide, high = len(columns) // CHUNK_TILES, tiles_high // CHUNK_TILES
+    chunk_ids = {bytes(CHUNK_TILES * CHUNK_TILES): 0} # Chunk tiles -> id; 0 is the empty chunk
+    layout = []
+    for cy in range(high):
+        for cx in range(wide):
+            block = columns[cx * CHUNK_TILES:(cx + 1) * CHUNK_TILES]
+            rows = (bytes(column[cy * CHUNK_TILES + ly] for column in block) for ly in range(CHUNK_TILES))
+            layout.append(chunk_ids.setdefault(b"".join(rows), len(chunk_ids)))
+    if len(chunk_ids) > 0xFFFF:
+        raise TileWorldError("level has %d different chunks; at most %d fit" % (len(chunk_ids), 0xFFFF))
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, TILE_SIZE, CHUNK_TILES, wide, high, len(chunk_ids), spawn[0], spawn[1]))
+        f.write(struct.pack("<%dH" % len(layout), *layout))
+        f.write(b"".join(chunk_ids)) # Dicts keep insertion order, which is id order
+    os.replace(tmp_path, path)
+
+
+def generate(path, chunks_wide=320, chunks_high=4, seed=None):
+    """Writes a random level: rolling grassy hills, pits and floating ledges."""
+    rng = random.Random(seed)
+    tiles_high = chunks_high * CHUNK_TILES
+    tiles_wide = chunks_wide * CHUNK_TILES
+    lowest, highest = tiles_high - 3, tiles_high // 2 # Ground surface rows
+    ground = tiles_high - 6
+    columns = []
+    tx = 0
+    after_pit = False
+    while tx < tiles_wide:
+        run = rng.randint(4, 14)
+        if tx > 40 and not after_pit and rng.random() < 0.12: # A pit (never right at the start, never two in a row)
+            for _ in range(min(rng.randint(2, 5), tiles_wide - tx)):
+                columns.append(bytes(tiles_high))
+                tx += 1
+            after_pit = True
+            continue
+        # Rows count down, so the far side of a pit is never higher: always a fair jump
+        ground = min(max(ground + rng.choice((0, 1, 2) if after_pit else (-2, -1, 0, 0, 1, 2)), highest), lowest)
+        after_pit = False
+        ledge = rng.random() < 0.25 and ground - 5 > 1
+        for _ in range(min(run, tiles_wide - tx)):
+            column = bytearray(tiles_high)
+            column[ground] = TILE_GRASS
+            column[ground + 1:] = bytes([TILE_DIRT]) * (tiles_high - ground - 1)
+            if ledge:
+                column[ground - 5] = TILE_PLATFORM # Jump up through it, land on top
+            columns.append(bytes(column))
+            tx += 1
+    # Flat, ledge-free start to spawn on
+    for i in range(8):
+        column = bytearray(tiles_high)
+        column[lowest - 3:] = bytes([TILE_GRASS]) + bytes([TILE_DIRT]) * (tiles_high - lowest + 2)
+        columns[i] = bytes(column)
+    write_level(path, columns, (4 * TILE_SIZE, (lowest - 3) * TILE_SIZE))
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    parser = argparse.ArgumentParser(description="Generate a random chunked tile level")
+    parser.add_argument("path", help="level file to write")
+    parser.add_argument("--chunks-wide", type=int, default=320, help="level width in 128 px chunks")
+    parser.add_argument("--chunks-high", type=int, default=4, help="level height in 128 px chunks")
+    parser.add_argument("--seed", type=int, help="random seed")
+    args = parser.parse_args()
+    generate(args.path, args.chunks_wide, args.chunks_high, args.seed)
+    start = time.perf_counter()
+    world = TileWorld(args.path)
+    print("Wrote %s: %dx%d px, %d unique chunks, %d bytes; maps in %.2f ms" % (
+        args.path, world.pixel_width, world.pixel_height, world.chunk_count,
+        os.path.getsize(args.path), (time.perf_counter() - start) * 1000))